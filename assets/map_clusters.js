@@ -0,0 +1,81 @@
+// Affichage des clusters calculés côté serveur (voir update_geojson_data dans main.py)
+window.parcoursupMap = Object.assign({}, window.parcoursupMap, {
+    pointToLayer: function (feature, latlng) {
+        if (!feature.properties.cluster) {
+            return L.marker(latlng);
+        }
+        const count = feature.properties.point_count;
+        const size = count < 10 ? "small" : count < 100 ? "medium" : "large";
+        const icon = L.divIcon({
+            html: "<div><span>" + count + "</span></div>",
+            className: "map-cluster map-cluster-" + size,
+            iconSize: L.point(40, 40)
+        });
+        return L.marker(latlng, {icon: icon});
+    }
+});
+
+// Décodage des coordonnées quantifiées et encodées par différences (voir src/utils/map_payload.py)
+function decodeCoordinates(deltas, scale) {
+    const values = new Array(deltas.length);
+    let current = 0;
+    for (let i = 0; i < deltas.length; i++) {
+        current += deltas[i];
+        values[i] = current / scale;
+    }
+    return values;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    parcoursupMap: {
+        // Retient l'année et la partition des données reçues ; le dictionnaire des formations n'est redemandé
+        // au serveur que lorsqu'elles changent (voir update_map_dictionary dans main.py)
+        payloadPartition: function (payload, current) {
+            if (!payload || (current && current.year === payload.year && current.partition_id === payload.partition_id)) {
+                return window.dash_clientside.no_update;
+            }
+            return {year: payload.year, partition_id: payload.partition_id};
+        },
+
+        // Reconstruit le FeatureCollection GeoJSON à partir des données compactes et du dictionnaire des formations
+        decodePayload: function (payload, dictionary) {
+            if (!payload || !dictionary || payload.year !== dictionary.year ||
+                payload.partition_id !== dictionary.partition_id) {
+                return window.dash_clientside.no_update;
+            }
+            const features = [];
+
+            const clusters = payload.clusters;
+            const clusterLat = decodeCoordinates(clusters.lat, payload.scale);
+            const clusterLon = decodeCoordinates(clusters.lon, payload.scale);
+            for (let i = 0; i < clusters.count.length; i++) {
+                features.push({
+                    type: "Feature",
+                    geometry: {type: "Point", coordinates: [clusterLon[i], clusterLat[i]]},
+                    properties: {
+                        cluster: true,
+                        point_count: clusters.count[i],
+                        tooltip: clusters.count[i] + " établissements"
+                    }
+                });
+            }
+
+            const points = payload.points;
+            const pointLat = decodeCoordinates(points.lat, payload.scale);
+            const pointLon = decodeCoordinates(points.lon, payload.scale);
+            for (let i = 0; i < points.uai.length; i++) {
+                features.push({
+                    type: "Feature",
+                    geometry: {type: "Point", coordinates: [pointLon[i], pointLat[i]]},
+                    properties: {
+                        etab_nom: points.nom[i],
+                        formations: points.f[i].map(function (code) { return dictionary.formations[code]; }),
+                        etab_uai: points.uai[i]
+                    }
+                });
+            }
+
+            return {type: "FeatureCollection", features: features};
+        }
+    }
+});
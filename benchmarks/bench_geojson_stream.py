@@ -0,0 +1,70 @@
+"""Benchmark mémoire de la lecture du GeoJSON : json.load complet contre lecture en flux
+
+Usage : python -m benchmarks.bench_geojson_stream [--sizes 1000000 3000000] [--baseline-max 1000000]
+
+Chaque mesure est faite dans un sous-processus pour obtenir le pic de mémoire (RSS) de la lecture seule.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import write_synthetic_geojson
+
+
+def _run_reader(mode: str, file_path: str) -> None:
+    """Lit le fichier avec la méthode demandée et affiche le temps et le pic de RSS en JSON"""
+    sys.path.insert(0, os.getcwd())
+    from src.utils.geojson_index import group_by_year
+    from src.utils.geojson_stream import iter_geojson_features
+
+    start = time.perf_counter()
+    if mode == "json.load":
+        with open(file_path, 'r', encoding='utf-8') as file:
+            features = json.load(file)['features']
+    else:
+        features = iter_geojson_features(file_path)
+    # Regroupement de la construction de l'index (src/utils/geojson_index.py)
+    establishments = group_by_year(features).get("2023", {})
+    elapsed = time.perf_counter() - start
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_rss_mb, "establishments": len(establishments)}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500000, 1000000, 3000000])
+    parser.add_argument("--baseline-max", type=int, default=1000000,
+                        help="taille maximale pour laquelle json.load est mesuré (il peut saturer la mémoire)")
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        _run_reader(*args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"{'features':>10} {'taille (Mo)':>12} {'méthode':>10} {'temps (s)':>10} {'pic RSS (Mo)':>13}")
+        for size in args.sizes:
+            file_path = os.path.join(temp_dir, f"synthetic_{size}.geojson")
+            write_synthetic_geojson(file_path, size)
+            file_size_mb = os.path.getsize(file_path) / 1024 ** 2
+
+            modes = ["stream"] + (["json.load"] if size <= args.baseline_max else [])
+            for mode in modes:
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_geojson_stream", "--run", mode, file_path],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{size:>10} {file_size_mb:>12.0f} {mode:>10} {result['seconds']:>10.2f} {result['peak_rss_mb']:>13.0f}")
+            os.remove(file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark de la taille des données envoyées à la carte lors d'un changement d'année
+
+Usage : python -m benchmarks.bench_map_payload [--features 200000] [--establishments 10000]
+
+Compare, sur un GeoJSON synthétique, le FeatureCollection complet envoyé auparavant avec les données
+compactes (dictionnaire des formations, codes entiers, coordonnées quantifiées) pour une vue de
+tous les établissements et pour la vue nationale regroupée en clusters. Les tailles sont données
+brutes et compressées en gzip (comme avec une compression HTTP).
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+
+from benchmarks.synthetic import write_synthetic_geojson
+from src.utils.clustering import ClusterIndex
+from src.utils.geojson_index import group_by_year
+from src.utils.geojson_stream import iter_geojson_features
+from src.utils.map_payload import build_formation_dictionary, encode_compact, encode_geojson
+
+WHOLE_WORLD = [[-85.0, -180.0], [85.0, 180.0]]
+# Identifiant de partition de la forme de ceux de l'index du GeoJSON (année et empreinte md5)
+PARTITION_ID = "2023_" + "0" * 32
+
+
+def _sizes(payload) -> tuple:
+    """Retourne la taille en Ko du JSON d'un payload, brut et compressé"""
+    serialized = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    return len(serialized) / 1024, len(gzip.compress(serialized)) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=200000)
+    parser.add_argument("--establishments", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "synthetic.geojson")
+        write_synthetic_geojson(file_path, args.features, args.establishments)
+        features = list(group_by_year(iter_geojson_features(file_path)).get("2023", {}).values())
+
+    cluster_index = ClusterIndex([f["latitude"] for f in features], [f["longitude"] for f in features])
+    dictionary, codes = build_formation_dictionary(features)
+    all_points = list(range(len(features)))
+    clusters, points = cluster_index.query(None, 6)
+
+    rows = [
+        ("avant : GeoJSON, tous les établissements", encode_geojson(features, [], all_points)),
+        ("compact, tous les établissements", encode_compact(features, codes, [], all_points, 2023, PARTITION_ID)),
+        ("GeoJSON, vue nationale en clusters (zoom 6)", encode_geojson(features, clusters, points.tolist())),
+        ("compact, vue nationale en clusters (zoom 6)", encode_compact(features, codes, clusters, points.tolist(), 2023, PARTITION_ID)),
+        ("dictionnaire des formations (une fois par partition)", {"year": 2023, "partition_id": PARTITION_ID, "formations": dictionary}),
+    ]
+
+    print(f"{len(features)} établissements, {sum(len(c) for c in codes)} formations")
+    print(f"{'données':<50} {'brut (Ko)':>10} {'gzip (Ko)':>10}")
+    for label, payload in rows:
+        raw, compressed = _sizes(payload)
+        print(f"{label:<50} {raw:>10.1f} {compressed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark du temps d'import de main.py et du démarrage de l'application, comparé au budget
+
+Usage : python -m benchmarks.bench_startup [--repeat 5] [--cold]
+
+Chaque mesure est faite dans un nouveau processus Python. Avec --cold, le démarrage est aussi mesuré sans
+données dérivées (fichier Feather et index de la carte à construire), dans un dossier temporaire.
+Le script se termine en erreur si une médiane dépasse son budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Budgets de démarrage, en secondes (données dérivées déjà construites)
+IMPORT_BUDGET = 2.5
+CREATE_APP_BUDGET = 0.1
+READY_BUDGET = 2.0
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app(sys.argv[1])
+created = time.perf_counter()
+client = app.server.test_client()
+while client.get("/ready").status_code != 200:
+    if main.data_loading["error"]:
+        raise SystemExit(main.data_loading["error"])
+    time.sleep(0.01)
+ready = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": created - imported, "ready": ready - imported}))
+"""
+
+
+def measure(mode: str, cwd: Path) -> dict:
+    """Lance un nouveau processus qui importe main, crée l'application et attend /ready ; retourne les durées"""
+    env = {**os.environ, "PYTHONPATH": str(REPO_DIR)}
+    result = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT, mode], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(label: str, runs: list) -> dict:
+    """Affiche les médianes d'une série de mesures et les retourne"""
+    medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    print(f"{label:<28} {medians['import']:>10.3f} {medians['create_app']:>12.3f} {medians['ready']:>10.3f}")
+    return medians
+
+
+def _cold_copy(target: Path) -> None:
+    """Prépare un dossier avec les données brutes du dépôt mais sans données dérivées"""
+    (target / "data" / "raw").mkdir(parents=True)
+    for raw_file in (REPO_DIR / "data" / "raw").iterdir():
+        if raw_file.is_file():
+            (target / "data" / "raw" / raw_file.name).symlink_to(raw_file.resolve())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="mesurer aussi le démarrage sans données dérivées")
+    args = parser.parse_args()
+
+    # Une première exécution construit les données dérivées si besoin (non mesurée)
+    measure("sync", REPO_DIR)
+
+    print(f"{'mode':<28} {'import (s)':>10} {'create_app (s)':>12} {'ready (s)':>10}")
+    results = {mode: report(mode, [measure(mode, REPO_DIR) for _ in range(args.repeat)])
+               for mode in ("background", "sync", "lazy")}
+
+    if args.cold:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            _cold_copy(Path(temp_dir))
+            report("background (sans index)", [measure("background", Path(temp_dir))])
+
+    over_budget = []
+    if results["background"]["import"] > IMPORT_BUDGET:
+        over_budget.append(f"import {results['background']['import']:.3f} s > {IMPORT_BUDGET} s")
+    if results["background"]["create_app"] > CREATE_APP_BUDGET:
+        over_budget.append(f"create_app {results['background']['create_app']:.3f} s > {CREATE_APP_BUDGET} s")
+    if results["background"]["ready"] > READY_BUDGET:
+        over_budget.append(f"ready {results['background']['ready']:.3f} s > {READY_BUDGET} s")
+
+    if over_budget:
+        print("Budget dépassé : " + ", ".join(over_budget))
+        sys.exit(1)
+    print(f"Budget respecté (import < {IMPORT_BUDGET} s, create_app < {CREATE_APP_BUDGET} s, ready < {READY_BUDGET} s).")
+
+
+if __name__ == "__main__":
+    main()
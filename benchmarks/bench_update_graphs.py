@@ -0,0 +1,55 @@
+"""Benchmark de la latence du callback update_graphs quand le dataset grandit
+
+Usage : python -m benchmarks.bench_update_graphs [--factors 1 10 100] [--repeat 20]
+
+Pour chaque taille, on mesure l'extraction du groupe (index (formation, année) contre masque booléen
+sur tout le tableau, comme avant) et le callback complet (extraction + graphique en barres + heatmap).
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.synthetic import scale_spe_data
+from src.components.graphs import generate_double_bar_chart, generate_heatmap
+from src.utils.spe_store import load_spe_data, build_group_index, get_group
+
+SPE_JSON_FILE_PATH = "./data/raw/fr-esr-parcoursup-enseignements-de-specialite-bacheliers-generaux-2.json"
+
+
+def _median_ms(function, repeat: int) -> float:
+    """Retourne la durée médiane d'un appel, en millisecondes"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    base_df = load_spe_data(SPE_JSON_FILE_PATH)
+    formation, annee = base_df['formation'].iloc[0], 2023
+
+    print(f"{'facteur':>8} {'lignes':>10} {'masque (ms)':>12} {'index (ms)':>11} {'callback (ms)':>14}")
+    for factor in args.factors:
+        df, group_index = build_group_index(scale_spe_data(base_df, factor))
+
+        mask_ms = _median_ms(lambda: df[(df['formation'] == formation) & (df['annee_du_bac'] == annee)], args.repeat)
+        index_ms = _median_ms(lambda: get_group(df, group_index, formation, annee), args.repeat)
+
+        def callback():
+            groupe = get_group(df, group_index, formation, annee)
+            generate_double_bar_chart(groupe, formation, annee)
+            generate_heatmap(groupe, formation, annee)
+
+        callback_ms = _median_ms(callback, args.repeat)
+        print(f"{factor:>8} {len(df):>10} {mask_ms:>12.3f} {index_ms:>11.3f} {callback_ms:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
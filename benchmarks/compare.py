@@ -0,0 +1,76 @@
+"""Comparaison de deux résultats de la suite de benchmarks (benchmarks/results/<commit>.json)
+
+Usage : python -m benchmarks.compare ancien.json nouveau.json [--threshold 0.2]
+
+Affiche, pour chaque cas et facteur mesurés dans les deux fichiers, l'évolution de la latence médiane,
+du pic de mémoire et de la taille du résultat. Le script se termine en erreur si l'une d'elles augmente de
+plus du seuil (20 % par défaut) ; les très petites valeurs sont ignorées, leurs variations étant du bruit.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# Métriques comparées, avec la valeur en dessous de laquelle une augmentation n'est pas signalée
+METRICS = {
+    'p50_ms': 1.0,
+    'peak_kb': 256.0,
+    'payload_bytes': 1024,
+}
+
+
+def load_results(file_path: str) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    """Charge un fichier de résultats, indexé par (cas, facteur)"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        report = json.load(file)
+    return {(result['case'], result['factor']): result for result in report['results']}
+
+
+def compare(old: Dict[Tuple[str, int], Dict[str, Any]], new: Dict[Tuple[str, int], Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """Affiche l'évolution des métriques communes et retourne la liste des régressions
+
+    Args:
+        old (Dict[Tuple[str, int], Dict[str, Any]]): Les résultats de référence
+        new (Dict[Tuple[str, int], Dict[str, Any]]): Les nouveaux résultats
+        threshold (float): L'augmentation relative au-delà de laquelle une métrique régresse
+
+    Returns:
+        List[str]: Les régressions, une par cas et par métrique
+    """
+    regressions = []
+    print(f"{'cas':<45} {'facteur':>7} " + " ".join(f"{metric:>22}" for metric in METRICS))
+    for key in sorted(old.keys() & new.keys(), key=lambda key: (key[1], key[0])):
+        case, factor = key
+        cells = []
+        for metric, floor in METRICS.items():
+            before, after = old[key][metric], new[key][metric]
+            change = (after - before) / before if before else 0.0
+            cells.append(f"{before:>9.1f} -> {after:>9.1f}{'!' if change > threshold and after > floor else ' '}")
+            if change > threshold and after > floor:
+                regressions.append(f"{case} x{factor} : {metric} {before:.1f} -> {after:.1f} (+{change:.0%})")
+        print(f"{case:<45} {'x' + str(factor):>7} " + " ".join(cells))
+
+    for case, factor in sorted(old.keys() - new.keys()):
+        print(f"{case} x{factor} : absent des nouveaux résultats")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.2, help="augmentation relative tolérée (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    regressions = compare(load_results(args.old), load_results(args.new), args.threshold)
+    if regressions:
+        print("Régressions :")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"Aucune régression au-delà de {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
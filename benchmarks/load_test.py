@@ -0,0 +1,450 @@
+"""Test de charge : des utilisateurs simulés envoient des requêtes de callbacks Dash à une instance de l'application
+
+Usage : python -m benchmarks.load_test [--concurrency 1 2 4 8 16] [--duration 20] [--server dash|gunicorn] [--workers 2]
+        [--mix annee=0.15,formation=0.25,carte=0.3,clic=0.2,recherche=0.1] [--api-delay 0.05] [--api-error-rate 0.0] [--output fichier.json]
+        python -m benchmarks.load_test --url http://127.0.0.1:8050 (instance déjà lancée)
+
+Sans --url, l'application est lancée dans data/processed/load_test/ (données brutes du dépôt, caches et miroir vides),
+avec l'API Parcoursup simulée de benchmarks/stub_api.py : les caches de l'application ne sont pas modifiés.
+
+Chaque utilisateur enchaîne, sans temps de réflexion par défaut, des actions tirées selon le mélange --mix,
+comme dans le navigateur :
+- annee : déplacement du slider (dictionnaire et données de la carte, graphiques, établissement affiché) ;
+- formation : saisie du début du nom d'une formation puis choix dans la liste (recherche, graphiques, évolution
+  sur plusieurs années) ;
+- carte : zoom sur un cluster visible, ou retour à la vue de la France (données de la carte) ;
+- clic : clic sur un établissement visible (données de l'établissement, premier onglet de formation, puis
+  établissements proches qui proposent sa première formation) ;
+- recherche : saisie du début du nom d'un établissement visible puis choix dans la liste (recherche, sélection,
+  puis les requêtes d'un clic).
+Les requêtes d'une action sont envoyées l'une après l'autre. Pour chaque niveau de concurrence, le script affiche
+le débit, les percentiles de latence des requêtes et le taux d'erreur (réponses HTTP en erreur, délais dépassés,
+et réponses dégradées quand l'API est indisponible).
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import requests
+
+from benchmarks.stub_api import base_url, serve_in_thread
+from src.utils.spe_store import load_spe_data
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+WORK_DIR = REPO_DIR / "data" / "processed" / "load_test"
+SPE_JSON_FILE_PATH = REPO_DIR / "data" / "raw" / "fr-esr-parcoursup-enseignements-de-specialite-bacheliers-generaux-2.json"
+
+YEARS = [2021, 2022, 2023]
+FRANCE_VIEW = {'bounds': [[41.0, -5.5], [51.5, 10.0]], 'zoom': 6}
+MAX_ZOOM = 15
+# Taille de la carte dans la page, en pixels, pour calculer la zone visible à un niveau de zoom
+MAP_WIDTH, MAP_HEIGHT = 1000, 500
+DEFAULT_MIX = "annee=0.15,formation=0.25,carte=0.3,clic=0.2,recherche=0.1"
+# Message affiché par fetch_api_data et render_formation_tab quand l'API Parcoursup ne répond pas
+DEGRADED_MESSAGE = "momentanément indisponibles"
+REQUEST_TIMEOUT = 30
+
+SERVER_SCRIPT = """
+import sys
+import main
+app = main.create_app("sync")
+app.run(host="127.0.0.1", port=int(sys.argv[1]), debug=False, threaded=True)
+"""
+
+
+def dash_payload(outputs: List[tuple], inputs: List[tuple], state: List[tuple] = (), changed: List[str] = ()) -> Dict[str, Any]:
+    """Construit le corps d'une requête /_dash-update-component, comme le fait dash-renderer
+
+    Args:
+        outputs (List[tuple]): Les sorties du callback (id, propriété), ou (id, propriété, True) pour une sortie
+            partagée avec un autre callback (allow_duplicate)
+        inputs (List[tuple]): Les entrées (id, propriété, valeur)
+        state (List[tuple]): Les états (id, propriété, valeur)
+        changed (List[str]): Les propriétés modifiées ("id.propriété")
+
+    Returns:
+        Dict[str, Any]: Le corps JSON de la requête
+    """
+    # Une sortie partagée est identifiée par sa propriété suivie de l'empreinte des entrées du callback
+    inputs_hash = hashlib.sha256(".".join(f"{input_id}.{prop}" for input_id, prop, _ in inputs).encode('utf-8')).hexdigest()
+    properties = [f"{output[1]}@{inputs_hash}" if output[2:] == (True,) else output[1] for output in outputs]
+    output_specs = [{'id': output[0], 'property': prop} for output, prop in zip(outputs, properties)]
+    if len(outputs) == 1:
+        output = f"{outputs[0][0]}.{properties[0]}"
+    else:
+        output = ".." + "...".join(f"{output[0]}.{prop}" for output, prop in zip(outputs, properties)) + ".."
+    return {
+        'output': output,
+        'outputs': output_specs[0] if len(outputs) == 1 else output_specs,
+        'inputs': [{'id': input_id, 'property': prop, 'value': value} for input_id, prop, value in inputs],
+        'state': [{'id': state_id, 'property': prop, 'value': value} for state_id, prop, value in state],
+        'changedPropIds': list(changed),
+    }
+
+
+def view_bounds(latitude: float, longitude: float, zoom: int) -> List[List[float]]:
+    """Retourne les limites [[sud, ouest], [nord, est]] de la carte centrée sur un point à un niveau de zoom"""
+    degrees_per_pixel = 360 / (256 * 2 ** zoom)
+    half_width = MAP_WIDTH * degrees_per_pixel / 2
+    half_height = MAP_HEIGHT * degrees_per_pixel * math.cos(math.radians(latitude)) / 2
+    return [[latitude - half_height, longitude - half_width], [latitude + half_height, longitude + half_width]]
+
+
+def decode_coordinates(deltas: List[int], scale: int) -> List[float]:
+    """Décode les coordonnées compactes de encode_compact (différences successives d'entiers)"""
+    return (np.cumsum(deltas, dtype=np.int64) / scale).tolist()
+
+
+class VirtualUser:
+    """Utilisateur simulé : garde l'état de sa page (année, formation, vue de la carte, établissement affiché)"""
+
+    def __init__(self, url: str, formations: List[str], mix: Dict[str, float], record: callable, seed: int):
+        self.url = url.rstrip("/") + "/_dash-update-component"
+        self.formations = formations
+        self.mix = mix
+        self.record = record
+        self.rnd = random.Random(seed)
+        self.session = requests.Session()
+        self.year = YEARS[-1]
+        self.formation = formations[0]
+        self.view = dict(FRANCE_VIEW)
+        self.clusters, self.points = [], []
+        # Dictionnaire des formations de la carte envoyé par update_map_dictionary (année, partition et noms)
+        self.map_formations = {'year': None, 'partition_id': None, 'formations': []}
+        self.establishment = None
+
+    def post(self, callback_name: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Envoie une requête de callback, enregistre sa latence et son résultat, et retourne la réponse décodée"""
+        start = time.perf_counter()
+        status, body = 'erreur', None
+        try:
+            response = self.session.post(self.url, json=payload, timeout=REQUEST_TIMEOUT)
+            # 204 : le callback a levé PreventUpdate
+            if response.status_code == 204:
+                status = 'ok'
+            elif response.status_code == 200:
+                status = 'dégradé' if DEGRADED_MESSAGE in response.text else 'ok'
+                body = response.json()
+        except requests.exceptions.RequestException:
+            pass
+        self.record(callback_name, time.perf_counter() - start, status)
+        return body
+
+    def load_page(self) -> None:
+        """Callbacks envoyés au chargement de la page"""
+        self.change_year(self.year)
+        self.change_formation(self.formation)
+
+    def change_year(self, year: int) -> None:
+        self.year = year
+        self.update_map()
+        self.update_graphs(changed="year-slider.value")
+        self.update_top_doublettes(changed="year-slider.value")
+        if self.establishment is not None:
+            self.click(self.establishment, changed="year-slider.value")
+
+    def search_formation(self, formation: str) -> None:
+        """Saisit le début du nom d'une formation (ses deux premiers mots, le second en partie) puis la choisit"""
+        words = formation.split()
+        self.post("search_formations", dash_payload(
+            [("formation-dropdown", "options")], [("formation-dropdown", "search_value", " ".join(words[:2])[:len(words[0]) + 4])],
+            state=[("formation-dropdown", "value", self.formation)], changed=["formation-dropdown.search_value"]))
+        self.change_formation(formation)
+
+    def change_formation(self, formation: str) -> None:
+        self.formation = formation
+        self.update_graphs(changed="formation-dropdown.value")
+        self.update_top_doublettes(changed="formation-dropdown.value")
+        self.post("update_trend_chart", dash_payload(
+            [("trend-chart", "figure")], [("formation-dropdown", "value", formation)], changed=["formation-dropdown.value"]))
+
+    def update_graphs(self, changed: str) -> None:
+        self.post("update_graphs", dash_payload(
+            [("bar-chart", "figure"), ("heatmap", "figure")],
+            [("formation-dropdown", "value", self.formation), ("year-slider", "value", self.year)],
+            changed=[changed]))
+
+    def update_top_doublettes(self, changed: str) -> None:
+        self.post("update_top_doublettes", dash_payload(
+            [("top-doublettes-chart", "figure")],
+            [("formation-dropdown", "value", self.formation), ("year-slider", "value", self.year)],
+            changed=[changed]))
+
+    def update_map(self) -> None:
+        body = self.post("update_geojson_data", dash_payload(
+            [("map-payload", "data")],
+            [("year-slider", "value", self.year), ("map", "bounds", self.view['bounds']), ("map", "zoom", self.view['zoom'])],
+            changed=["map.bounds"]))
+        if body is None:
+            return
+        data = body['response']['map-payload']['data']
+        # Comme payloadPartition (assets/map_clusters.js) : le dictionnaire n'est demandé que si la partition change
+        partition = {'year': data['year'], 'partition_id': data['partition_id']}
+        if (self.map_formations['year'], self.map_formations['partition_id']) != (partition['year'], partition['partition_id']):
+            dictionary = self.post("update_map_dictionary", dash_payload(
+                [("map-formations", "data")], [("map-partition", "data", partition)], changed=["map-partition.data"]))
+            if dictionary is not None:
+                self.map_formations = dictionary['response']['map-formations']['data']
+        clusters, points = data['clusters'], data['points']
+        self.clusters = list(zip(decode_coordinates(clusters['lat'], data['scale']),
+                                 decode_coordinates(clusters['lon'], data['scale'])))
+        self.points = list(zip(decode_coordinates(points['lat'], data['scale']),
+                               decode_coordinates(points['lon'], data['scale']), points['uai'], points['nom'],
+                               [[self.map_formations['formations'][code] for code in codes] if self.map_formations['partition_id'] == data['partition_id'] else []
+                                for codes in points['f']]))
+
+    def move_map(self) -> None:
+        """Zoome sur un cluster visible, ou revient à la vue de la France"""
+        if self.clusters and self.view['zoom'] < MAX_ZOOM:
+            latitude, longitude = self.rnd.choice(self.clusters)
+            zoom = self.view['zoom'] + 2
+            self.view = {'bounds': view_bounds(latitude, longitude, zoom), 'zoom': zoom}
+        else:
+            self.view = dict(FRANCE_VIEW)
+        self.update_map()
+
+    def click(self, point: tuple, changed: str = "geojson-layer.clickData") -> None:
+        latitude, longitude, cod_uai, _, formations = point
+        self.establishment = point
+        feature = {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [longitude, latitude]},
+                   'properties': {'etab_uai': cod_uai}}
+        self.post("fetch_api_data", dash_payload(
+            [("api-result-container", "children")],
+            [("geojson-layer", "clickData", feature), ("year-slider", "value", self.year)], changed=[changed]))
+        # L'onglet de la première formation est construit quand les onglets s'affichent
+        self.post("render_formation_tab", dash_payload(
+            [("formation-tab-content", "children")], [("formation-tabs", "value", "tab-0")],
+            state=[("establishment-key", "data", {'year': self.year, 'cod_uai': cod_uai})],
+            changed=["formation-tabs.value"]))
+        # Les établissements proches sont cherchés pour la première formation de l'établissement
+        if formations:
+            self.post("update_nearby_establishments", dash_payload(
+                [("nearby-results", "children")], [("nearby-formation", "value", formations[0]), ("nearby-radius", "value", 20)],
+                state=[("establishment-key", "data", {'year': self.year, 'cod_uai': cod_uai})],
+                changed=["nearby-formation.value"]))
+
+    def search_establishment(self, point: tuple) -> None:
+        """Saisit le début du nom d'un établissement, le choisit dans la liste puis affiche ses données comme un clic"""
+        latitude, longitude, cod_uai, name, _ = point
+        self.post("search_establishments", dash_payload(
+            [("establishment-search", "options")], [("establishment-search", "search_value", name[:8])],
+            state=[("year-slider", "value", self.year), ("establishment-search", "value", None)],
+            changed=["establishment-search.search_value"]))
+        self.post("select_establishment", dash_payload(
+            [("geojson-layer", "clickData"), ("map", "viewport", True)], [("establishment-search", "value", cod_uai)],
+            state=[("year-slider", "value", self.year)], changed=["establishment-search.value"]))
+        self.click(point)
+
+    def act(self) -> None:
+        """Exécute une action tirée selon le mélange"""
+        action = self.rnd.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if action == "annee":
+            self.change_year(self.rnd.choice([year for year in YEARS if year != self.year]))
+        elif action == "formation":
+            self.search_formation(self.rnd.choice(self.formations))
+        elif action == "clic" and self.points:
+            self.click(self.rnd.choice(self.points))
+        elif action == "recherche" and self.points:
+            self.search_establishment(self.rnd.choice(self.points))
+        else:
+            # Sans établissement visible, l'utilisateur déplace la carte pour en trouver un
+            self.move_map()
+
+
+class Recorder:
+    """Enregistre les latences et les résultats des requêtes, par callback, pour un niveau de concurrence"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, int] = {'ok': 0, 'dégradé': 0, 'erreur': 0}
+        self.actions = 0
+
+    def __call__(self, callback_name: str, seconds: float, status: str) -> None:
+        with self.lock:
+            self.latencies.setdefault(callback_name, []).append(seconds)
+            self.statuses[status] += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        """Retourne le débit, les percentiles de latence (ms) et les taux d'erreur, au total et par callback"""
+        def percentiles(values: List[float]) -> Dict[str, float]:
+            milliseconds = np.asarray(values) * 1000
+            return {f"p{q}_ms": float(np.percentile(milliseconds, q)) for q in (50, 95, 99)} | {'max_ms': float(milliseconds.max())}
+
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        requests_count = len(all_latencies)
+        return {
+            'actions_per_s': self.actions / duration,
+            'requests_per_s': requests_count / duration,
+            'requests': requests_count,
+            'error_rate': self.statuses['erreur'] / requests_count if requests_count else 0.0,
+            'degraded_rate': self.statuses['dégradé'] / requests_count if requests_count else 0.0,
+            **(percentiles(all_latencies) if all_latencies else {}),
+            'callbacks': {name: {'requests': len(values), **percentiles(values)} for name, values in sorted(self.latencies.items())},
+        }
+
+
+def run_level(url: str, users: int, duration: float, formations: List[str], mix: Dict[str, float],
+              think_time: float, seed: int) -> Dict[str, Any]:
+    """Fait tourner users utilisateurs simulés pendant duration secondes et retourne le résumé de la mesure"""
+    recorder = Recorder()
+    stop = threading.Event()
+
+    def run_user(index: int) -> None:
+        user = VirtualUser(url, formations, mix, recorder, seed + index)
+        user.load_page()
+        while not stop.is_set():
+            user.act()
+            with recorder.lock:
+                recorder.actions += 1
+            if think_time:
+                stop.wait(user.rnd.expovariate(1 / think_time))
+
+    threads = [threading.Thread(target=run_user, args=(index,), daemon=True) for index in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {'users': users, **recorder.summary(time.perf_counter() - start)}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Lit un mélange d'actions de la forme annee=0.15,formation=0.25,carte=0.3,clic=0.2,recherche=0.1"""
+    weights = {}
+    for item in mix.split(","):
+        action, weight = item.split("=")
+        if action not in ("annee", "formation", "carte", "clic", "recherche"):
+            raise ValueError(f"Action inconnue : {action} (annee, formation, carte, clic ou recherche)")
+        weights[action] = float(weight)
+    return weights
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_work_dir(keep_cache: bool) -> None:
+    """Prépare le dossier de l'instance testée : données brutes du dépôt, caches et miroir vides
+
+    Le fichier Feather et l'index de la carte sont gardés d'une exécution à l'autre, ils ne dépendent que des données.
+    """
+    raw_dir = WORK_DIR / "data" / "raw"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    for raw_file in (REPO_DIR / "data" / "raw").iterdir():
+        link = raw_dir / raw_file.name
+        if raw_file.is_file() and not link.exists():
+            link.symlink_to(raw_file.resolve())
+    if not keep_cache:
+        processed_dir = WORK_DIR / "data" / "processed"
+        shutil.rmtree(processed_dir / "flask_cache", ignore_errors=True)
+        for cache_file in processed_dir.glob("api_cache.sqlite*"):
+            cache_file.unlink()
+
+
+def start_server(server: str, workers: int, api_url: str) -> tuple:
+    """Lance l'application dans WORK_DIR, avec le serveur de développement de Dash ou gunicorn, et attend /ready
+
+    Returns:
+        tuple: Le processus et l'URL de l'application
+    """
+    port = free_port()
+    env = {**os.environ, 'PYTHONPATH': str(REPO_DIR), 'PARCOURSUP_API_URL': api_url}
+    if server == "gunicorn":
+        env.update(PARCOURSUP_BIND=f"127.0.0.1:{port}", PARCOURSUP_WORKERS=str(workers))
+        command = [sys.executable, "-m", "gunicorn", "-c", str(REPO_DIR / "gunicorn.conf.py"), "wsgi:server"]
+    else:
+        command = [sys.executable, "-c", SERVER_SCRIPT, str(port)]
+    process = subprocess.Popen(command, cwd=WORK_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"L'application s'est arrêtée au démarrage (code {process.returncode})")
+        try:
+            if requests.get(url + "/ready", timeout=1).status_code == 200:
+                return process, url
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("L'application n'est pas prête après 300 s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=20, help="durée de chaque niveau, en secondes")
+    parser.add_argument("--warmup", type=float, default=5, help="durée de la mise en route non mesurée, en secondes")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--think-time", type=float, default=0.0, help="temps de réflexion moyen entre deux actions, en secondes")
+    parser.add_argument("--url", help="URL d'une instance déjà lancée (sinon, une instance est lancée)")
+    parser.add_argument("--server", choices=["dash", "gunicorn"], default="dash")
+    parser.add_argument("--workers", type=int, default=2, help="nombre de workers gunicorn")
+    parser.add_argument("--api-delay", type=float, default=0.05, help="latence de l'API simulée, en secondes")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="taux de réponses 503 de l'API simulée")
+    parser.add_argument("--keep-cache", action="store_true", help="garder les caches de l'instance lancée")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON où enregistrer les résultats")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    formations = load_spe_data(str(SPE_JSON_FILE_PATH))['formation'].cat.categories.tolist()
+
+    process, url = None, args.url
+    if url is None:
+        api_server = serve_in_thread(delay=args.api_delay, error_rate=args.api_error_rate)
+        prepare_work_dir(args.keep_cache)
+        process, url = start_server(args.server, args.workers, base_url(api_server))
+        print(f"Application lancée sur {url} ({args.server}{f', {args.workers} workers' if args.server == 'gunicorn' else ''}), "
+              f"API simulée sur {base_url(api_server)}")
+
+    try:
+        if args.warmup:
+            run_level(url, 1, args.warmup, formations, mix, args.think_time, args.seed)
+
+        print(f"{'utilisateurs':>12} {'actions/s':>10} {'requêtes/s':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+              f"{'p99 (ms)':>9} {'max (ms)':>9} {'erreurs':>8} {'dégradées':>10}")
+        levels = []
+        for users in args.concurrency:
+            level = run_level(url, users, args.duration, formations, mix, args.think_time, args.seed)
+            levels.append(level)
+            print(f"{users:>12} {level['actions_per_s']:>10.1f} {level['requests_per_s']:>11.1f} "
+                  f"{level.get('p50_ms', 0):>9.1f} {level.get('p95_ms', 0):>9.1f} {level.get('p99_ms', 0):>9.1f} "
+                  f"{level.get('max_ms', 0):>9.1f} {level['error_rate']:>8.1%} {level['degraded_rate']:>10.1%}")
+
+        print("\nLatence par callback au dernier niveau :")
+        for name, stats in levels[-1]['callbacks'].items():
+            print(f"  {name:<30} {stats['requests']:>7} requêtes  p50 {stats['p50_ms']:>8.1f} ms  p99 {stats['p99_ms']:>8.1f} ms")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'server': args.server if not args.url else args.url, 'workers': args.workers, 'mix': mix,
+                       'api_delay': args.api_delay, 'api_error_rate': args.api_error_rate, 'levels': levels},
+                      file, ensure_ascii=False, indent=2)
+        print(f"Résultats enregistrés dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Serveur HTTP local qui imite l'API Explore v2.1 pour les datasets fr-esr-parcoursup_{année}
+
+Usage : python -m benchmarks.stub_api [--port 8060] [--delay 0.05] [--error-rate 0.0]
+puis lancer l'application avec PARCOURSUP_API_URL=http://127.0.0.1:8060/api/explore/v2.1
+
+Les réponses sont générées de façon déterministe à partir du code UAI demandé. Comme l'API réelle,
+le serveur renvoie 10 résultats par défaut et au plus 100 par page (paramètres limit et offset).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+RECORDS_PATH = re.compile(r"^/api/explore/v2\.1/catalog/datasets/fr-esr-parcoursup_(\d{4})/records$")
+UAI_FILTER = re.compile(r'cod_uai\s+LIKE\s+"([^"]+)"')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+def make_records(year: int, cod_uai: str) -> List[Dict[str, Any]]:
+    """Génère les formations d'un établissement pour une session, toujours les mêmes pour un même code UAI"""
+    rnd = random.Random(zlib.crc32(f"{year}:{cod_uai}".encode('utf-8')))
+    records = []
+    for i in range(rnd.randint(1, 60)):
+        voe_tot = rnd.randint(50, 3000)
+        acc_tot = rnd.randint(10, 60)
+        acc = [rnd.randint(0, acc_tot // 4) for _ in range(4)]
+        records.append({
+            'session': str(year), 'cod_uai': cod_uai, 'g_ea_lib_vx': f"Établissement {cod_uai}",
+            'dep': "75", 'dep_lib': "Paris", 'acad_mies': "Paris", 'region_etab_aff': "Ile-de-France",
+            'ville_etab': "Paris", 'lib_for_voe_ins': f"BTS - Formation {i}", 'form_lib_voe_acc': f"Formation {i}",
+            'select_form': rnd.choice(["formation sélective", "formation non sélective"]),
+            'capa_fin': acc_tot, 'voe_tot': voe_tot, 'voe_tot_f': rnd.randint(0, voe_tot),
+            'nb_voe_pp_bg': voe_tot // 2, 'nb_voe_pp_bt': voe_tot // 4, 'nb_voe_pp_bp': voe_tot // 8,
+            'nb_voe_pp_at': voe_tot // 8, 'prop_tot_bg': acc[0] * 3, 'prop_tot_bt': acc[1] * 3,
+            'prop_tot_bp': acc[2] * 3, 'prop_tot_at': acc[3] * 3, 'acc_tot': sum(acc),
+            'acc_tot_f': sum(acc) // 2, 'acc_bg': acc[0], 'acc_bt': acc[1], 'acc_bp': acc[2], 'acc_at': acc[3],
+            'acc_mention_nonrenseignee': 0, 'acc_sansmention': acc[0], 'acc_ab': acc[1], 'acc_b': acc[2],
+            'acc_tb': acc[3], 'acc_tbf': 0, 'ran_grp1': rnd.randint(1, voe_tot),
+            'lien_form_psup': f"https://dossierappel.parcoursup.fr/Candidats/public/fiches/afficherFicheFormation?g_ta_cod={i}",
+        })
+    return records
+
+
+def make_handler(delay: float = 0.0, error_rate: float = 0.0):
+    """Crée la classe de gestion des requêtes du serveur, avec un délai et un taux d'erreur 503 simulés"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            match = RECORDS_PATH.match(url.path)
+            if match is None:
+                return self._send(404, {"error": "not found"})
+
+            time.sleep(delay)
+            if error_rate and random.random() < error_rate:
+                return self._send(503, {"error": "service unavailable"})
+
+            params = parse_qs(url.query)
+            uai_match = UAI_FILTER.search(params.get('where', [''])[0])
+            records = make_records(int(match.group(1)), uai_match.group(1)) if uai_match else []
+
+            limit = min(int(params.get('limit', [DEFAULT_LIMIT])[0]), MAX_LIMIT)
+            offset = int(params.get('offset', [0])[0])
+            self._send(200, {"total_count": len(records), "results": records[offset:offset + limit]})
+
+        def _send(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def serve_in_thread(port: int = 0, delay: float = 0.0, error_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Démarre le serveur dans un thread et le retourne ; son URL de base est base_url(server)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(delay, error_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    """Retourne l'URL à utiliser comme PARCOURSUP_API_URL pour un serveur démarré"""
+    return f"http://127.0.0.1:{server.server_address[1]}/api/explore/v2.1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8060, help="port du serveur (8050 est celui de l'application)")
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.delay, args.error_rate))
+    print(f"API Parcoursup simulée sur http://127.0.0.1:{args.port}/api/explore/v2.1")
+    server.serve_forever()
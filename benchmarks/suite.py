@@ -0,0 +1,295 @@
+"""Suite de benchmarks des chargements, callbacks et graphiques, sur les données du dépôt agrandies
+
+Usage : python -m benchmarks.suite [--factors 1 10 100] [--repeat 20] [--only update_graphs ...] [--output fichier.json]
+
+Pour chaque facteur d'agrandissement, les données sont générées une fois dans data/processed/benchmarks/
+(le JSON des spécialités du dépôt agrandi, un GeoJSON synthétique de GEOJSON_BASE_FEATURES × facteur features)
+puis chaque cas est mesuré : percentiles de latence, pic de mémoire Python (tracemalloc) pendant un appel et
+taille du résultat sérialisé en JSON (en mémoire pour les DataFrames). Les résultats sont enregistrés dans benchmarks/results/<commit>.json ;
+python -m benchmarks.compare compare deux de ces fichiers.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+from benchmarks.stub_api import make_records
+from benchmarks.synthetic import write_scaled_spe_json, write_synthetic_geojson
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+WORK_DIR = REPO_DIR / "data" / "processed" / "benchmarks"
+RESULTS_DIR = REPO_DIR / "benchmarks" / "results"
+SPE_JSON_FILE_PATH = REPO_DIR / "data" / "raw" / "fr-esr-parcoursup-enseignements-de-specialite-bacheliers-generaux-2.json"
+
+# Taille du GeoJSON synthétique au facteur 1 (le GeoJSON de la cartographie n'est pas livré avec le dépôt)
+GEOJSON_BASE_FEATURES = 10000
+GEOJSON_BASE_ESTABLISHMENTS = 2000
+# Taille de la réponse de l'API au facteur 1 (nombre de formations d'un établissement)
+API_BASE_RECORDS = 50
+
+ANNEE = 2023
+PARIS_BOUNDS = [[48.80, 2.25], [48.92, 2.42]]
+
+
+def payload_size(result: Any) -> int:
+    """Retourne la taille en octets du résultat sérialisé en JSON, comme envoyé au navigateur
+
+    Les DataFrames et les tableaux numpy (chargements) ne sont pas envoyés au navigateur : leur taille en mémoire est retournée.
+    """
+    if result is None:
+        return 0
+    if isinstance(result, str):
+        return len(result.encode('utf-8'))
+    if isinstance(result, np.ndarray):
+        return int(result.nbytes)
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    return len(json.dumps(result, cls=PlotlyJSONEncoder).encode('utf-8'))
+
+
+def measure(function: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """Mesure un appel : percentiles de latence sur repeat appels, pic de mémoire et taille du résultat
+
+    Args:
+        function (Callable[[], Any]): L'appel à mesurer
+        repeat (int): Le nombre d'appels chronométrés
+        setup (Optional[Callable[[], None]]): Une préparation non chronométrée avant chaque appel (vider un cache...)
+
+    Returns:
+        Dict[str, float]: Les percentiles en millisecondes, le pic de mémoire en Ko et la taille du résultat en octets
+    """
+    durations = []
+    # Les messages de chargement des fonctions mesurées ne sont pas affichés
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            function()
+            durations.append((time.perf_counter() - start) * 1000)
+
+        # Le pic de mémoire est mesuré sur un appel à part : tracemalloc ralentit les allocations
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': float(np.percentile(durations, 50)),
+        'p90_ms': float(np.percentile(durations, 90)),
+        'p99_ms': float(np.percentile(durations, 99)),
+        'max_ms': float(max(durations)),
+        'peak_kb': peak / 1024,
+        'payload_bytes': payload_size(result),
+        'repeat': repeat,
+    }
+
+
+def prepare_data(factor: int) -> Dict[str, str]:
+    """Génère (une seule fois) les données d'un facteur d'agrandissement et retourne leurs chemins"""
+    from src.utils import geojson_index
+
+    factor_dir = WORK_DIR / f"x{factor}"
+    factor_dir.mkdir(parents=True, exist_ok=True)
+
+    spe_path = factor_dir / "specialites.json"
+    if not spe_path.exists():
+        print(f"Génération du JSON des spécialités x{factor}...")
+        write_scaled_spe_json(str(SPE_JSON_FILE_PATH), str(spe_path), factor)
+
+    geojson_path = factor_dir / "cartographie.geojson"
+    if not geojson_path.exists():
+        print(f"Génération du GeoJSON x{factor}...")
+        write_synthetic_geojson(str(geojson_path), GEOJSON_BASE_FEATURES * factor,
+                                n_establishments=GEOJSON_BASE_ESTABLISHMENTS * factor)
+
+    return {
+        'spe_json': str(spe_path),
+        'spe_store': str(factor_dir / "specialites.feather"),
+        'geojson': str(geojson_path),
+        'geojson_index': str(factor_dir / geojson_index.INDEX_DIR),
+    }
+
+
+def api_pages(factor: int) -> List[Dict[str, Any]]:
+    """Construit une réponse paginée de l'API (pages de 100 formations) de API_BASE_RECORDS × facteur formations"""
+    records = []
+    establishment = 0
+    while len(records) < API_BASE_RECORDS * factor:
+        records += make_records(ANNEE, f"{establishment:07d}A")
+        establishment += 1
+    records = records[:API_BASE_RECORDS * factor]
+    return [{'total_count': len(records), 'results': records[offset:offset + 100]} for offset in range(0, len(records), 100)]
+
+
+def run_factor(factor: int, repeat: int, only: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Mesure tous les cas de la suite pour un facteur d'agrandissement"""
+    import main
+    from src.components import graphs
+    from src.components.map import fetch_data_from_geojson
+    from src.utils import geojson_index
+    from src.utils.get_data import process_api_response
+    from src.utils.spatial_index import EstablishmentLocator
+    from src.utils.spe_cube import SpeCube
+    from src.utils.spe_store import SpeDataset, get_group, load_spe_data
+
+    paths = prepare_data(factor)
+    results = []
+
+    def case(name: str, function: Callable[[], Any], setup: Optional[Callable[[], None]] = None, case_repeat: int = repeat):
+        if only and not any(name.startswith(prefix) for prefix in only):
+            return
+        measures = measure(function, case_repeat, setup)
+        results.append({'case': name, 'factor': factor, **measures})
+        print(f"{name:<45} x{factor:<4} p50 {measures['p50_ms']:>9.2f} ms  p99 {measures['p99_ms']:>9.2f} ms  "
+              f"pic {measures['peak_kb'] / 1024:>8.1f} Mo  résultat {measures['payload_bytes'] / 1024:>9.1f} Ko")
+
+    def remove_store():
+        Path(paths['spe_store']).unlink(missing_ok=True)
+
+    def remove_index():
+        shutil.rmtree(paths['geojson_index'], ignore_errors=True)
+
+    # Chargement du dataset des spécialités (main.py : SpeDataset.get au démarrage)
+    heavy_repeat = max(1, min(repeat, 3))
+    case("load_spe_data (json -> feather)", lambda: load_spe_data(paths['spe_json'], paths['spe_store']),
+         setup=remove_store, case_repeat=heavy_repeat)
+    case("load_spe_data (feather)", lambda: load_spe_data(paths['spe_json'], paths['spe_store']))
+    datasets = {}
+    case("SpeDataset.get (chargement de main.py)", lambda: datasets['spe'].get()[0],
+         setup=lambda: datasets.update(spe=SpeDataset(paths['spe_json'], paths['spe_store'])), case_repeat=heavy_repeat)
+
+    # Index et lecture de la cartographie : fetch_data_from_geojson et les callbacks de main.py lisent l'index
+    # dans son dossier par défaut, relatif au dossier courant, qui devient le dossier du facteur
+    os.chdir(Path(paths['geojson']).parent)
+    case("build_geojson_index", lambda: geojson_index.build_geojson_index(paths['geojson']),
+         setup=remove_index, case_repeat=1)
+    geojson_index.build_geojson_index(paths['geojson'])
+    case("fetch_data_from_geojson", lambda: fetch_data_from_geojson(paths['geojson'], str(ANNEE)))
+
+    # Callbacks de main.py, sur les données du facteur
+    main.geojson_file_path = paths['geojson']
+    main.spe_dataset = SpeDataset(paths['spe_json'], paths['spe_store'])
+    df, group_index, _ = main.spe_dataset.get()
+    formation = df['formation'].iloc[0]
+
+    def clear_figure_caches():
+        main.figure_cache.clear()
+        main.cache.clear()
+
+    app = main.create_app("lazy")
+    with app.server.app_context():
+        case("update_geojson_data (nouvelle année)", lambda: main.update_geojson_data(ANNEE, None, 6),
+             setup=main.get_map_year_index.cache_clear, case_repeat=heavy_repeat)
+        case("update_geojson_data (France, zoom 6)", lambda: main.update_geojson_data(ANNEE, None, 6))
+        case("update_geojson_data (Paris, zoom 13)", lambda: main.update_geojson_data(ANNEE, PARIS_BOUNDS, 13))
+        # Au-delà du dernier niveau de regroupement, les établissements visibles sont cherchés dans l'arbre k-d
+        case("update_geojson_data (Paris, zoom 16)", lambda: main.update_geojson_data(ANNEE, PARIS_BOUNDS, 16))
+        case("update_graphs (rendu)", lambda: main.update_graphs(formation, ANNEE), setup=clear_figure_caches)
+        case("update_graphs (cache)", lambda: main.update_graphs(formation, ANNEE))
+        # Recherche pendant la saisie : un préfixe partagé par beaucoup d'établissements, puis un code UAI
+        establishment = fetch_data_from_geojson(paths['geojson'], str(ANNEE))[0]
+        case("search_establishments (préfixe court)", lambda: main.search_establishments(establishment['etab_nom'][:3], ANNEE, None))
+        case("search_establishments (UAI)", lambda: main.search_establishments(establishment['etab_uai'][:5], ANNEE, None))
+        case("search_formations", lambda: main.search_formations(formation[:4], formation))
+        case("serve_layout", main.serve_layout)
+
+        # Établissements proches d'un établissement qui proposent sa première formation
+        partition_id = geojson_index.get_partition_id(paths['geojson'], str(ANNEE))
+        features, _, _, formation_codes = main.get_map_year_index(ANNEE, partition_id)
+        coordinates = ([feature['latitude'] for feature in features], [feature['longitude'] for feature in features])
+        case("EstablishmentLocator", lambda: EstablishmentLocator(*coordinates, formation_codes).tree.coords,
+             case_repeat=heavy_repeat)
+        locator, _ = main.get_establishment_locator(ANNEE, partition_id)
+        case("EstablishmentLocator.nearest (20 km)",
+             lambda: locator.nearest(establishment['latitude'], establishment['longitude'], radius_km=20)[0])
+        case("update_nearby_establishments", lambda: main.update_nearby_establishments(
+            establishment['formations'][0], 20, {'year': ANNEE, 'cod_uai': establishment['etab_uai']}))
+
+    # Fonctions de src/components/graphs.py
+    group = get_group(df, group_index, formation, ANNEE)
+    case("graphs.compute_heatmap_matrix", lambda: graphs.compute_heatmap_matrix(group))
+    case("graphs.generate_heatmap", lambda: graphs.generate_heatmap(group, formation, ANNEE))
+    case("graphs.generate_double_bar_chart", lambda: graphs.generate_double_bar_chart(group, formation, ANNEE))
+    case("graphs.render_formation_figures", lambda: graphs.render_formation_figures(group, formation, ANNEE))
+
+    # Vues multi-années, depuis le cube pré-agrégé
+    cube = main.spe_dataset.snapshot().cube
+    case("SpeCube.from_dataframe", lambda: SpeCube.from_dataframe(df).values, case_repeat=heavy_repeat)
+    case("SpeCube.trend", lambda: cube.trend(formation))
+    case("SpeCube.top_doublettes", lambda: cube.top_doublettes(formation, ANNEE))
+    case("graphs.generate_trend_chart", lambda: graphs.generate_trend_chart(cube.trend(formation), formation))
+    case("graphs.generate_top_doublettes_chart",
+         lambda: graphs.generate_top_doublettes_chart(cube.top_doublettes(formation, ANNEE), formation, ANNEE))
+
+    # Réponse de l'API et graphiques d'une formation
+    pages = api_pages(factor)
+    case("process_api_response", lambda: process_api_response(pages))
+    formation_data = process_api_response(pages)['results'][0]
+    case("graphs.generate_pie_chart", lambda: graphs.generate_pie_chart(formation_data))
+    case("graphs.create_nested_pie_chart", lambda: graphs.create_nested_pie_chart(formation_data))
+    case("graphs.generate_gender_metrics", lambda: graphs.generate_gender_metrics(formation_data))
+
+    os.chdir(REPO_DIR)
+    return results
+
+
+def get_commit() -> str:
+    """Retourne le commit courant (suffixé de -dirty si l'arbre de travail est modifié)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnu"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="+", help="ne mesurer que les cas dont le nom commence par ces préfixes")
+    parser.add_argument("--output", help="fichier de résultats (par défaut benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    commit = get_commit()
+    results = []
+    for factor in args.factors:
+        results += run_factor(factor, args.repeat, args.only)
+
+    report = {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'factors': args.factors,
+        'results': results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Résultats enregistrés dans {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
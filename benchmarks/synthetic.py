@@ -0,0 +1,84 @@
+import json
+import random
+
+YEARS = ["2021", "2022", "2023"]
+
+
+def write_synthetic_geojson(file_path: str, n_features: int, n_establishments: int = 10000, seed: int = 0) -> None:
+    """Écrit un GeoJSON de la cartographie Parcoursup synthétique, avec la même structure que l'export réel
+
+    Args:
+        file_path (str): Le chemin du fichier à écrire
+        n_features (int): Le nombre de features (une par formation et par année)
+        n_establishments (int): Le nombre d'établissements distincts
+        seed (int): La graine du générateur aléatoire
+    """
+    rnd = random.Random(seed)
+    formations = [f"BTS - Services - Formation {i}" for i in range(500)]
+
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write('{"type": "FeatureCollection", "features": [')
+        for i in range(n_features):
+            etab = rnd.randrange(n_establishments)
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [-4.5 + (etab % 997) / 110.0, 42.5 + (etab % 991) / 107.0]},
+                "properties": {
+                    "annee": rnd.choice(YEARS),
+                    "etab_uai": f"{etab:07d}A",
+                    "etab_nom": f"Lycée polyvalent n°{etab}",
+                    "tc": "Public" if etab % 3 else "Privé sous contrat d'association",
+                    "region": f"Région {etab % 13}",
+                    "departement": f"Département {etab % 101}",
+                    "commune": f"Commune {etab % 2000}",
+                    "fiche": f"https://dossierappel.parcoursup.fr/Candidats/public/fiches/afficherFicheFormation?g_ta_cod={i}",
+                    "etab_url": f"https://www.etablissement-{etab}.fr",
+                    "nm": [rnd.choice(formations)],
+                },
+            }
+            file.write(("," if i else "") + json.dumps(feature, ensure_ascii=False))
+        file.write(']}')
+
+
+def scale_spe_data(df, factor: int):
+    """Agrandit le dataset des enseignements de spécialité en dupliquant ses lignes sur des années fictives
+
+    Chaque copie est décalée de 100 ans, la taille des groupes (formation, année) ne change donc pas.
+
+    Args:
+        df (pd.DataFrame): Le dataset chargé par load_spe_data
+        factor (int): Le facteur d'agrandissement
+
+    Returns:
+        pd.DataFrame: Le dataset agrandi
+    """
+    import pandas as pd
+
+    copies = []
+    for k in range(factor):
+        copy = df.copy()
+        copy['annee_du_bac'] = (copy['annee_du_bac'] + 100 * k).astype('int16')
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def write_scaled_spe_json(source_path: str, file_path: str, factor: int) -> None:
+    """Écrit un JSON des enseignements de spécialité agrandi, au même format que le fichier brut
+
+    Comme scale_spe_data, chaque copie est décalée de 100 ans : la taille des groupes (formation, année) ne change pas.
+
+    Args:
+        source_path (str): Le chemin du JSON brut
+        file_path (str): Le chemin du fichier à écrire
+        factor (int): Le facteur d'agrandissement
+    """
+    with open(source_path, 'r', encoding='utf-8') as file:
+        rows = json.load(file)
+
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write('[')
+        for k in range(factor):
+            for i, row in enumerate(rows):
+                copy = {**row, 'annee_du_bac': str(int(row['annee_du_bac']) + 100 * k)}
+                file.write(("," if k or i else "") + json.dumps(copy, ensure_ascii=False))
+        file.write(']')
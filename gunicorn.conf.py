@@ -0,0 +1,20 @@
+"""Configuration de gunicorn pour le mode multi-workers
+
+Usage : gunicorn -c gunicorn.conf.py wsgi:server
+"""
+import multiprocessing
+import os
+
+# Les workers partagent le cache des callbacks sur disque, sauf si un autre backend est choisi (voir src/utils/cache_config.py)
+os.environ.setdefault("PARCOURSUP_CACHE", "filesystem")
+# Les données sont chargées avant le fork pour être partagées (voir create_app)
+os.environ.setdefault("PARCOURSUP_DATA_LOADING", "sync")
+
+bind = os.environ.get("PARCOURSUP_BIND", "127.0.0.1:8050")
+workers = int(os.environ.get("PARCOURSUP_WORKERS", min(4, multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.environ.get("PARCOURSUP_THREADS", 4))
+timeout = 60
+
+# L'application (et ses données en lecture seule) est chargée une seule fois dans le processus maître,
+# puis partagée par les workers après le fork
+preload_app = True
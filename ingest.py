@@ -0,0 +1,244 @@
+"""Mise à jour des données de l'application
+
+Télécharge en parallèle les datasets Parcoursup dans un dossier de préparation, les valide, construit leurs
+données dérivées (fichier Feather, index de la carte, miroir des exports) puis les publie dans data/raw.
+Une application déjà lancée utilise les nouvelles versions sans redémarrer : ses index sont identifiés par
+la version des fichiers qu'elle lit.
+
+Usage : python ingest.py [--workers 4] [--datasets specialites cartographie parcoursup_2023] [--force]
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+from src.utils.api_mirror import EXPORT_URL, MIRROR_PATH, build_mirror, get_session_version
+from src.utils.geojson_index import INDEX_DIR, build_geojson_index, get_dataset_version, load_index_manifest, remove_old_indexes
+from src.utils.geojson_stream import iter_geojson_features, iter_json_records
+from src.utils.get_data import get_data_path, get_latest_data, load_manifest, update_manifest
+from src.utils.response_cache import ResponseCache
+from src.utils.spe_store import SPE_STORE_PATH, build_spe_store, get_group_versions, get_store_version
+
+DATA_DIR = "./data/raw"
+# Les téléchargements sont faits à part : data/raw n'est remplacé qu'une fois les données validées
+STAGING_DIR = "./data/staging"
+
+SPE_URL = "https://data.enseignementsup-recherche.gouv.fr/api/explore/v2.1/catalog/datasets/fr-esr-parcoursup-enseignements-de-specialite-bacheliers-generaux-2/exports/json?lang=fr&timezone=Europe%2FBerlin"
+GEOJSON_URL = "https://data.enseignementsup-recherche.gouv.fr/api/explore/v2.1/catalog/datasets/fr-esr-cartographie_formations_parcoursup/exports/geojson?lang=fr&timezone=Europe%2FBerlin"
+MIRROR_YEARS = [2021, 2022, 2023]
+
+DEFAULT_WORKERS = 4
+
+
+def get_datasets(years: List[int] = MIRROR_YEARS) -> List[Dict[str, Any]]:
+    """Retourne la liste des datasets à mettre à jour
+
+    Chaque dataset a un nom, une URL, un type (specialites, cartographie ou export) et, pour les exports,
+    l'année de la session. Seuls les fichiers lus par l'application (publish) sont copiés dans data/raw ;
+    les exports ne servent qu'à construire le miroir.
+    """
+    datasets = [
+        {'name': 'specialites', 'url': SPE_URL, 'kind': 'specialites', 'publish': True},
+        {'name': 'cartographie', 'url': GEOJSON_URL, 'kind': 'cartographie', 'publish': True},
+    ]
+    for year in years:
+        datasets.append({'name': f"parcoursup_{year}", 'url': EXPORT_URL.format(year=year), 'kind': 'export',
+                         'year': year, 'publish': False})
+    return datasets
+
+
+def validate_specialites(path: str) -> int:
+    """Vérifie le JSON des enseignements de spécialité et retourne son nombre de lignes"""
+    df = pd.read_json(path, encoding='utf-8')
+    missing = {'annee_du_bac', 'formation', 'doublette', 'voeux', 'propositions_d_admissions', 'acceptations'} - set(df.columns)
+    if missing:
+        raise ValueError(f"colonnes manquantes : {', '.join(sorted(missing))}")
+    if df.empty:
+        raise ValueError("aucune ligne")
+    if not df['doublette'].map(lambda doublette: isinstance(doublette, list) and len(doublette) == 2).all():
+        raise ValueError("doublette de spécialités invalide")
+    return len(df)
+
+
+def validate_cartographie(path: str) -> int:
+    """Vérifie le GeoJSON de la cartographie (lu en flux) et retourne son nombre de features"""
+    count = 0
+    for feature in iter_geojson_features(path):
+        properties = feature.get('properties') or {}
+        coordinates = (feature.get('geometry') or {}).get('coordinates')
+        if not properties.get('etab_uai') or not properties.get('annee') or not properties.get('nm'):
+            raise ValueError(f"feature {count} incomplète")
+        if not coordinates or len(coordinates) != 2:
+            raise ValueError(f"feature {count} sans coordonnées")
+        count += 1
+    if count == 0:
+        raise ValueError("aucune feature")
+    return count
+
+
+def validate_export(path: str) -> int:
+    """Vérifie l'export d'une session (lu en flux) et retourne son nombre d'enregistrements"""
+    count = 0
+    for record in iter_json_records(path):
+        if not isinstance(record, dict) or 'cod_uai' not in record:
+            raise ValueError(f"enregistrement {count} sans cod_uai")
+        count += 1
+    if count == 0:
+        raise ValueError("aucun enregistrement")
+    return count
+
+
+def is_built(dataset: Dict[str, Any], path: str) -> bool:
+    """Indique si les données dérivées du fichier téléchargé sont déjà construites"""
+    version = get_dataset_version(path)
+    if dataset['kind'] == 'specialites':
+        return get_store_version(SPE_STORE_PATH) == version
+    if dataset['kind'] == 'cartographie':
+        return load_index_manifest(path, INDEX_DIR) is not None
+    return get_session_version(dataset['year'], MIRROR_PATH) == version
+
+
+def build_dataset(dataset: Dict[str, Any], path: str) -> Tuple[int, List[str]]:
+    """Valide un fichier téléchargé puis met à jour ses données dérivées (exécuté dans un processus du pool)
+
+    Chaque construction est atomique : le fichier Feather et l'index de la carte sont écrits à part puis renommés,
+    le miroir est modifié dans une transaction. Rien n'est construit si la validation échoue. Les données sont
+    comparées à la version précédente par clé naturelle : seules les partitions de l'index et les établissements
+    du miroir qui ont changé sont réécrits.
+
+    Returns:
+        Tuple[int, List[str]]: Le nombre de lignes validées et les partitions modifiées
+            (groupes formation/année, années de la carte ou codes UAI de la session)
+    """
+    if dataset['kind'] == 'specialites':
+        count = validate_specialites(path)
+        previous = get_group_versions(SPE_STORE_PATH)
+        build_spe_store(path, SPE_STORE_PATH)
+        current = get_group_versions(SPE_STORE_PATH)
+        changed = [f"{formation} ({annee})" for (formation, annee), digest in current.items() if previous.get((formation, annee)) != digest]
+        changed += [f"{formation} ({annee})" for formation, annee in previous.keys() - current.keys()]
+    elif dataset['kind'] == 'cartographie':
+        count = validate_cartographie(path)
+        published = Path(DATA_DIR) / Path(path).name
+        previous = (load_index_manifest(str(published), INDEX_DIR) if published.exists() else None) or {}
+        # Les anciens index sont supprimés seulement après la publication du nouveau fichier
+        current = build_geojson_index(path, INDEX_DIR, cleanup=False)
+        changed = sorted(year for year in current.keys() | previous.keys() if current.get(year) != previous.get(year))
+    else:
+        count = validate_export(path)
+        count, changed = build_mirror(dataset['year'], path, MIRROR_PATH)
+    return count, changed
+
+
+def publish(dataset: Dict[str, Any], path: str, target_dir: str = DATA_DIR) -> None:
+    """Remplace atomiquement le fichier de data/raw par le fichier validé
+
+    Le fichier est lié (ou copié en gardant sa date de modification) sous un nom temporaire puis renommé :
+    sa version (nom, taille, date) reste celle pour laquelle les données dérivées ont été construites.
+    """
+    source = Path(path)
+    target = Path(target_dir) / source.name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists() and get_dataset_version(str(target)) == get_dataset_version(path):
+        return
+
+    temp_path = target.with_name(f"tmp_{os.getpid()}_{source.name}")
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, target)
+
+    entry = load_manifest(STAGING_DIR).get(dataset['url'], {})
+    update_manifest(dataset['url'], target_dir, **{key: value for key, value in entry.items() if key != 'partial'})
+
+    if dataset['kind'] == 'cartographie':
+        remove_old_indexes(get_dataset_version(str(target)), INDEX_DIR)
+
+
+def download(dataset: Dict[str, Any]) -> bool:
+    """Télécharge un dataset dans le dossier de préparation s'il a changé"""
+    return get_latest_data(dataset['url'], STAGING_DIR)
+
+
+def ingest(datasets: List[Dict[str, Any]], workers: int = DEFAULT_WORKERS, force: bool = False) -> Dict[str, str]:
+    """Met à jour les datasets : téléchargements en parallèle, puis validation et construction en parallèle, puis publication
+
+    Un dataset en échec n'empêche pas la mise à jour des autres ; l'application continue alors d'utiliser
+    sa version précédente.
+
+    Args:
+        datasets (List[Dict[str, Any]]): Les datasets de get_datasets
+        workers (int): Le nombre de téléchargements et de constructions simultanés
+        force (bool): Reconstruire les données dérivées même si elles sont à jour
+
+    Returns:
+        Dict[str, str]: L'état final de chaque dataset
+    """
+    status = {}
+    started = time.perf_counter()
+
+    # 1. Téléchargements (attente réseau) dans un pool de threads
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        downloads = {dataset['name']: executor.submit(download, dataset) for dataset in datasets}
+    paths = {}
+    for dataset in datasets:
+        try:
+            changed = downloads[dataset['name']].result()
+        except Exception as error:
+            status[dataset['name']] = f"échec du téléchargement : {error}"
+            continue
+        paths[dataset['name']] = str(get_data_path(dataset['url'], STAGING_DIR))
+        print(f"[{dataset['name']}] {'nouvelle version téléchargée' if changed else 'déjà à jour'}")
+    print(f"Téléchargements terminés en {time.perf_counter() - started:.1f} s.")
+
+    # 2. Validation et construction (calcul) dans un pool de processus
+    to_build = [dataset for dataset in datasets
+                if dataset['name'] in paths and (force or not is_built(dataset, paths[dataset['name']]))]
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(to_build)))) as executor:
+        builds = {dataset['name']: executor.submit(build_dataset, dataset, paths[dataset['name']]) for dataset in to_build}
+    changes = {}
+    for dataset in to_build:
+        try:
+            count, changes[dataset['name']] = builds[dataset['name']].result()
+        except Exception as error:
+            status[dataset['name']] = f"données invalides, version précédente conservée : {error}"
+            continue
+        print(f"[{dataset['name']}] {count} lignes validées, {len(changes[dataset['name']])} partitions modifiées")
+
+    # 3. Publication des fichiers validés, puis invalidation des réponses en cache des établissements modifiés
+    response_cache = ResponseCache()
+    for dataset in datasets:
+        name = dataset['name']
+        if name not in paths or name in status:
+            continue
+        if dataset['publish']:
+            publish(dataset, paths[name])
+        if dataset['kind'] == 'export' and changes.get(name):
+            response_cache.invalidate(dataset['year'], changes[name])
+        status[name] = f"mis à jour, {len(changes[name])} partitions modifiées" if name in changes else "déjà à jour"
+
+    print(f"Mise à jour terminée en {time.perf_counter() - started:.1f} s.")
+    return {dataset['name']: status[dataset['name']] for dataset in datasets}
+
+
+if __name__ == "__main__":
+    all_datasets = get_datasets()
+    parser = argparse.ArgumentParser(description="Met à jour les données Parcoursup de l'application.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="téléchargements et constructions simultanés")
+    parser.add_argument("--datasets", nargs="+", choices=[dataset['name'] for dataset in all_datasets],
+                        help="datasets à mettre à jour (par défaut, tous)")
+    parser.add_argument("--force", action="store_true", help="reconstruire les données dérivées même si elles sont à jour")
+    args = parser.parse_args()
+
+    selected = [dataset for dataset in all_datasets if not args.datasets or dataset['name'] in args.datasets]
+    results = ingest(selected, args.workers, args.force)
+    for dataset_name, result in results.items():
+        print(f"{dataset_name} : {result}")
+    sys.exit(0 if all(result.startswith(("mis à jour", "déjà à jour")) for result in results.values()) else 1)
@@ -1,116 +1,223 @@
+import functools
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
 import pandas as pd
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction, callback, clientside_callback
+from dash.exceptions import PreventUpdate
+from flask import Response, g, jsonify, request
 from flask_caching import Cache
 import dash_leaflet as dl
+from plotly.utils import PlotlyJSONEncoder
 import dash_bootstrap_components as dbc
 import requests
 
 #import modules from src
 from src.components.cards import create_institution_card
+from src.components.formation_tab import create_formation_tab_content
+from src.components.nearby import create_nearby_section, create_nearby_list
 from src.components.map import fetch_data_from_geojson
-from src.components.graphs import generate_pie_chart, create_nested_pie_chart, generate_heatmap, generate_gender_metrics, generate_double_bar_chart
+from src.components.graphs import generate_heatmap, generate_double_bar_chart, render_formation_figures, generate_trend_chart, generate_top_doublettes_chart
 from src.components.header import create_header
 from src.components.footer import create_footer
-from src.utils.get_data import process_api_response, get_latest_data
+from src.utils.get_data import process_api_response
+from src.utils.spe_store import SpeDataset, get_group
+from src.utils.figure_cache import FigureCache, warm_up
+from src.utils.api_client import ParcoursupApiClient
+from src.utils.response_cache import ResponseCache
+from src.utils.api_mirror import lookup_establishment_records
+from src.utils.clustering import ClusterIndex
+from src.utils.map_payload import build_formation_dictionary, encode_compact
+from src.utils.geojson_index import get_partition_id, load_year_search_index
+from src.utils.search_index import SEARCH_LIMIT, dropdown_option
+from src.utils.spatial_index import EstablishmentLocator, DEFAULT_NEAREST
+from src.utils.cache_config import get_cache_config
+from src.utils.metrics import registry, timed, instrument_callback, instrument_requests
+from src.utils.profiler import profiler, profile_callback
 
-# Initialiser l'application Dash
-app = Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
-# Configuration du cache
-cache = Cache(app.server, config={'CACHE_TYPE': 'simple'})
+# Cache des callbacks mémoïsés, configuré par create_app (partagé entre workers avec PARCOURSUP_CACHE=filesystem ou redis)
+cache = Cache()
 
 geojson_file_path = "./data/raw/fr-esr-cartographie_formations_parcoursup.geojson"
 spe_json_file_path = "./data/raw/fr-esr-parcoursup-enseignements-de-specialite-bacheliers-generaux-2.json"
-dfJson = pd.read_json(spe_json_file_path, encoding='utf-8')
-dfJson["couple_specialites"] = dfJson["doublette"].apply(lambda x: f"{x[0]}, {x[1]}")
-
-specialites = dfJson["couple_specialites"]
-specialites = specialites.unique()
-formations = dfJson['formation']
-formations = formations.unique()
-annees = dfJson['annee_du_bac']
-annees = annees.unique()
-
-# Layout de l'application
-app.layout = html.Div([
-    create_header(),
-    dbc.Container([  # Main container for content
-        dbc.Row([
-            dbc.Col([
-                html.P("Choisissez une année pour visualiser les données :"),
-                dcc.Slider(
-                    id="year-slider",
-                    min=2021,
-                    max=2023,
-                    step=1,
-                    marks={year: str(year) for year in range(2021, 2024)},
-                    value=2023,
-                ),
-            ], width={"size": 8, "offset": 2}, className="mb-4")  # Centered slider
-        ]),
+# Le JSON est converti une seule fois en fichier Feather typé (catégories, int16, int32), relu ensuite en memory-map.
+# Le dataset est rechargé automatiquement quand ingest.py publie une nouvelle version du JSON.
+spe_dataset = SpeDataset(spe_json_file_path)
+
+# Années de la carte (le GeoJSON n'a pas de données 2024, voir le README)
+annees_carte = list(range(2021, 2024))
+# Niveau de zoom de la carte sur un établissement choisi dans la recherche
+zoom_etablissement = 15
+
+# État du chargement des données, exposé par la route /ready
+data_loading = {'mode': None, 'ready': threading.Event(), 'error': None, 'started_at': None, 'duration': None}
+annees_carte_chargees = set()
+
+# Cache LRU des figures (graphique en barres, heatmap) déjà sérialisées, par (formation, année, empreinte du groupe),
+# avec le cache partagé en second niveau
+figure_cache = FigureCache(shared=cache)
+# Quand le dataset est rechargé, seules les figures des groupes dont le contenu a changé sont supprimées
+spe_dataset.on_reload(
+    lambda versions_groupes: figure_cache.invalidate(lambda key: versions_groupes.get(key[:2]) != key[2])
+)
+
+# Client HTTP partagé (connexions réutilisées, délais bornés, réessais) pour l'API des données Parcoursup
+api_client = ParcoursupApiClient()
+# Cache sur disque des données d'établissement déjà traitées, partagé par tous les processus (fichier ouvert
+# à la première utilisation)
+response_cache = ResponseCache()
+
+def serve_layout() -> html.Div:
+    """Construit le layout de l'application à chaque chargement de page, avec la première formation du dataset courant
+
+    Les listes de formations et d'établissements ne sont pas envoyées avec la page : les options des listes
+    déroulantes sont cherchées côté serveur pendant la saisie (search_formations, search_establishments).
+
+    Returns:
+        html.Div: Le layout de l'application
+    """
+    # Attend la fin du chargement si la page est demandée pendant le chargement en arrière-plan
+    formations = spe_dataset.snapshot().formations
+    return html.Div([
+        create_header(),
+        dbc.Container([  # Main container for content
+            dbc.Row([
+                dbc.Col([
+                    html.P("Choisissez une année pour visualiser les données :"),
+                    dcc.Slider(
+                        id="year-slider",
+                        min=annees_carte[0],
+                        max=annees_carte[-1],
+                        step=1,
+                        marks={year: str(year) for year in annees_carte},
+                        value=annees_carte[-1],
+                    ),
+                ], width={"size": 8, "offset": 2}, className="mb-4")  # Centered slider
+            ]),
+
+            dbc.Row([
+                dbc.Col([
+                    dcc.Dropdown(
+                        id="establishment-search",
+                        options=[],  # Cherchées pendant la saisie
+                        placeholder="Rechercher un établissement (nom, commune ou code UAI)",
+                    ),
+                ], width={"size": 10, "offset": 1}, className="mb-3")
+            ]),
         
-        dbc.Row([
-            dbc.Col([
-                html.Div([  # Wrapper for the map
-                    dl.Map(
-                        id="map",
-                        center=[47.0, 2.0],
-                        zoom=6,
-                        children=[
-                            dl.TileLayer(),
-                            dl.GeoJSON(
-                                id="geojson-layer",
-                                cluster=True,
-                                zoomToBoundsOnClick=True,
-                                superClusterOptions={"radius": 100},
-                            ),
-                        ],
-                        style={
-                            'width': '100%', 
-                            'height': '500px',
-                            'border': '1px solid #ddd',  # Optional: adds a border
-                            'border-radius': '8px',      # Optional: rounded corners
-                        }
-                    )
-                ], className="shadow-sm")  # Optional: adds subtle shadow
-            ], width={"size": 10, "offset": 1}, className="mb-4")  # Centered map
-        ]),
+            dbc.Row([
+                dbc.Col([
+                    html.Div([  # Wrapper for the map
+                        dcc.Store(id="map-formations"),
+                        dcc.Store(id="map-partition"),
+                        dcc.Store(id="map-payload"),
+                        dl.Map(
+                            id="map",
+                            center=[47.0, 2.0],
+                            zoom=6,
+                            children=[
+                                dl.TileLayer(),
+                                # Les clusters sont calculés côté serveur (update_geojson_data)
+                                dl.GeoJSON(
+                                    id="geojson-layer",
+                                    pointToLayer={"variable": "parcoursupMap.pointToLayer"},
+                                ),
+                            ],
+                            style={
+                                'width': '100%', 
+                                'height': '500px',
+                                'border': '1px solid #ddd',  # Optional: adds a border
+                                'border-radius': '8px',      # Optional: rounded corners
+                            }
+                        )
+                    ], className="shadow-sm")  # Optional: adds subtle shadow
+                ], width={"size": 10, "offset": 1}, className="mb-4")  # Centered map
+            ]),
         
-        dbc.Row([
-            dbc.Col([
-                html.Div(id="api-result-container")
-            ], width={"size": 10, "offset": 1})  # Centered results
-        ]),
+            dbc.Row([
+                dbc.Col([
+                    html.Div(id="api-result-container")
+                ], width={"size": 10, "offset": 1})  # Centered results
+            ]),
         
-        dbc.Row([ 
-            html.Hr(),
-            html.P("Les deux graphiques suivants sont indépendants de la carte interactive, mais ils sont liés entre eux."),
-            dbc.Col([
-                dcc.Dropdown(
-                    id='formation-dropdown',
-                    options=[{'label': formation, 'value': formation} for formation in formations],
-                    value=formations[0],  # Valeur par défaut
-                    placeholder="Sélectionnez une formation",
-                ),
-                # Graphique
-                dcc.Loading(
-                    dcc.Graph(
-                        id='bar-chart',
-                        figure={},  # Initialement vide
+            dbc.Row([ 
+                html.Hr(),
+                html.P("Les deux graphiques suivants sont indépendants de la carte interactive, mais ils sont liés entre eux."),
+                dbc.Col([
+                    dcc.Dropdown(
+                        id='formation-dropdown',
+                        # Seule la formation par défaut est envoyée, les autres sont cherchées pendant la saisie
+                        options=[{'label': formations[0], 'value': formations[0]}],
+                        value=formations[0],  # Valeur par défaut
+                        placeholder="Recherchez une formation",
+                    ),
+                    # Graphique
+                    dcc.Loading(
+                        dcc.Graph(
+                            id='bar-chart',
+                            figure={},  # Initialement vide
+                        ),
+                    ),
+                    dcc.Loading(
+                        dcc.Graph(
+                            id='heatmap',
+                            figure={},  # Initialement vide
+                        ),
+                    ),
+                    # Vues multi-années, calculées depuis le cube pré-agrégé
+                    dcc.Loading(
+                        dcc.Graph(
+                            id='trend-chart',
+                            figure={},
+                        ),
                     ),
-                ),
-                dcc.Loading(
-                    dcc.Graph(
-                        id='heatmap',
-                        figure={},  # Initialement vide
+                    dcc.Loading(
+                        dcc.Graph(
+                            id='top-doublettes-chart',
+                            figure={},
+                        ),
                     ),
-                ),
-            ], width={"size": 10, "offset": 1})  # Centered results
-        ])
-    ], fluid=False),  # Using fixed-width container
-    create_footer()
-])
-
-@app.callback(
+                ], width={"size": 10, "offset": 1})  # Centered results
+            ])
+        ], fluid=False),  # Using fixed-width container
+        create_footer()
+    ])
+
+
+# Callback pour chercher les formations pendant la saisie dans la liste déroulante
+@callback(
+    Output('formation-dropdown', 'options'),
+    Input('formation-dropdown', 'search_value'),
+    State('formation-dropdown', 'value'),
+)
+@instrument_callback
+@profile_callback()
+def search_formations(search_value: str, selected_formation: str) -> list:
+    """Retourne les formations dont les mots commencent par ceux du texte saisi
+
+    Args:
+        search_value (str): Le texte saisi dans la liste déroulante
+        selected_formation (str): La formation sélectionnée, gardée dans les options pour rester affichée
+
+    Returns:
+        list: Les options de la liste déroulante
+    """
+    if not search_value:
+        # Les options affichées (dont la formation sélectionnée) sont gardées
+        raise PreventUpdate
+    snapshot = spe_dataset.snapshot()
+    formations = [snapshot.formations[position] for position in snapshot.formation_index.search(search_value, SEARCH_LIMIT)]
+    options = [dropdown_option(formation, formation, search_value) for formation in formations]
+    if selected_formation and selected_formation not in formations:
+        # Gardée pour rester affichée, mais filtrée par le navigateur si elle ne correspond pas au texte saisi
+        options.append(dropdown_option(selected_formation, selected_formation))
+    return options
+
+
+@callback(
     [
         Output('bar-chart', 'figure'),
         Output('heatmap', 'figure'),
@@ -120,6 +227,8 @@ app.layout = html.Div([
         Input('year-slider', 'value'),
     ]
 )
+@instrument_callback
+@profile_callback()
 def update_graphs(selected_formation: str, selected_year: int) -> tuple:
     """Mettre à jour les graphiques du dataset formation par enseignement de spé en fonction de la formation et de l'année sélectionnées
 
@@ -130,73 +239,379 @@ def update_graphs(selected_formation: str, selected_year: int) -> tuple:
     Returns:
         tuple: Les figures mises à jour pour le graphique en barres et la heatmap
     """
-    # Mettre à jour le graphique en barres
-    bar_chart_figure = generate_double_bar_chart(dfJson, selected_formation, selected_year)
-    
-    # Mettre à jour la heatmap
-    heatmap_figure = generate_heatmap(dfJson, selected_formation, selected_year)
-    
-    return bar_chart_figure, heatmap_figure
-
-# Callback pour mettre à jour les données GeoJSON en fonction de l'année
-@app.callback(
-    Output("geojson-layer", "data"),  # Met à jour les données GeoJSON
-    Input("year-slider", "value"),  # Récupère la valeur du slider
+    dfJson, groupes_formation_annee, versions_groupes = spe_dataset.get()
+    groupe = get_group(dfJson, groupes_formation_annee, selected_formation, selected_year)
+
+    # Les figures sont calculées une seule fois par combinaison puis servies depuis le cache
+    bar_chart_json, heatmap_json = figure_cache.get_or_render(
+        (selected_formation, selected_year, versions_groupes.get((selected_formation, selected_year), "")),
+        render_formation_figures, groupe, selected_formation, selected_year,
+    )
+
+    with timed("cache_decode"):
+        return json.loads(bar_chart_json), json.loads(heatmap_json)
+
+
+@callback(
+    Output('trend-chart', 'figure'),
+    Input('formation-dropdown', 'value'),
 )
-@cache.memoize(timeout=3600)  # Cache pendant 1 heure
-def update_geojson_data(annee_cible: int) -> dict:
-    """Mettre à jour les données GeoJSON en fonction de l'année cible
+@instrument_callback
+@profile_callback()
+def update_trend_chart(selected_formation: str) -> dict:
+    """Mettre à jour l'évolution sur plusieurs années de la formation sélectionnée
 
     Args:
-        annee_cible (int):L'année cible choisie avec le slider
+        selected_formation (str): La formation sélectionnée (aucune : toutes les formations)
+
+    Returns:
+        dict: Le graphique des effectifs et du taux d'admission par année
+    """
+    # Liste déroulante vidée : évolution de toutes les formations
+    selected_formation = selected_formation or None
+    return generate_trend_chart(spe_dataset.snapshot().cube.trend(selected_formation), selected_formation)
+
+
+@callback(
+    Output('top-doublettes-chart', 'figure'),
+    [
+        Input('formation-dropdown', 'value'),
+        Input('year-slider', 'value'),
+    ]
+)
+@instrument_callback
+@profile_callback()
+def update_top_doublettes(selected_formation: str, selected_year: int) -> dict:
+    """Mettre à jour le classement des doublettes de spécialités par taux d'admission
+
+    Args:
+        selected_formation (str): La formation sélectionnée (aucune : toutes les formations)
+        selected_year (int): L'année sélectionnée
+
+    Returns:
+        dict: Le graphique des meilleures doublettes de la formation pour l'année
+    """
+    # Liste déroulante vidée : doublettes de toutes les formations, comme update_trend_chart
+    selected_formation = selected_formation or None
+    top = spe_dataset.snapshot().cube.top_doublettes(selected_formation, selected_year)
+    return generate_top_doublettes_chart(top, selected_formation, selected_year)
+
+
+def warm_up_figure_cache(processes: int = None) -> int:
+    """Pré-calcule dans un pool de processus les figures de toutes les combinaisons (formation, année)
+
+    Args:
+        processes (int): Le nombre de processus (par défaut, le nombre de cœurs)
+
+    Returns:
+        int: Le nombre de combinaisons calculées
+    """
+    dfJson, groupes_formation_annee, versions_groupes = spe_dataset.get()
+    tasks = {
+        (formation, annee, versions_groupes[(formation, annee)]): (get_group(dfJson, groupes_formation_annee, formation, annee), formation, annee)
+        for formation, annee in groupes_formation_annee
+    }
+    return warm_up(figure_cache, tasks, render_formation_figures, processes)
+
+@functools.lru_cache(maxsize=8)
+def get_map_year_index(annee_cible: int, partition_id: str) -> tuple:
+    """Charge les établissements d'une année et construit leur index de regroupement, une fois par contenu de l'année
+
+    Args:
+        annee_cible (int): L'année cible
+        partition_id (str): L'identifiant de la partition de l'année dans l'index du GeoJSON : il ne change que
+            si les établissements de cette année changent, les autres années gardent leur index
 
     Returns:
-        dict: Les données GeoJSON mises à jour
+        tuple: La liste des établissements, leur ClusterIndex, le dictionnaire des formations et leurs codes
     """
     features = fetch_data_from_geojson(geojson_file_path, str(annee_cible))
-    # Convertir les features en format GeoJSON
-    geojson_data = {
-        "type": "FeatureCollection",
-        "features": [
-            {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [feature["longitude"], feature["latitude"]],
-                },
-                "properties": {
-                    "etab_nom": feature["etab_nom"],
-                    "formations": feature["formations"],
-                    "etab_uai": feature["etab_uai"],
-                },
-            }
-            for feature in features
-        ],
+    cluster_index = ClusterIndex(
+        [feature["latitude"] for feature in features],
+        [feature["longitude"] for feature in features],
+    )
+    formation_dictionary, formation_codes = build_formation_dictionary(features)
+    annees_carte_chargees.add(annee_cible)
+    return features, cluster_index, formation_dictionary, formation_codes
+
+
+@functools.lru_cache(maxsize=8)
+def get_establishment_search(annee_cible: int, partition_id: str) -> tuple:
+    """Charge l'index de recherche des établissements d'une année, une fois par contenu de l'année
+
+    Args:
+        annee_cible (int): L'année cible
+        partition_id (str): L'identifiant de la partition de l'année dans l'index du GeoJSON
+
+    Returns:
+        tuple: L'index de recherche et la position de chaque établissement par code UAI
+    """
+    features, _, _, _ = get_map_year_index(annee_cible, partition_id)
+    search_index = load_year_search_index(geojson_file_path, str(annee_cible))
+    return search_index, {feature["etab_uai"]: position for position, feature in enumerate(features)}
+
+
+@functools.lru_cache(maxsize=8)
+def get_establishment_locator(annee_cible: int, partition_id: str) -> tuple:
+    """Construit l'index spatial des établissements d'une année, une fois par contenu de l'année
+
+    Args:
+        annee_cible (int): L'année cible
+        partition_id (str): L'identifiant de la partition de l'année dans l'index du GeoJSON
+
+    Returns:
+        tuple: L'index spatial et le code de chaque nom de formation dans le dictionnaire de l'année
+    """
+    features, _, formation_dictionary, formation_codes = get_map_year_index(annee_cible, partition_id)
+    locator = EstablishmentLocator(
+        [feature["latitude"] for feature in features],
+        [feature["longitude"] for feature in features],
+        formation_codes,
+    )
+    return locator, {formation: code for code, formation in enumerate(formation_dictionary)}
+
+
+# Callback pour chercher les établissements de l'année pendant la saisie dans la liste déroulante
+@callback(
+    Output("establishment-search", "options"),
+    Input("establishment-search", "search_value"),
+    State("year-slider", "value"),
+    State("establishment-search", "value"),
+)
+@instrument_callback
+@profile_callback()
+def search_establishments(search_value: str, annee_cible: int, selected_uai: str) -> list:
+    """Retourne les établissements de l'année dont le nom, la commune ou le code UAI commencent par le texte saisi
+
+    Args:
+        search_value (str): Le texte saisi dans la liste déroulante
+        annee_cible (int): L'année choisie avec le slider
+        selected_uai (str): Le code UAI de l'établissement sélectionné, gardé dans les options
+
+    Returns:
+        list: Les options de la liste déroulante (valeur : code UAI)
+    """
+    if not search_value:
+        raise PreventUpdate
+    partition_id = get_partition_id(geojson_file_path, annee_cible)
+    if partition_id is None:
+        return []
+    features, _, _, _ = get_map_year_index(annee_cible, partition_id)
+    search_index, positions = get_establishment_search(annee_cible, partition_id)
+    matches = search_index.search(search_value, SEARCH_LIMIT)
+    options = [
+        dropdown_option(f"{features[position]['etab_nom']} – {features[position]['commune']} ({features[position]['etab_uai']})",
+                        features[position]['etab_uai'], search_value)
+        for position in matches
+    ]
+    if selected_uai in positions and positions[selected_uai] not in matches:
+        # Gardé pour rester affiché, mais filtré par le navigateur s'il ne correspond pas au texte saisi
+        position = positions[selected_uai]
+        options.append(dropdown_option(
+            f"{features[position]['etab_nom']} – {features[position]['commune']} ({features[position]['etab_uai']})", selected_uai))
+    return options
+
+
+# Callback pour afficher l'établissement choisi dans la recherche, comme un clic sur son marqueur
+@callback(
+    Output("geojson-layer", "clickData"),
+    Output("map", "viewport", allow_duplicate=True),
+    Input("establishment-search", "value"),
+    State("year-slider", "value"),
+    prevent_initial_call=True,
+)
+@instrument_callback
+@profile_callback()
+def select_establishment(selected_uai: str, annee_cible: int) -> tuple:
+    """Centre la carte sur l'établissement choisi et le sélectionne : fetch_api_data affiche alors ses données
+
+    Args:
+        selected_uai (str): Le code UAI de l'établissement choisi
+        annee_cible (int): L'année choisie avec le slider
+
+    Returns:
+        tuple: La feature de l'établissement (clic simulé sur son marqueur) et la nouvelle vue de la carte
+    """
+    partition_id = get_partition_id(geojson_file_path, annee_cible)
+    if not selected_uai or partition_id is None:
+        raise PreventUpdate
+    features, _, _, _ = get_map_year_index(annee_cible, partition_id)
+    _, positions = get_establishment_search(annee_cible, partition_id)
+    if selected_uai not in positions:
+        raise PreventUpdate
+    establishment = features[positions[selected_uai]]
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [establishment["longitude"], establishment["latitude"]]},
+        "properties": {"etab_nom": establishment["etab_nom"], "formations": establishment["formations"], "etab_uai": establishment["etab_uai"]},
     }
-    return geojson_data
+    viewport = {"center": [establishment["latitude"], establishment["longitude"]], "zoom": zoom_etablissement, "transition": "flyTo"}
+    return feature, viewport
+
+
+# Partition des données de la carte reçues, mise à jour dans le navigateur seulement quand elle change
+clientside_callback(
+    ClientsideFunction(namespace="parcoursupMap", function_name="payloadPartition"),
+    Output("map-partition", "data"),
+    Input("map-payload", "data"),
+    State("map-partition", "data"),
+)
+
+
+# Callback pour envoyer une seule fois par partition le dictionnaire des formations utilisé par les données de la carte
+@callback(
+    Output("map-formations", "data"),
+    Input("map-partition", "data"),
+)
+@instrument_callback
+@profile_callback()
+def update_map_dictionary(partition: dict) -> dict:
+    """Retourne le dictionnaire des noms de formation de la partition des données de la carte
+
+    Le dictionnaire est celui de la partition courante de l'année : si le GeoJSON a été mis à jour entre-temps,
+    il ne correspond pas aux données reçues et le navigateur attend les suivantes pour les décoder.
+
+    Args:
+        partition (dict): L'année et l'identifiant de partition des dernières données de la carte reçues
+
+    Returns:
+        dict: L'année, l'identifiant de partition et la liste des noms de formation
+    """
+    if not partition:
+        raise PreventUpdate
+    annee_cible = partition["year"]
+    partition_id = get_partition_id(geojson_file_path, annee_cible)
+    if partition_id is None:
+        raise PreventUpdate
+    _, _, formation_dictionary, _ = get_map_year_index(annee_cible, partition_id)
+    return {"year": annee_cible, "partition_id": partition_id, "formations": formation_dictionary}
 
 
+# Callback pour mettre à jour les données de la carte en fonction de l'année et de la zone visible
+@callback(
+    Output("map-payload", "data"),  # Données compactes, décodées en GeoJSON par le navigateur
+    [Input("year-slider", "value"),  # Récupère la valeur du slider
+     Input("map", "bounds"),
+     Input("map", "zoom")],
+)
+@instrument_callback
+@profile_callback()
+def update_geojson_data(annee_cible: int, bounds: list = None, zoom: float = None) -> dict:
+    """Mettre à jour les données de la carte en fonction de l'année cible et de la zone visible
+
+    Les établissements sont regroupés côté serveur : seuls les clusters et les établissements isolés
+    de la zone visible sont envoyés, dans le format compact de encode_compact.
+
+    Args:
+        annee_cible (int):L'année cible choisie avec le slider
+        bounds (list): Les limites [[sud, ouest], [nord, est]] de la carte
+        zoom (float): Le niveau de zoom de la carte
+
+    Returns:
+        dict: Les données compactes des clusters et établissements visibles
+    """
+    partition_id = get_partition_id(geojson_file_path, annee_cible)
+    features, cluster_index, _, formation_codes = get_map_year_index(annee_cible, partition_id)
+    clusters, points = cluster_index.query(bounds, zoom)
+    return encode_compact(features, formation_codes, clusters, points.tolist(), annee_cible, partition_id)
+
+
+# Décodage des données compactes en GeoJSON dans le navigateur (assets/map_clusters.js)
+clientside_callback(
+    ClientsideFunction(namespace="parcoursupMap", function_name="decodePayload"),
+    Output("geojson-layer", "data"),
+    [Input("map-payload", "data"),
+     Input("map-formations", "data")],
+)
+
+
+# Callback pour zoomer sur un cluster quand on clique dessus
+@callback(
+    Output("map", "viewport"),
+    Input("geojson-layer", "clickData"),
+    State("map", "zoom"),
+    prevent_initial_call=True,
+)
+@instrument_callback
+@profile_callback()
+def zoom_on_cluster(feature: dict, zoom: float) -> dict:
+    """Centre la carte sur le cluster cliqué et zoome de deux niveaux
+
+    Args:
+        feature (dict): La feature GeoJSON cliquée
+        zoom (float): Le niveau de zoom actuel
+
+    Returns:
+        dict: La nouvelle vue de la carte
+    """
+    if not feature or not feature.get("properties", {}).get("cluster"):
+        raise PreventUpdate
+    longitude, latitude = feature["geometry"]["coordinates"]
+    return {"center": [latitude, longitude], "zoom": (zoom or 6) + 2, "transition": "flyTo"}
+
+
+def fetch_establishment_records(selected_year: int, cod_uai: str):
+    """Récupère les formations d'un établissement dans le miroir local des exports, ou à défaut depuis l'API
+
+    Args:
+        selected_year (int): L'année de la session
+        cod_uai (str): Le code UAI de l'établissement
+
+    Returns:
+        La réponse du miroir au format de l'API (total_count et results), ou la liste des pages de l'API
+    """
+    with timed("mirror_lookup"):
+        records = lookup_establishment_records(selected_year, cod_uai)
+    if records is None:
+        with timed("api_call"):
+            records = api_client.fetch_establishment_records(selected_year, cod_uai)
+    return records
+
+
+def load_establishment_data(selected_year: int, cod_uai: str):
+    """Retourne les données traitées d'un établissement, depuis le cache sur disque ou en les chargeant
+
+    Args:
+        selected_year (int): L'année de la session
+        cod_uai (str): Le code UAI de l'établissement
+
+    Returns:
+        Les données de process_api_response
+    """
+    def fetch() -> dict:
+        records = fetch_establishment_records(selected_year, cod_uai)
+        with timed("process_api_response"):
+            return process_api_response(records)
+
+    return response_cache.get_or_fetch(selected_year, cod_uai, fetch)
+
 
 # Callback pour gérer les clics sur les clusters ou marqueurs individuels
-@app.callback(
+@callback(
     Output("api-result-container", "children"),
     [Input("geojson-layer", "clickData"),
      Input("year-slider", "value")],
     prevent_initial_call=True,
 )
+@instrument_callback
+@profile_callback(lambda feature, selected_year: f"{selected_year}_{((feature or {}).get('properties') or {}).get('etab_uai', '')}")
 def fetch_api_data(feature: dict, selected_year:int) -> html.Div:
     if not feature:
         return "Cliquez sur un marqueur pour voir les informations."
 
     properties = feature.get("properties", {})
+    if properties.get("cluster"):
+        # Le clic sur un cluster est géré par zoom_on_cluster
+        raise PreventUpdate
     cod_uai = properties.get("etab_uai", None)
 
     if not cod_uai:
         return "Aucun code UAI trouvé pour ce marqueur."
 
-    api_url = f"https://data.enseignementsup-recherche.gouv.fr/api/explore/v2.1/catalog/datasets/fr-esr-parcoursup_{selected_year}/records?where=cod_uai%20LIKE%20%22{cod_uai}%22"
-    response = requests.get(api_url)
-    data = process_api_response(response.json())
+    try:
+        data = load_establishment_data(selected_year, cod_uai)
+    except requests.exceptions.RequestException:
+        return html.P("Les données Parcoursup sont momentanément indisponibles, veuillez réessayer plus tard.")
 
     if len(data) == 0:
         return html.P("Aucune information disponible pour cet établissement.")
@@ -220,99 +635,310 @@ def fetch_api_data(feature: dict, selected_year:int) -> html.Div:
     ])
 
     if "results" not in data or len(data["results"]) == 0:
-        return html.Div(header + [html.P("Aucune information disponible pour cet établissement.")])
-
-    # Create tabs for formations
-    formation_tabs = []
-    for result in data["results"]:
-        tab_content = [
-            # Formation info section
-            html.H4(result['intitule_formation'], className='mb-3'),
-            html.P([
-                "Formation Sélective: ",
-                html.Span(result['selectivite'], className='font-weight-bold')
-            ]),
-            html.A(
-                "Voir la fiche",
-                href=result["lien_form_psup"],
-                target="_blank",
-                className="btn btn-primary mb-3"
-            ),
-            
-            # Graphs section
-            dbc.Row([
-                dbc.Col(
-                    html.P("Dans ce graphique, BT = bac technologique, BG = Bac générale et BP = bac professionnel"),
-                    xs=12, sm=12, md=12, lg=12
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=generate_pie_chart(result),
-                    ),
-                    xs=12, sm=12, md=6, lg=6
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=create_nested_pie_chart(result),
-                    ),
-                    xs=12, sm=12, md=6, lg=6
-                ),
-            ], className='mb-4'),
-            dbc.Row([
-    dbc.Col(
-        dcc.Graph(
-            figure=generate_gender_metrics(result)[0],  # First figure (Sunburst chart)
-        ),
-        xs=12, sm=12, md=6, lg=6  # Full width on small screens, 50% width on medium and larger screens
-    ),
-    dbc.Col(
-        dcc.Graph(
-            figure=generate_gender_metrics(result)[1],  # Second figure (Bar chart)
-        ),
-        xs=12, sm=12, md=6, lg=6  # Full width on small screens, 50% width on medium and larger screens
-    ),
-], className='mb-4')
-  
-        ]
-
-        formation_tabs.append(
-            dcc.Tab(
-                label=result['intitule_formation'],
-                value=f"tab-{result['intitule_formation']}",
-                children=html.Div(tab_content, className='p-4'),
-            )
+        return html.Div([header, html.P("Aucune information disponible pour cet établissement.")])
+
+    # Les onglets ne contiennent que leur titre : le contenu de l'onglet choisi est construit par render_formation_tab
+    formation_tabs = [
+        dcc.Tab(
+            label=result['intitule_formation'],
+            value=f"tab-{index}",
         )
+        for index, result in enumerate(data["results"])
+    ]
+
+    # Formations de l'établissement dans la cartographie de l'année, pour chercher les établissements proches
+    nearby_formations = []
+    partition_id = get_partition_id(geojson_file_path, selected_year)
+    if partition_id is not None:
+        features, _, _, _ = get_map_year_index(selected_year, partition_id)
+        _, positions = get_establishment_search(selected_year, partition_id)
+        if cod_uai in positions:
+            nearby_formations = features[positions[cod_uai]]["formations"]
 
     # Combine header and tabs
     layout = html.Div([
         # Header section
         html.Div(header, className='mb-4'),
+
+        # Établissement affiché, lu par le callback des onglets
+        dcc.Store(id='establishment-key', data={'year': selected_year, 'cod_uai': cod_uai}),
         
         # Tabs section
         dcc.Tabs(
             id='formation-tabs',
-            value=f"tab-{data['results'][0]['intitule_formation']}", # Set first tab as default
+            value="tab-0", # Set first tab as default
             children=formation_tabs,
             className='custom-tabs'
-        )
+        ),
+        html.Div(id='formation-tab-content'),
     ])
+    if nearby_formations:
+        layout.children.append(html.Div(create_nearby_section(nearby_formations), className='mt-4'))
 
     return layout
 
-if __name__ == "__main__":
+# Callback pour lister les établissements proches de l'établissement affiché qui proposent la formation choisie
+@callback(
+    Output("nearby-results", "children"),
+    [Input("nearby-formation", "value"),
+     Input("nearby-radius", "value")],
+    State("establishment-key", "data"),
+)
+@instrument_callback
+@profile_callback()
+def update_nearby_establishments(formation: str, radius: float, establishment: dict) -> html.Div:
+    """Cherche dans l'index spatial de l'année les établissements les plus proches qui proposent une formation
+
+    Args:
+        formation (str): La formation choisie, parmi celles de l'établissement affiché
+        radius (float): La distance maximale, en kilomètres
+        establishment (dict): L'année et le code UAI de l'établissement affiché
+
+    Returns:
+        html.Div: La liste des établissements proches, du plus proche au plus éloigné
+    """
+    if not formation or not radius or not establishment:
+        return html.Div()
+    partition_id = get_partition_id(geojson_file_path, establishment["year"])
+    if partition_id is None:
+        return html.Div()
+    features, _, _, _ = get_map_year_index(establishment["year"], partition_id)
+    _, positions = get_establishment_search(establishment["year"], partition_id)
+    position = positions.get(establishment["cod_uai"])
+    if position is None:
+        return html.Div()
 
-    #----------------------------------------------------------------
-    # POUR METTRE A JOUR LES DONNEES SE SITUANT DANS DATA/RAW DECOMMENTER LES LIGNES CI-DESSOUS
-    # CES LIGNES DOIVENT ETRE IMPERATIVEMENT RECOMMENTEES AVANT DE LANCER L'APPLICATION CAR
-    # LE PROCESSUS DE TELECHARGEMENT DES DONNEES PEUT ETRE LONG
-    #----------------------------------------------------------------
+    locator, formation_codes = get_establishment_locator(establishment["year"], partition_id)
+    origin = features[position]
+    # Un résultat de plus que le nombre affiché : l'établissement affiché fait partie des résultats
+    nearest, distances = locator.nearest(origin["latitude"], origin["longitude"], DEFAULT_NEAREST + 1, radius,
+                                         formation_codes.get(formation, -1))
+    establishments = [
+        {'etab_nom': features[other]["etab_nom"], 'commune': features[other]["commune"], 'distance': distance}
+        for other, distance in zip(nearest.tolist(), distances.tolist())
+        if other != position
+    ]
+    return create_nearby_list(establishments[:DEFAULT_NEAREST], radius)
+
+
+def formation_digest(formation: dict) -> str:
+    """Calcule l'empreinte du contenu d'une formation d'un établissement, clé du cache des onglets
+
+    L'empreinte ne dépend pas de la position de la formation dans les résultats : quand ingest.py publie de
+    nouveaux enregistrements, une formation déplacée garde son onglet en cache et une formation modifiée en
+    obtient un nouveau, sans qu'aucun onglet d'une autre formation ne soit relu à sa place.
+    """
+    return hashlib.md5(json.dumps(formation, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+@cache.memoize(timeout=3600, args_to_ignore=['formation'])  # Cache pendant 1 heure
+def render_formation_tab_json(formation_key: str, formation: dict) -> str:
+    """Construit le contenu de l'onglet d'une formation d'un établissement, sérialisé en JSON
+
+    Le cache (éventuellement partagé entre workers) garde le JSON plutôt que les composants : le relire
+    est bien plus rapide que de dépickler les figures plotly, qui sont revalidées à la création.
+
+    Args:
+        formation_key (str): L'empreinte de la formation (formation_digest), seule clé du cache
+        formation (dict): Les données de la formation, issues de process_api_response
+
+    Returns:
+        str: Le contenu de l'onglet en JSON
+    """
+    # Indique à render_formation_tab que l'onglet n'était pas en cache
+    g.formation_tab_rendered = True
+    with timed("figure_build"):
+        content = create_formation_tab_content(formation)
+    with timed("figure_serialization"):
+        return json.dumps(content, cls=PlotlyJSONEncoder)
+
+
+# Callback pour construire uniquement l'onglet de formation sélectionné
+@callback(
+    Output("formation-tab-content", "children"),
+    Input("formation-tabs", "value"),
+    State("establishment-key", "data"),
+)
+@instrument_callback
+@profile_callback(lambda tab_value, establishment: f"{(establishment or {}).get('year')}_{(establishment or {}).get('cod_uai')}_{tab_value}")
+def render_formation_tab(tab_value: str, establishment: dict) -> html.Div:
+    """Construit le contenu de l'onglet sélectionné de l'établissement affiché
+
+    Args:
+        tab_value (str): La valeur de l'onglet sélectionné ("tab-<position de la formation>")
+        establishment (dict): L'année et le code UAI de l'établissement affiché
+
+    Returns:
+        html.Div: Le contenu de l'onglet
+    """
+    if not tab_value or not establishment:
+        return html.Div()
+
+    try:
+        formation_index = int(str(tab_value).split("-")[-1])
+    except ValueError:
+        # Valeur d'onglet envoyée par le client qui ne désigne aucune formation
+        return html.P("Aucune information disponible pour cette formation.")
+    try:
+        data = load_establishment_data(establishment["year"], establishment["cod_uai"])
+        if not isinstance(data, dict) or not 0 <= formation_index < len(data.get("results", [])):
+            # Réponse non mise en cache : la formation peut apparaître avec les prochaines données
+            return html.P("Aucune information disponible pour cette formation.")
+        formation = data["results"][formation_index]
+        g.formation_tab_rendered = False
+        content_json = render_formation_tab_json(formation_digest(formation), formation)
+        registry.inc("parcoursup_formation_tab_cache_requests", "Lectures du cache des onglets de formation",
+                     result="miss" if g.formation_tab_rendered else "hit")
+        with timed("cache_decode"):
+            return json.loads(content_json)
+    except requests.exceptions.RequestException:
+        return html.P("Les données Parcoursup sont momentanément indisponibles, veuillez réessayer plus tard.")
+
+
+def preload_data() -> None:
+    """Charge les données en lecture seule : dataset des spécialités, index de regroupement, de recherche et spatial de chaque année de la carte"""
+    spe_dataset.get()
+    for annee in annees_carte:
+        get_map_year_index(annee, get_partition_id(geojson_file_path, annee))
+        get_establishment_search(annee, get_partition_id(geojson_file_path, annee))
+        get_establishment_locator(annee, get_partition_id(geojson_file_path, annee))
+
+
+def load_data(app: Dash) -> None:
+    """Charge les données, pré-calcule les graphiques si PARCOURSUP_WARMUP=1 et met à jour l'état de /ready"""
+    data_loading['started_at'] = time.perf_counter()
+    try:
+        preload_data()
+        # Pré-calcul optionnel des graphiques formation/année au démarrage : PARCOURSUP_WARMUP=1
+        if os.environ.get("PARCOURSUP_WARMUP") == "1":
+            with app.server.app_context():
+                print(f"{warm_up_figure_cache()} combinaisons formation/année pré-calculées.")
+    except Exception as error:
+        data_loading['error'] = repr(error)
+        print(f"Échec du chargement des données : {error}")
+        return
+    data_loading['duration'] = time.perf_counter() - data_loading['started_at']
+    data_loading['ready'].set()
+
+
+def get_data_status() -> dict:
+    """Retourne l'état du chargement des données, pour la route /ready
 
+    Returns:
+        dict: Le mode de chargement, si les données sont prêtes, les données déjà en mémoire et l'éventuelle erreur
+    """
+    return {
+        'ready': data_loading['ready'].is_set(),
+        'mode': data_loading['mode'],
+        'specialites': spe_dataset.loaded,
+        'carte': sorted(annees_carte_chargees),
+        'duration': data_loading['duration'],
+        'error': data_loading['error'],
+    }
+
+
+def collect_cache_metrics():
+    """Retourne les compteurs des caches du processus pour /metrics : lectures réussies, échecs et taux de succès"""
+    responses = response_cache.stats()
+    map_index = get_map_year_index.cache_info()
+    lookups = {
+        'figures': (figure_cache.hits, figure_cache.misses),
+        'formation_tabs': (registry.value("parcoursup_formation_tab_cache_requests", result="hit"),
+                           registry.value("parcoursup_formation_tab_cache_requests", result="miss")),
+        'responses': (responses['fresh'] + responses['stale'], responses['miss']),
+        'map_index': (map_index.hits, map_index.misses),
+    }
+    for name, (hits, misses) in lookups.items():
+        yield "parcoursup_cache_hits", "counter", "Lectures réussies des caches", {'cache': name}, hits
+        yield "parcoursup_cache_misses", "counter", "Lectures des caches sans résultat", {'cache': name}, misses
+        yield ("parcoursup_cache_hit_ratio", "gauge", "Part des lectures réussies des caches", {'cache': name},
+               hits / (hits + misses) if hits + misses else 0.0)
+    yield "parcoursup_figure_cache_bytes", "gauge", "Taille du cache des figures du processus", {}, figure_cache.current_bytes
+    yield "parcoursup_api_errors", "counter", "Requêtes en erreur vers l'API Parcoursup", {}, api_client.errors
+
+
+registry.add_collector(collect_cache_metrics)
+registry.add_histogram("parcoursup_api_request_seconds", "Durée des requêtes vers l'API Parcoursup", api_client.latency)
+
+
+def callback_name(app: Dash, dash_request) -> str:
+    """Retourne le nom du callback appelé par une requête /_dash-update-component ("unknown" s'il n'existe pas)
+
+    L'identifiant de sortie envoyé par le client n'est pas repris tel quel : les étiquettes des métriques
+    resteraient en nombre non borné.
+    """
+    output = (dash_request.get_json(silent=True) or {}).get('output', '')
+    function = app.callback_map.get(output, {}).get('callback')
+    return function.__name__ if function is not None else "unknown"
+
+
+def create_app(data_mode: str = None) -> Dash:
+    """Crée l'application Dash, sans attendre ses données selon le mode de chargement
 
-    # url = "https://data.enseignementsup-recherche.gouv.fr/api/explore/v2.1/catalog/datasets/fr-esr-parcoursup-enseignements-de-specialite-bacheliers-generaux-2/exports/json?lang=fr&timezone=Europe%2FBerlin"
-    # urlGeoJson = "https://data.enseignementsup-recherche.gouv.fr/api/explore/v2.1/catalog/datasets/fr-esr-cartographie_formations_parcoursup/exports/geojson?lang=fr&timezone=Europe%2FBerlin"
-    # if get_latest_data(url) or get_latest_data(urlGeoJson):
-    #     print("Des données ont été mises à jour.")
-    # else:
-    #     print("Aucune mise à jour nécessaire.")
-    
+    Modes de chargement (par défaut, la variable d'environnement PARCOURSUP_DATA_LOADING, sinon background) :
+    - background : les données sont chargées dans un thread, l'application répond tout de suite et /ready
+      renvoie 200 une fois les données en mémoire ;
+    - sync : les données sont chargées avant de rendre la main. Avec gunicorn --preload (gunicorn.conf.py),
+      cette fonction n'est appelée qu'une fois, dans le processus maître : les données (et les figures
+      pré-calculées avec PARCOURSUP_WARMUP=1) sont partagées par tous les workers après le fork ;
+    - lazy : rien n'est chargé d'avance, chaque donnée est chargée à sa première utilisation. /ready renvoie
+      alors 200 tout de suite : il indique seulement que le processus répond, pas que les données sont en mémoire.
+
+    Args:
+        data_mode (str): Le mode de chargement des données
+
+    Returns:
+        Dash: L'application
+    """
+    data_mode = data_mode or os.environ.get("PARCOURSUP_DATA_LOADING", "background")
+    if data_mode not in ("background", "sync", "lazy"):
+        raise ValueError(f"Mode de chargement inconnu : {data_mode} (background, sync ou lazy)")
+
+    app = Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    cache.init_app(app.server, config=get_cache_config())
+    # Layout construit à chaque chargement de page
+    app.layout = serve_layout
+
+    @app.server.route("/ready")
+    def ready():
+        status = get_data_status()
+        return jsonify(status), 200 if status['ready'] else 503
+
+    # Métriques du processus au format Prometheus : durée des callbacks et de leurs étapes, taille des réponses, caches
+    @app.server.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    instrument_requests(app.server, "/_dash-update-component", lambda dash_request: callback_name(app, dash_request))
+
+    # Profilage des callbacks lents, activé à chaud : GET pour l'état, POST {"enabled": true, "threshold": 0.5, ...}
+    # Route désactivée sans PARCOURSUP_ADMIN_TOKEN ; le réglage ne vaut que pour le worker qui reçoit la requête
+    # (son pid est renvoyé) : pour tous les workers, utiliser les variables d'environnement PARCOURSUP_PROFILE*
+    @app.server.route("/admin/profiling", methods=["GET", "POST"])
+    def profiling():
+        token = os.environ.get("PARCOURSUP_ADMIN_TOKEN")
+        if not token or not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return jsonify({'error': "accès refusé"}), 403
+        if request.method == "POST":
+            try:
+                profiler.configure(**(request.get_json(silent=True) or {}))
+            except (TypeError, ValueError) as error:
+                return jsonify({'error': str(error)}), 400
+        return jsonify(profiler.status())
+
+    data_loading['mode'] = data_mode
+    if data_mode == "sync":
+        load_data(app)
+    elif data_mode == "background":
+        threading.Thread(target=load_data, args=(app,), name="parcoursup-data", daemon=True).start()
+    else:
+        # Mode lazy : /ready ne signale que la vivacité du processus, les données sont chargées à la demande
+        data_loading['ready'].set()
+    return app
+
+
+if __name__ == "__main__":
+    # Les données de data/raw sont mises à jour à part, sans arrêter l'application : python ingest.py
+    # Avec plusieurs workers : gunicorn -c gunicorn.conf.py wsgi:server
+    app = create_app()
     app.run_server(debug=False)
@@ -0,0 +1,69 @@
+from typing import Dict, Any
+import dash_bootstrap_components as dbc
+from dash import html, dcc
+
+from src.components.graphs import generate_pie_chart, create_nested_pie_chart, generate_gender_metrics
+
+
+def create_formation_tab_content(result: Dict[str, Any]) -> html.Div:
+    """Crée le contenu de l'onglet d'une formation : informations et graphiques
+
+    Args:
+        result (Dict[str, Any]): Les données de la formation, telles que retournées par process_api_response
+
+    Returns:
+        html.Div: Le contenu de l'onglet
+    """
+    # Les deux graphiques femmes/hommes sont construits en un seul appel
+    gender_sunburst, gender_bar_chart = generate_gender_metrics(result)
+
+    tab_content = [
+        # Formation info section
+        html.H4(result['intitule_formation'], className='mb-3'),
+        html.P([
+            "Formation Sélective: ",
+            html.Span(result['selectivite'], className='font-weight-bold')
+        ]),
+        html.A(
+            "Voir la fiche",
+            href=result["lien_form_psup"],
+            target="_blank",
+            className="btn btn-primary mb-3"
+        ),
+
+        # Graphs section
+        dbc.Row([
+            dbc.Col(
+                html.P("Dans ce graphique, BT = bac technologique, BG = Bac générale et BP = bac professionnel"),
+                xs=12, sm=12, md=12, lg=12
+            ),
+            dbc.Col(
+                dcc.Graph(
+                    figure=generate_pie_chart(result),
+                ),
+                xs=12, sm=12, md=6, lg=6
+            ),
+            dbc.Col(
+                dcc.Graph(
+                    figure=create_nested_pie_chart(result),
+                ),
+                xs=12, sm=12, md=6, lg=6
+            ),
+        ], className='mb-4'),
+        dbc.Row([
+            dbc.Col(
+                dcc.Graph(
+                    figure=gender_sunburst,  # First figure (Sunburst chart)
+                ),
+                xs=12, sm=12, md=6, lg=6  # Full width on small screens, 50% width on medium and larger screens
+            ),
+            dbc.Col(
+                dcc.Graph(
+                    figure=gender_bar_chart,  # Second figure (Bar chart)
+                ),
+                xs=12, sm=12, md=6, lg=6  # Full width on small screens, 50% width on medium and larger screens
+            ),
+        ], className='mb-4')
+    ]
+
+    return html.Div(tab_content, className='p-4')
@@ -1,9 +1,13 @@
-from typing import Dict, Union, Optional
+from typing import Dict, Union, Optional, Tuple
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 
+from src.utils.metrics import timed
+
 
 def generate_pie_chart(result: Dict[str, Union[int, str]]) -> go.Figure:
     """Genère un graphique en camembert pour la répartition des mentions au bac des admis pour une formation donnée
@@ -117,34 +121,55 @@ def create_nested_pie_chart(data: Dict[str, int]) -> go.Figure:
     return fig
 
 
-def generate_heatmap(df: pd.DataFrame, formation: str, annee: int) -> Optional[go.Figure]:
+def compute_heatmap_matrix(df_filtered: pd.DataFrame) -> pd.DataFrame:
+    """Calcule la matrice spe2 x spe1 des propositions d'admission, en pourcentage du maximum
+
+    spe1 et spe2 partagent les mêmes catégories : leurs codes entiers servent d'indices dans une matrice
+    spé x spé remplie en une seule somme (bincount), sans pivot_table. Seules les spécialités présentes
+    dans les lignes sont gardées, dans l'ordre alphabétique, comme le faisait le pivot.
+
+    Args:
+        df_filtered (pd.DataFrame): les lignes de la formation et de l'année
+
+    Returns:
+        pd.DataFrame: La matrice en pourcentage, indexée par spe2 et avec spe1 en colonnes
+    """
+    specialites = df_filtered["spe1"].cat.categories
+    n = len(specialites)
+    spe1 = df_filtered["spe1"].cat.codes.to_numpy().astype(np.intp)
+    spe2 = df_filtered["spe2"].cat.codes.to_numpy().astype(np.intp)
+    propositions = df_filtered["propositions_d_admissions"].to_numpy()
+
+    matrix = np.bincount(spe2 * n + spe1, weights=propositions, minlength=n * n).reshape(n, n)
+    rows = np.flatnonzero(np.bincount(spe2, minlength=n))
+    columns = np.flatnonzero(np.bincount(spe1, minlength=n))
+    matrix = matrix[np.ix_(rows, columns)]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percentage = (matrix / matrix.max()) * 100
+
+    return pd.DataFrame(
+        percentage,
+        index=pd.Index(specialites[rows], name="spe2"),
+        columns=pd.Index(specialites[columns], name="spe1"),
+    )
+
+
+def generate_heatmap(df_filtered: pd.DataFrame, formation: str, annee: int) -> Optional[go.Figure]:
     """Génère un heatmap du nombre de propositions d'admission par doublette de spécialités pour une formation et une année données
 
     Args:
-        df (pd.DataFrame): le dataframe contenant les données
+        df_filtered (pd.DataFrame): les lignes de la formation et de l'année, déjà extraites avec l'index des groupes
         formation (str): la formation choisie dans le sélecteur
         annee (int): l'année choisie 
 
     Returns:
         Optional[go.Figure]: Le graphique ou none si aucune donnée n'est trouvée
     """
-    df_filtered = df[(df["formation"] == formation) & (df["annee_du_bac"] == annee)].copy()
     if df_filtered.empty:
         return None
 
-    df_filtered["spe1"] = df_filtered["doublette"].apply(lambda x: x[0])
-    df_filtered["spe2"] = df_filtered["doublette"].apply(lambda x: x[1])
-
-    pivot_table = df_filtered.pivot_table(
-        index="spe2",
-        columns="spe1",
-        values="propositions_d_admissions",
-        aggfunc="sum",
-        fill_value=0
-    )
-
-    max_value = pivot_table.max().max()
-    pivot_table_percentage = (pivot_table / max_value) * 100
+    pivot_table_percentage = compute_heatmap_matrix(df_filtered)
 
     fig = px.imshow(
         pivot_table_percentage,
@@ -253,19 +278,17 @@ def generate_gender_metrics(formation_data: Dict[str, Union[int, str]]) -> tuple
     return fig1, fig2
 
 
-def generate_double_bar_chart(df: pd.DataFrame, selected_formation: str, selected_year: int) -> go.Figure:
+def generate_double_bar_chart(filtered_df: pd.DataFrame, selected_formation: str, selected_year: int) -> go.Figure:
     """Génère un graphique à barres comparant les voeux et les propositions d'admission pour une formation et une année données
 
     Args:
-        df (pd.DataFrame): Le dataframe contenant les données
+        filtered_df (pd.DataFrame): Les lignes de la formation et de l'année, déjà extraites avec l'index des groupes
         selected_formation (str): La formation choisie dans le sélecteur
         selected_year (int): l'année choisie
 
     Returns:
         go.Figure: Le graphique
     """
-    filtered_df = df[(df['annee_du_bac'] == selected_year) & (df['formation'] == selected_formation)]
-
     melted_df = filtered_df.melt(
         id_vars=['couple_specialites'],
         value_vars=['voeux', 'propositions_d_admissions'],
@@ -296,3 +319,81 @@ def generate_double_bar_chart(df: pd.DataFrame, selected_formation: str, selecte
     fig.update_xaxes(showticklabels=False)
 
     return fig
+
+
+def render_formation_figures(filtered_df: pd.DataFrame, selected_formation: str, selected_year: int) -> Tuple[str, str]:
+    """Génère et sérialise en JSON le graphique en barres et la heatmap d'une formation pour une année
+
+    Args:
+        filtered_df (pd.DataFrame): Les lignes de la formation et de l'année
+        selected_formation (str): La formation choisie dans le sélecteur
+        selected_year (int): l'année choisie
+
+    Returns:
+        Tuple[str, str]: Le JSON du graphique en barres et celui de la heatmap ("null" si aucune donnée)
+    """
+    with timed("figure_build"):
+        bar_chart_figure = generate_double_bar_chart(filtered_df, selected_formation, selected_year)
+        heatmap_figure = generate_heatmap(filtered_df, selected_formation, selected_year)
+    with timed("figure_serialization"):
+        return pio.to_json(bar_chart_figure), pio.to_json(heatmap_figure) if heatmap_figure is not None else "null"
+
+
+def generate_trend_chart(trend: pd.DataFrame, selected_formation: Optional[str]) -> go.Figure:
+    """Génère l'évolution sur plusieurs années des voeux, propositions et acceptations d'une formation, avec son taux d'admission
+
+    Args:
+        trend (pd.DataFrame): Les effectifs par année, retournés par SpeCube.trend
+        selected_formation (Optional[str]): La formation choisie dans le sélecteur (None : toutes les formations)
+
+    Returns:
+        go.Figure: Le graphique (effectifs à gauche, taux d'admission à droite)
+    """
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    annees = trend['annee_du_bac'].tolist()
+    for column, name in [('voeux', 'Voeux'), ('propositions_d_admissions', "Propositions d'admission"), ('acceptations', 'Acceptations')]:
+        fig.add_trace(go.Scatter(x=annees, y=trend[column].tolist(), name=name, mode='lines+markers'), secondary_y=False)
+    fig.add_trace(
+        go.Scatter(x=annees, y=trend['taux_admission'].tolist(), name="Taux d'admission", mode='lines+markers',
+                   line=dict(dash='dot')),
+        secondary_y=True,
+    )
+
+    fig.update_layout(title=f"Évolution des candidatures ({selected_formation or 'toutes les formations'})", hovermode='x unified')
+    fig.update_xaxes(title_text="Année du bac", tickmode='array', tickvals=annees)
+    fig.update_yaxes(title_text="Nombre de candidats", secondary_y=False)
+    fig.update_yaxes(title_text="Propositions / voeux", tickformat=".0%", rangemode='tozero', secondary_y=True)
+
+    return fig
+
+
+def generate_top_doublettes_chart(top: pd.DataFrame, selected_formation: Optional[str], selected_year: int) -> go.Figure:
+    """Génère le classement des doublettes de spécialités par taux d'admission pour une formation et une année
+
+    Args:
+        top (pd.DataFrame): Les meilleures doublettes, retournées par SpeCube.top_doublettes
+        selected_formation (Optional[str]): La formation choisie dans le sélecteur (None : toutes les formations)
+        selected_year (int): L'année choisie
+
+    Returns:
+        go.Figure: Le graphique en barres horizontales, la meilleure doublette en haut
+    """
+    top = top.iloc[::-1]
+    fig = go.Figure(go.Bar(
+        x=top['taux_admission'].tolist(),
+        y=(top['spe1'].astype(str) + " + " + top['spe2'].astype(str)).tolist(),
+        orientation='h',
+        customdata=top[['voeux', 'propositions_d_admissions']].to_numpy(),
+        hovertemplate="<b>%{y}</b><br>Taux d'admission : %{x:.1%}<br>Voeux : %{customdata[0]}"
+                      "<br>Propositions : %{customdata[1]}<extra></extra>",
+    ))
+
+    fig.update_layout(
+        title=f"Doublettes de spécialités au meilleur taux d'admission ({selected_formation or 'toutes les formations'} - {selected_year})",
+        xaxis_title="Propositions d'admission / voeux",
+        height=max(300, 40 * len(top) + 150),
+        margin=dict(l=300),
+    )
+    fig.update_xaxes(tickformat=".0%", rangemode='tozero')
+
+    return fig
@@ -1,44 +1,47 @@
-import json
 from typing import List, Dict, Any
 
-def fetch_data_from_geojson(file_path: str, year: int) -> List[Dict[str, Any]]:
-    """ Récupère les données du GeoJSON pour une année donnée, en regroupant les formations par établissement """
-    
-    print(f"Chargement des données depuis le fichier GeoJSON : {file_path}...")
+from src.utils.geojson_index import load_year_partition, ESTABLISHMENT_FIELDS
+from src.utils.metrics import timed
 
-    with open(file_path, 'r', encoding='utf-8') as file:
-        geojson_data = json.load(file)
+def fetch_data_from_geojson(file_path: str, year: int) -> List[Dict[str, Any]]:
+    """ Récupère les données du GeoJSON pour une année donnée, en regroupant les formations par établissement
 
-    establishments = {}
+    Les données sont lues depuis l'index partitionné par année (construit une seule fois par version du fichier),
+    le coût ne dépend donc que du nombre d'établissements de l'année.
+    """
+    
+    print(f"Chargement des données depuis l'index du fichier GeoJSON : {file_path}...")
 
-    for feature in geojson_data['features']:
-        properties = feature['properties']
-        geometry = feature['geometry']
+    with timed("geojson_file_load"):
+        partition = load_year_partition(file_path, year)
+    if partition is None:
+        print(f"0 établissements trouvés pour l'année {year}.")
+        return []
 
-        if properties['annee'] == year:
-            etab_uai = properties['etab_uai']
-            formation = properties['nm'][0]  # Assuming that 'nm' is a list and you take the first formation
+    dictionaries = partition['dictionaries']
+    columns = {field: [dictionaries[field][code] for code in partition[field].tolist()] for field in ESTABLISHMENT_FIELDS}
+    latitudes = partition['latitude'].tolist()
+    longitudes = partition['longitude'].tolist()
+    offsets = partition['formation_offsets'].tolist()
+    formation_names = dictionaries['formations']
+    formation_codes = partition['formation_codes'].tolist()
 
-            if etab_uai not in establishments:
-                establishments[etab_uai] = {
-                    'etab_nom': properties['etab_nom'],
-                    'etab_uai': etab_uai,
-                    'annee': properties['annee'],
-                    'tc': properties['tc'],
-                    'region': properties['region'],
-                    'departement': properties['departement'],
-                    'commune': properties['commune'],
-                    'fiche': properties['fiche'],
-                    'etab_url': properties['etab_url'],
-                    'latitude': geometry['coordinates'][1],
-                    'longitude': geometry['coordinates'][0],
-                    'formations': []  # Initialize an empty list for formations
-                }
-            
-            # Ajouter la formation à la liste des formations de l'établissement
-            establishments[etab_uai]['formations'].append(formation)
+    results = []
+    for row in range(len(latitudes)):
+        results.append({
+            'etab_nom': columns['etab_nom'][row],
+            'etab_uai': columns['etab_uai'][row],
+            'annee': year,
+            'tc': columns['tc'][row],
+            'region': columns['region'][row],
+            'departement': columns['departement'][row],
+            'commune': columns['commune'][row],
+            'fiche': columns['fiche'][row],
+            'etab_url': columns['etab_url'][row],
+            'latitude': latitudes[row],
+            'longitude': longitudes[row],
+            'formations': [formation_names[code] for code in formation_codes[offsets[row]:offsets[row + 1]]],
+        })
 
-    # Convertir le dictionnaire en une liste de résultats
-    results = list(establishments.values())
     print(f"{len(results)} établissements trouvés pour l'année {year}.")
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,83 @@
+from typing import Any, Dict, List
+import dash_bootstrap_components as dbc
+from dash import dcc, html
+
+# Rayons proposés pour la recherche des établissements proches, en kilomètres
+NEARBY_RADII = [5, 10, 20, 50, 100]
+DEFAULT_NEARBY_RADIUS = 20
+
+
+def create_nearby_section(formations: List[str]) -> dbc.Card:
+    """Crée le bloc des établissements proches : choix d'une formation de l'établissement affiché et d'un rayon
+
+    La liste des établissements est remplie par le callback update_nearby_establishments.
+
+    Args:
+        formations (List[str]): Les formations proposées par l'établissement affiché
+
+    Returns:
+        dbc.Card: Le bloc des établissements proches
+    """
+    return dbc.Card(
+        [
+            dbc.CardHeader(html.H5("Établissements proches proposant la même formation", className="mb-0")),
+            dbc.CardBody(
+                [
+                    dbc.Row(
+                        [
+                            dbc.Col(
+                                dcc.Dropdown(
+                                    id='nearby-formation',
+                                    options=[{'label': formation, 'value': formation} for formation in formations],
+                                    value=formations[0] if formations else None,
+                                    placeholder="Sélectionnez une formation",
+                                ),
+                                md=9,
+                            ),
+                            dbc.Col(
+                                dcc.Dropdown(
+                                    id='nearby-radius',
+                                    options=[{'label': f"{radius} km", 'value': radius} for radius in NEARBY_RADII],
+                                    value=DEFAULT_NEARBY_RADIUS,
+                                    clearable=False,
+                                ),
+                                md=3,
+                            ),
+                        ],
+                        className="mb-3",
+                    ),
+                    html.Div(id='nearby-results'),
+                ]
+            ),
+        ],
+        className="mb-4",
+    )
+
+
+def create_nearby_list(establishments: List[Dict[str, Any]], radius: float) -> html.Div:
+    """Affiche les établissements proches, du plus proche au plus éloigné
+
+    Args:
+        establishments (List[Dict[str, Any]]): Les établissements (etab_nom, commune, distance en kilomètres)
+        radius (float): Le rayon de la recherche, en kilomètres
+
+    Returns:
+        html.Div: La liste des établissements
+    """
+    if not establishments:
+        return html.P(f"Aucun autre établissement ne propose cette formation à moins de {radius} km.")
+    return html.Div(
+        dbc.ListGroup(
+            [
+                dbc.ListGroupItem(
+                    [
+                        html.Span(f"{establishment['etab_nom']} – {establishment['commune']}"),
+                        dbc.Badge(f"{establishment['distance']:.1f} km".replace(".", ","), color="primary",
+                                  className="ms-2"),
+                    ],
+                    className="d-flex justify-content-between align-items-center",
+                )
+                for establishment in establishments
+            ]
+        )
+    )
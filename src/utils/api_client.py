@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.utils.metrics import LatencyHistogram
+
+API_BASE_URL = os.environ.get(
+    "PARCOURSUP_API_URL", "https://data.enseignementsup-recherche.gouv.fr/api/explore/v2.1"
+)
+
+# L'API Explore v2.1 renvoie au plus 100 résultats par page et refuse offset + limit > 10000
+MAX_PAGE_SIZE = 100
+MAX_RESULT_WINDOW = 10000
+
+
+class ApiBusyError(requests.exceptions.RequestException):
+    """Levée quand trop de requêtes vers l'API sont déjà en cours"""
+
+
+class ParcoursupApiClient:
+    """Client HTTP de l'API Explore v2.1 des données Parcoursup
+
+    Une seule session est partagée par tous les callbacks : les connexions TLS sont réutilisées (keep-alive),
+    chaque requête a un délai de connexion et de lecture, les erreurs temporaires sont réessayées avec un délai
+    croissant et le nombre de requêtes simultanées est limité. Les pages suivant la première sont
+    récupérées en parallèle, par au plus max_fanout threads.
+    """
+
+    def __init__(self, base_url: str = API_BASE_URL, connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 max_retries: int = 2, backoff_factor: float = 0.3, max_concurrency: int = 8,
+                 page_size: int = MAX_PAGE_SIZE, max_fanout: int = 4):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self._executor = ThreadPoolExecutor(max_workers=max_fanout, thread_name_prefix="parcoursup-api")
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Envoie une requête GET à l'API et retourne la réponse JSON
+
+        Args:
+            path (str): Le chemin relatif à l'URL de base de l'API
+            params (Optional[Dict[str, Any]]): Les paramètres de la requête
+
+        Returns:
+            Dict[str, Any]: La réponse JSON
+
+        Raises:
+            requests.exceptions.RequestException: En cas d'erreur réseau, de délai dépassé, d'erreur HTTP
+                ou si la limite de requêtes simultanées est atteinte trop longtemps
+        """
+        if not self._semaphore.acquire(timeout=self.timeout[1]):
+            self.errors += 1
+            raise ApiBusyError("Trop de requêtes simultanées vers l'API Parcoursup")
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            self.errors += 1
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+            self._semaphore.release()
+
+    def fetch_establishment_records(self, year: int, cod_uai: str) -> List[Dict[str, Any]]:
+        """Récupère toutes les pages des formations d'un établissement pour une session Parcoursup
+
+        La première page donne total_count ; les pages restantes sont demandées en parallèle.
+
+        Args:
+            year (int): L'année de la session
+            cod_uai (str): Le code UAI de l'établissement
+
+        Returns:
+            List[Dict[str, Any]]: Les pages de la réponse de l'API (total_count et results), dans l'ordre
+        """
+        path = f"/catalog/datasets/fr-esr-parcoursup_{year}/records"
+        where = f'cod_uai LIKE "{cod_uai}"'
+
+        def fetch_page(offset: int) -> Dict[str, Any]:
+            return self.get_json(path, params={'where': where, 'limit': self.page_size, 'offset': offset})
+
+        first_page = fetch_page(0)
+        total_count = min(first_page.get('total_count', 0), MAX_RESULT_WINDOW)
+        offsets = range(self.page_size, total_count, self.page_size)
+        return [first_page] + list(self._executor.map(fetch_page, offsets))
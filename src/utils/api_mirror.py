@@ -0,0 +1,190 @@
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.geojson_index import get_dataset_version
+from src.utils.geojson_stream import iter_json_records
+from src.utils.get_data import get_latest_data, get_data_path
+
+MIRROR_PATH = "./data/processed/parcoursup_mirror.sqlite"
+EXPORT_URL = "https://data.enseignementsup-recherche.gouv.fr/api/explore/v2.1/catalog/datasets/fr-esr-parcoursup_{year}/exports/json?lang=fr&timezone=Europe%2FBerlin"
+
+# Nombre d'enregistrements insérés par requête lors de la construction du miroir
+BATCH_SIZE = 1000
+
+
+def _connect(mirror_path: str) -> sqlite3.Connection:
+    """Ouvre le miroir et crée ses tables si besoin"""
+    Path(mirror_path).parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(mirror_path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS records ("
+        " year INTEGER NOT NULL, cod_uai TEXT NOT NULL, position INTEGER NOT NULL, payload TEXT NOT NULL)"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS records_year_uai ON records (year, cod_uai, position)")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS establishments (year INTEGER NOT NULL, cod_uai TEXT NOT NULL,"
+        " digest TEXT NOT NULL, PRIMARY KEY (year, cod_uai))"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS sessions (year INTEGER PRIMARY KEY, source_version TEXT NOT NULL,"
+        " record_count INTEGER NOT NULL, built_at REAL NOT NULL)"
+    )
+    return connection
+
+
+def _establishment_digests(export_path: str) -> Tuple[Dict[str, str], int]:
+    """Calcule l'empreinte des enregistrements de chaque établissement d'un export, lu en flux
+
+    Les empreintes des enregistrements d'un établissement sont triées avant d'être combinées : un établissement
+    dont aucune formation n'a changé garde la même empreinte, même si l'ordre de l'export change.
+
+    Returns:
+        Tuple[Dict[str, str], int]: L'empreinte de chaque code UAI et le nombre d'enregistrements
+    """
+    record_hashes = {}
+    count = 0
+    for record in iter_json_records(export_path):
+        payload = json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        record_hashes.setdefault(record.get('cod_uai', ''), []).append(hashlib.md5(payload).digest())
+        count += 1
+    digests = {cod_uai: hashlib.md5(b"".join(sorted(hashes))).hexdigest() for cod_uai, hashes in record_hashes.items()}
+    return digests, count
+
+
+def build_mirror(year: int, export_path: str, mirror_path: str = MIRROR_PATH) -> Tuple[int, List[str]]:
+    """Met à jour dans le miroir les enregistrements d'une session à partir d'un export JSON complet
+
+    L'export est lu en flux deux fois : une première fois pour calculer l'empreinte de chaque établissement,
+    une seconde pour n'écrire que les établissements nouveaux ou modifiés (clé naturelle : année, UAI,
+    formation). Les modifications sont faites dans une seule transaction : les lecteurs voient soit
+    l'ancienne session, soit la nouvelle.
+
+    Args:
+        year (int): L'année de la session
+        export_path (str): Le chemin de l'export JSON de fr-esr-parcoursup_{year}
+        mirror_path (str): Le chemin du miroir SQLite
+
+    Returns:
+        Tuple[int, List[str]]: Le nombre d'enregistrements de la session et les codes UAI ajoutés, modifiés ou supprimés
+    """
+    print(f"Mise à jour du miroir de la session {year} depuis {export_path}...")
+    digests, count = _establishment_digests(export_path)
+
+    connection = _connect(mirror_path)
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        previous = dict(connection.execute("SELECT cod_uai, digest FROM establishments WHERE year = ?", (year,)).fetchall())
+        if not previous:
+            # Session absente du miroir (ou construite sans empreintes) : tout est réécrit
+            connection.execute("DELETE FROM records WHERE year = ?", (year,))
+        changed = {cod_uai for cod_uai, digest in digests.items() if previous.get(cod_uai) != digest}
+        removed = set(previous) - set(digests)
+
+        connection.executemany("DELETE FROM records WHERE year = ? AND cod_uai = ?",
+                               [(year, cod_uai) for cod_uai in changed | removed])
+        connection.executemany("DELETE FROM establishments WHERE year = ? AND cod_uai = ?",
+                               [(year, cod_uai) for cod_uai in removed])
+
+        if changed:
+            batch = []
+            for position, record in enumerate(iter_json_records(export_path)):
+                cod_uai = record.get('cod_uai', '')
+                if cod_uai not in changed:
+                    continue
+                batch.append((year, cod_uai, position, json.dumps(record, ensure_ascii=False)))
+                if len(batch) >= BATCH_SIZE:
+                    connection.executemany("INSERT INTO records VALUES (?, ?, ?, ?)", batch)
+                    batch = []
+            connection.executemany("INSERT INTO records VALUES (?, ?, ?, ?)", batch)
+            connection.executemany("INSERT OR REPLACE INTO establishments VALUES (?, ?, ?)",
+                                   [(year, cod_uai, digests[cod_uai]) for cod_uai in changed])
+
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+            (year, get_dataset_version(export_path), count, time.time()),
+        )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+    print(f"Session {year} : {len(changed)} établissements écrits, {len(removed)} supprimés, {len(digests) - len(changed)} inchangés.")
+    return count, sorted(changed | removed)
+
+
+def get_session_version(year: int, mirror_path: str = MIRROR_PATH) -> str:
+    """Retourne la version de l'export à partir de laquelle la session a été construite dans le miroir ("" si absente)"""
+    connection = _connect(mirror_path)
+    try:
+        row = connection.execute("SELECT source_version FROM sessions WHERE year = ?", (year,)).fetchone()
+    finally:
+        connection.close()
+    return row[0] if row is not None else ""
+
+
+def mirror_session(year: int, target_dir: str = "./data/raw", mirror_path: str = MIRROR_PATH) -> bool:
+    """Télécharge l'export complet d'une session et reconstruit son miroir s'il a changé
+
+    Args:
+        year (int): L'année de la session
+        target_dir (str): Le dossier des données brutes
+        mirror_path (str): Le chemin du miroir SQLite
+
+    Returns:
+        bool: True si le miroir de la session a été reconstruit, False sinon
+    """
+    url = EXPORT_URL.format(year=year)
+    get_latest_data(url, target_dir)
+    export_path = str(get_data_path(url, target_dir))
+
+    if get_session_version(year, mirror_path) == get_dataset_version(export_path):
+        return False
+
+    build_mirror(year, export_path, mirror_path)
+    return True
+
+
+def lookup_establishment_records(year: int, cod_uai: str, mirror_path: str = MIRROR_PATH) -> Optional[Dict[str, Any]]:
+    """Cherche les formations d'un établissement dans le miroir local
+
+    Args:
+        year (int): L'année de la session
+        cod_uai (str): Le code UAI de l'établissement
+        mirror_path (str): Le chemin du miroir SQLite
+
+    Returns:
+        Optional[Dict[str, Any]]: Une réponse au format de l'API (total_count et results),
+            ou None si la session n'est pas dans le miroir
+    """
+    if not Path(mirror_path).exists():
+        return None
+
+    connection = sqlite3.connect(f"file:{mirror_path}?mode=ro", uri=True, timeout=10)
+    try:
+        if connection.execute("SELECT 1 FROM sessions WHERE year = ?", (year,)).fetchone() is None:
+            return None
+        rows = connection.execute(
+            "SELECT payload FROM records WHERE year = ? AND cod_uai = ? ORDER BY position", (year, cod_uai)
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+
+    results = [json.loads(payload) for payload, in rows]
+    return {'total_count': len(results), 'results': results}
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.utils.api_mirror 2021 2022 2023
+    for session in sys.argv[1:]:
+        updated = mirror_session(int(session))
+        print(f"Session {session} : {'miroir reconstruit' if updated else 'déjà à jour'}.")
@@ -0,0 +1,38 @@
+import os
+from typing import Any, Dict
+
+# Dossier du cache partagé sur disque, utilisé par tous les workers d'un même serveur
+CACHE_DIR = "./data/processed/flask_cache"
+DEFAULT_TIMEOUT = 3600
+
+
+def get_cache_config() -> Dict[str, Any]:
+    """Retourne la configuration de flask_caching choisie avec la variable d'environnement PARCOURSUP_CACHE
+
+    - simple (par défaut) : cache en mémoire du processus, suffisant avec un seul processus ;
+    - filesystem : cache sur disque partagé par tous les workers (dossier PARCOURSUP_CACHE_DIR) ;
+    - redis : cache Redis partagé (PARCOURSUP_REDIS_URL), nécessite le paquet redis.
+
+    Returns:
+        Dict[str, Any]: La configuration à passer à Cache.init_app
+    """
+    backend = os.environ.get("PARCOURSUP_CACHE", "simple")
+    config = {'CACHE_DEFAULT_TIMEOUT': DEFAULT_TIMEOUT}
+
+    if backend == "simple":
+        config['CACHE_TYPE'] = 'SimpleCache'
+    elif backend == "filesystem":
+        config.update({
+            'CACHE_TYPE': 'FileSystemCache',
+            'CACHE_DIR': os.environ.get("PARCOURSUP_CACHE_DIR", CACHE_DIR),
+            'CACHE_THRESHOLD': 10000,
+        })
+    elif backend == "redis":
+        config.update({
+            'CACHE_TYPE': 'RedisCache',
+            'CACHE_REDIS_URL': os.environ.get("PARCOURSUP_REDIS_URL", "redis://127.0.0.1:6379/0"),
+            'CACHE_KEY_PREFIX': 'parcoursup:',
+        })
+    else:
+        raise ValueError(f"PARCOURSUP_CACHE inconnu : {backend} (simple, filesystem ou redis)")
+    return config
@@ -0,0 +1,86 @@
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.spatial_index import KDTree, project
+
+# Taille en pixels d'une cellule de regroupement, comme l'ancien superClusterOptions={"radius": 100}
+CLUSTER_RADIUS = 100
+TILE_SIZE = 256
+MIN_ZOOM = 0
+# Au-delà de ce zoom, les établissements sont tous affichés individuellement
+MAX_CLUSTER_ZOOM = 15
+# Marge ajoutée autour de la zone visible, en fraction de sa taille, pour que les marqueurs proches soient déjà là
+VIEWPORT_PADDING = 0.2
+
+# Zone affichée au chargement de la carte, avant que le navigateur n'envoie ses limites
+DEFAULT_BOUNDS = [[41.0, -5.5], [51.5, 10.0]]
+
+
+class ClusterIndex:
+    """Index hiérarchique de regroupement des établissements, précalculé sur une grille par niveau de zoom
+
+    À chaque zoom, le monde est découpé en cellules de CLUSTER_RADIUS pixels ; les établissements d'une même
+    cellule forment un cluster placé à leur barycentre. Une requête ne renvoie que les clusters et les
+    établissements isolés de la zone visible.
+    """
+
+    def __init__(self, latitudes: np.ndarray, longitudes: np.ndarray, radius: int = CLUSTER_RADIUS,
+                 min_zoom: int = MIN_ZOOM, max_zoom: int = MAX_CLUSTER_ZOOM):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.levels = {}
+
+        x, y = project(self.latitudes, self.longitudes)
+        # Au-delà de max_zoom, les établissements de la zone visible sont cherchés dans un arbre k-d
+        self.tree = KDTree(x, y)
+        for zoom in range(min_zoom, max_zoom + 1):
+            cell_size = radius / (TILE_SIZE * 2 ** zoom)
+            keys = np.floor(x / cell_size).astype(np.int64) << 32 | np.floor(y / cell_size).astype(np.int64)
+            _, first_index, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+            self.levels[zoom] = {
+                'latitude': np.bincount(inverse, weights=self.latitudes) / counts,
+                'longitude': np.bincount(inverse, weights=self.longitudes) / counts,
+                'count': counts,
+                # Pour une cellule d'un seul établissement, la position de cet établissement
+                'first_index': first_index,
+            }
+
+    def query(self, bounds: Optional[List[List[float]]], zoom: Optional[float]) -> Tuple[List[Tuple[float, float, int]], np.ndarray]:
+        """Retourne les clusters et les établissements isolés visibles dans une zone de la carte
+
+        Args:
+            bounds (Optional[List[List[float]]]): Les limites [[sud, ouest], [nord, est]] de la carte
+            zoom (Optional[float]): Le niveau de zoom de la carte
+
+        Returns:
+            Tuple[List[Tuple[float, float, int]], np.ndarray]: Les clusters (latitude, longitude, nombre
+                d'établissements) et les positions des établissements affichés individuellement
+        """
+        (south, west), (north, east) = bounds or DEFAULT_BOUNDS
+        lat_margin = (north - south) * VIEWPORT_PADDING
+        lon_margin = (east - west) * VIEWPORT_PADDING
+        south, north = south - lat_margin, north + lat_margin
+        west, east = west - lon_margin, east + lon_margin
+
+        zoom = int(math.floor(zoom if zoom is not None else 6))
+        if zoom > self.max_zoom:
+            min_x, max_y = project(south, west)
+            max_x, min_y = project(north, east)
+            return [], np.sort(self.tree.range(float(min_x), float(min_y), float(max_x), float(max_y)))
+
+        level = self.levels[max(zoom, self.min_zoom)]
+        visible = ((level['latitude'] >= south) & (level['latitude'] <= north)
+                   & (level['longitude'] >= west) & (level['longitude'] <= east))
+        single = visible & (level['count'] == 1)
+        grouped = np.flatnonzero(visible & (level['count'] > 1))
+
+        clusters = list(zip(
+            level['latitude'][grouped].tolist(),
+            level['longitude'][grouped].tolist(),
+            level['count'][grouped].tolist(),
+        ))
+        return clusters, level['first_index'][single]
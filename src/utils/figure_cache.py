@@ -0,0 +1,148 @@
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Taille maximale par défaut du cache des figures : 64 Mo de JSON
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    """Cache LRU borné en taille des figures déjà sérialisées en JSON
+
+    Les valeurs sont des tuples de chaînes JSON (une par figure), leur taille est la somme des longueurs.
+    Le cache est protégé par un verrou car le serveur Dash traite les requêtes dans plusieurs threads.
+
+    Avec plusieurs workers, shared (par exemple le Cache de flask_caching, avec ses méthodes get et set) sert
+    de second niveau partagé : une figure calculée par un worker est relue par les autres au lieu d'être recalculée.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, shared: Any = None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @staticmethod
+    def _size(payloads: Tuple[str, ...]) -> int:
+        return sum(len(payload) for payload in payloads)
+
+    @staticmethod
+    def _shared_key(key: Hashable) -> str:
+        return "figures:" + hashlib.md5(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[Tuple[str, ...]]:
+        """Retourne les figures sérialisées d'une clé, ou None, et met à jour les compteurs"""
+        with self._lock:
+            payloads = self._entries.get(key)
+            if payloads is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payloads
+
+        payloads = self.shared.get(self._shared_key(key)) if self.shared is not None else None
+        with self._lock:
+            if payloads is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._store(key, tuple(payloads))
+        return tuple(payloads)
+
+    def set(self, key: Hashable, payloads: Tuple[str, ...]) -> None:
+        """Ajoute des figures sérialisées (aussi dans le cache partagé) et évince les moins récemment utilisées"""
+        self._store(key, payloads)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), payloads)
+
+    def _store(self, key: Hashable, payloads: Tuple[str, ...]) -> None:
+        """Ajoute des figures au cache du processus en respectant la taille maximale"""
+        size = self._size(payloads)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._size(self._entries.pop(key))
+            self._entries[key] = payloads
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= self._size(evicted)
+
+    def get_or_render(self, key: Hashable, render: Callable[..., Tuple[str, ...]], *args: Any) -> Tuple[str, ...]:
+        """Retourne les figures en cache, ou les calcule avec render(*args) et les met en cache"""
+        payloads = self.get(key)
+        if payloads is None:
+            payloads = render(*args)
+            self.set(key, payloads)
+        return payloads
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Supprime les entrées du processus dont la clé vérifie predicate et retourne leur nombre
+
+        Les entrées du cache partagé ne sont pas parcourues : leurs clés contiennent l'empreinte des données,
+        celles des données modifiées ne sont plus demandées et expirent d'elles-mêmes.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.current_bytes -= self._size(self._entries.pop(key))
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les compteurs du cache (succès, échecs, nombre d'entrées, taille)"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def warm_up(cache: FigureCache, tasks: Dict[Hashable, Tuple[Any, ...]], render: Callable[..., Tuple[str, ...]],
+            processes: Optional[int] = None) -> int:
+    """Pré-calcule en parallèle, dans un pool de processus, les figures absentes du cache
+
+    Les processus sont lancés avec spawn et non fork : warm_up est appelée depuis le thread de chargement des
+    données, pendant que le serveur traite des requêtes dans d'autres threads, et un fork copierait les verrous
+    tenus par ces threads (blocage possible des processus du pool). Les arguments sont donc envoyés par pickle.
+
+    Args:
+        cache (FigureCache): Le cache à remplir
+        tasks (Dict[Hashable, Tuple[Any, ...]]): Les arguments de render pour chaque clé du cache
+        render (Callable[..., Tuple[str, ...]]): La fonction de rendu, définie au niveau d'un module pour être picklable
+        processes (Optional[int]): Le nombre de processus (par défaut, le nombre de cœurs)
+
+    Returns:
+        int: Le nombre de clés calculées
+    """
+    tasks = {key: args for key, args in tasks.items() if key not in cache}
+    if not tasks:
+        return 0
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(render, *args): key for key, args in tasks.items()}
+        for future in as_completed(futures):
+            cache.set(futures[future], future.result())
+
+    return len(tasks)
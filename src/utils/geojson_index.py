@@ -0,0 +1,365 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from src.utils.geojson_stream import iter_geojson_features
+from src.utils.search_index import PrefixIndex
+
+INDEX_DIR = "./data/processed/geojson_index"
+
+# Colonnes texte de l'établissement, encodées par dictionnaire dans l'index
+ESTABLISHMENT_FIELDS = ['etab_nom', 'etab_uai', 'tc', 'region', 'departement', 'commune', 'fiche', 'etab_url']
+# Colonnes indexées pour la recherche d'établissements
+SEARCH_FIELDS = ['etab_nom', 'commune', 'etab_uai']
+SEARCH_INDEX_FILE = "search.npz"
+# Fichier verrouillé pendant la construction et le nettoyage de l'index, pour les sérialiser entre processus
+BUILD_LOCK_FILE = "build.lock"
+
+# Verrou de construction entre les threads du processus (le verrou du fichier est propre à chaque descripteur)
+_build_lock = threading.Lock()
+# Partitions de la dernière version lue, par dossier d'index : {dossier: (version, partitions)}
+_manifest_cache: Dict[str, Tuple[str, Dict[str, str]]] = {}
+
+
+def get_dataset_version(file_path: str) -> str:
+    """Calcule un identifiant de version d'un fichier de données à partir de sa taille et de sa date de modification
+
+    Args:
+        file_path (str): Le chemin du fichier
+
+    Returns:
+        str: L'identifiant de version
+    """
+    stat = os.stat(file_path)
+    signature = f"{Path(file_path).name}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.md5(signature.encode('utf-8')).hexdigest()[:16]
+
+
+def _encode(value: Any, dictionary: List[Any], lookup: Dict[Any, int]) -> int:
+    """Retourne le code d'une valeur dans un dictionnaire, en l'y ajoutant si besoin"""
+    key = json.dumps(value, sort_keys=True) if isinstance(value, (list, dict)) else value
+    code = lookup.get(key)
+    if code is None:
+        code = len(dictionary)
+        lookup[key] = code
+        dictionary.append(value)
+    return code
+
+
+def group_by_year(features) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Regroupe les features par année puis par établissement (etab_uai), dans l'ordre d'apparition du fichier
+
+    Les noms de formation sont partagés entre établissements plutôt que dupliqués à chaque feature.
+
+    Args:
+        features: Un itérable de features GeoJSON, par exemple le générateur iter_geojson_features
+
+    Returns:
+        Dict[str, Dict[str, Dict[str, Any]]]: Les établissements de chaque année, par code UAI
+    """
+    years = {}
+    formation_names = {}
+    for feature in features:
+        properties = feature['properties']
+        geometry = feature['geometry']
+
+        establishments = years.setdefault(properties['annee'], {})
+        etab_uai = properties['etab_uai']
+        if etab_uai not in establishments:
+            establishments[etab_uai] = {
+                **{field: properties[field] for field in ESTABLISHMENT_FIELDS},
+                'latitude': geometry['coordinates'][1],
+                'longitude': geometry['coordinates'][0],
+                'formations': [],
+            }
+        formation = properties['nm'][0]
+        establishments[etab_uai]['formations'].append(formation_names.setdefault(formation, formation))
+    return years
+
+
+def _write_partition(partition_path: Path, establishments: List[Dict[str, Any]]) -> None:
+    """Écrit la partition d'une année : tableaux numpy des coordonnées, codes des colonnes texte et formations,
+    et index de recherche des établissements"""
+    partition_path.mkdir(parents=True)
+
+    dictionaries = {field: [] for field in ESTABLISHMENT_FIELDS + ['formations']}
+    lookups = {field: {} for field in dictionaries}
+
+    codes = {field: np.empty(len(establishments), dtype=np.int32) for field in ESTABLISHMENT_FIELDS}
+    formation_offsets = np.zeros(len(establishments) + 1, dtype=np.int64)
+    formation_codes = []
+
+    for row, establishment in enumerate(establishments):
+        for field in ESTABLISHMENT_FIELDS:
+            codes[field][row] = _encode(establishment[field], dictionaries[field], lookups[field])
+        for formation in establishment['formations']:
+            formation_codes.append(_encode(formation, dictionaries['formations'], lookups['formations']))
+        formation_offsets[row + 1] = len(formation_codes)
+
+    np.save(partition_path / "latitude.npy", np.array([e['latitude'] for e in establishments], dtype=np.float64))
+    np.save(partition_path / "longitude.npy", np.array([e['longitude'] for e in establishments], dtype=np.float64))
+    for field in ESTABLISHMENT_FIELDS:
+        np.save(partition_path / f"{field}.npy", codes[field])
+    np.save(partition_path / "formation_codes.npy", np.array(formation_codes, dtype=np.int32))
+    np.save(partition_path / "formation_offsets.npy", formation_offsets)
+
+    with open(partition_path / "dictionaries.json", 'w', encoding='utf-8') as file:
+        json.dump(dictionaries, file, ensure_ascii=False)
+
+    _build_search_index(establishments).save(partition_path / SEARCH_INDEX_FILE)
+
+
+def _build_search_index(establishments: List[Dict[str, Any]]) -> PrefixIndex:
+    """Construit l'index de recherche (nom, commune, UAI) des établissements d'une année, dans l'ordre de la partition"""
+    return PrefixIndex.from_documents([" ".join(str(establishment[field]) for field in SEARCH_FIELDS) for establishment in establishments])
+
+
+def _partition_digest(establishments: Dict[str, Dict[str, Any]]) -> str:
+    """Calcule l'empreinte du contenu d'une année, indépendante de l'ordre des features dans le fichier
+
+    Les établissements sont triés par code UAI et leurs formations par nom : la clé naturelle d'une ligne
+    est (année, UAI, formation), une année dont aucune ligne n'a changé garde donc la même empreinte.
+    """
+    hash_md5 = hashlib.md5()
+    for etab_uai in sorted(establishments):
+        establishment = establishments[etab_uai]
+        row = {**establishment, 'formations': sorted(establishment['formations'])}
+        hash_md5.update(json.dumps(row, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return hash_md5.hexdigest()[:16]
+
+
+def _manifest_path(version: str, index_dir: str) -> Path:
+    return Path(index_dir) / f"{version}.json"
+
+
+@contextmanager
+def _index_lock(index_dir: str) -> Iterator[None]:
+    """Verrou exclusif sur le dossier d'index : entre les threads du processus, puis entre les processus
+
+    Le verrou du fichier est libéré par le système si le processus s'arrête brutalement.
+    """
+    index_root = Path(index_dir)
+    index_root.mkdir(parents=True, exist_ok=True)
+    with _build_lock, open(index_root / BUILD_LOCK_FILE, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    # LK_LOCK abandonne après 10 secondes d'attente
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_manifest(version: str, index_dir: str) -> Optional[Dict[str, str]]:
+    """Lit les partitions du manifeste d'une version, ou None s'il n'existe pas"""
+    manifest_path = _manifest_path(version, index_dir)
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        return json.load(file)['partitions']
+
+
+def load_index_manifest(file_path: str, index_dir: str = INDEX_DIR) -> Optional[Dict[str, str]]:
+    """Retourne les partitions (année -> dossier de partition) de l'index d'une version du GeoJSON, ou None s'il n'est pas construit"""
+    return _read_manifest(get_dataset_version(file_path), index_dir)
+
+
+def build_geojson_index(file_path: str, index_dir: str = INDEX_DIR, cleanup: bool = False) -> Dict[str, str]:
+    """Construit l'index des établissements partitionné par année pour une version du GeoJSON
+
+    Chaque partition est rangée sous l'empreinte de son contenu (“partitions/<année>_<empreinte>”) : quand le
+    fichier change, seules les années dont le contenu a changé sont réécrites, les autres sont reprises telles
+    quelles. Le manifeste de la version (“<version>.json”) est écrit en dernier, de façon atomique, pour que
+    les autres processus ne voient jamais un index incomplet.
+
+    Les constructions sont sérialisées par un verrou (threads et processus) : les suivants relisent le manifeste
+    écrit par le premier au lieu de refaire la lecture du fichier. Le manifeste lu est gardé en mémoire tant
+    que la version du fichier ne change pas et que le manifeste existe : get_partition_id ne relit donc pas le
+    manifeste à chaque callback.
+
+    Args:
+        file_path (str): Le chemin du fichier GeoJSON
+        index_dir (str): Le dossier racine des index
+        cleanup (bool): Supprimer les index des autres versions une fois celui-ci construit. Désactivé par
+            défaut : l'application ne supprime rien, car un index construit par ingest.py dans le même dossier
+            pour un fichier pas encore publié serait perdu ; ingest.py appelle remove_old_indexes à la publication
+
+    Returns:
+        Dict[str, str]: Le nom du dossier de partition de chaque année
+    """
+    version = get_dataset_version(file_path)
+    cache_key = os.path.abspath(index_dir)
+    cached = _manifest_cache.get(cache_key)
+    # Le manifeste doit encore exister : le dossier d'index a pu être supprimé à la main
+    if cached is not None and cached[0] == version and _manifest_path(version, index_dir).exists():
+        return cached[1]
+
+    partitions = _read_manifest(version, index_dir)
+    if partitions is None:
+        with _index_lock(index_dir):
+            # Un autre thread ou processus a pu construire l'index pendant l'attente du verrou
+            partitions = _read_manifest(version, index_dir)
+            if partitions is None:
+                partitions = _build_partitions(file_path, version, index_dir)
+                if cleanup:
+                    _remove_old_indexes(version, index_dir)
+    _manifest_cache[cache_key] = (version, partitions)
+    return partitions
+
+
+def _build_partitions(file_path: str, version: str, index_dir: str) -> Dict[str, str]:
+    """Lit le GeoJSON, écrit les partitions absentes puis le manifeste de la version (verrou de l'index tenu)"""
+    print(f"Construction de l'index des établissements pour {file_path}...")
+    # Lecture en flux : le fichier n'est jamais chargé en entier en mémoire
+    years = group_by_year(iter_geojson_features(file_path))
+
+    partitions_root = Path(index_dir) / "partitions"
+    partitions_root.mkdir(parents=True, exist_ok=True)
+    partitions = {}
+    for year, establishments in years.items():
+        partition_name = f"{year}_{_partition_digest(establishments)}"
+        partitions[str(year)] = partition_name
+        partition_path = partitions_root / partition_name
+        if partition_path.exists():
+            continue
+
+        temp_path = partitions_root / f"tmp_{partition_name}_{uuid.uuid4().hex}"
+        _write_partition(temp_path, list(establishments.values()))
+        try:
+            os.rename(temp_path, partition_path)
+        except OSError:
+            # Un autre processus a construit la même partition entre-temps
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    manifest_path = _manifest_path(version, index_dir)
+    temp_manifest = manifest_path.with_name(f"tmp_{uuid.uuid4().hex}.json")
+    with open(temp_manifest, 'w', encoding='utf-8') as file:
+        json.dump({'source': Path(file_path).name, 'partitions': partitions}, file)
+    os.replace(temp_manifest, manifest_path)
+    return partitions
+
+
+def remove_old_indexes(version: str, index_dir: str = INDEX_DIR) -> None:
+    """Supprime les manifestes des autres versions, les partitions qui ne sont plus utilisées par celle donnée
+    et les fichiers temporaires laissés par des constructions interrompues
+
+    Les processus qui lisent une partition supprimée en memory-map gardent leurs fichiers ouverts.
+    """
+    with _index_lock(index_dir):
+        _remove_old_indexes(version, index_dir)
+
+
+def _remove_old_indexes(version: str, index_dir: str) -> None:
+    """Nettoyage de remove_old_indexes, verrou de l'index tenu : aucun fichier tmp_ n'est en cours d'écriture"""
+    index_root = Path(index_dir)
+    current_manifest = _manifest_path(version, index_dir)
+    if not current_manifest.exists():
+        return
+    with open(current_manifest, 'r', encoding='utf-8') as file:
+        used = set(json.load(file)['partitions'].values())
+
+    for old_path in index_root.iterdir():
+        if old_path in (current_manifest, index_root / "partitions", index_root / BUILD_LOCK_FILE):
+            continue
+        if old_path.is_dir():
+            # Index construits avant le découpage en partitions
+            shutil.rmtree(old_path, ignore_errors=True)
+        else:
+            old_path.unlink(missing_ok=True)
+    for old_partition in (index_root / "partitions").iterdir():
+        if old_partition.name not in used:
+            shutil.rmtree(old_partition, ignore_errors=True)
+
+
+def get_partition_id(file_path: str, year: str, index_dir: str = INDEX_DIR) -> Optional[str]:
+    """Retourne l'identifiant (année et empreinte du contenu) de la partition d'une année, en construisant l'index si besoin
+
+    Deux versions du fichier dont une année n'a pas changé donnent le même identifiant pour cette année : il sert
+    de clé aux caches calculés à partir de la partition.
+    """
+    return build_geojson_index(file_path, index_dir).get(str(year))
+
+
+def load_year_partition(file_path: str, year: str, index_dir: str = INDEX_DIR) -> Optional[Dict[str, Any]]:
+    """Ouvre en mémoire partagée (memory-map) la partition d'une année, en construisant l'index si besoin
+
+    Args:
+        file_path (str): Le chemin du fichier GeoJSON
+        year (str): L'année cible
+        index_dir (str): Le dossier racine des index
+
+    Returns:
+        Optional[Dict[str, Any]]: Les tableaux et dictionnaires de la partition, ou None si l'année est absente
+    """
+    partition_id = get_partition_id(file_path, year, index_dir)
+    if partition_id is None:
+        return None
+    partition_path = Path(index_dir) / "partitions" / partition_id
+
+    partition = {
+        name: np.load(partition_path / f"{name}.npy", mmap_mode='r')
+        for name in ['latitude', 'longitude', 'formation_codes', 'formation_offsets'] + ESTABLISHMENT_FIELDS
+    }
+    with open(partition_path / "dictionaries.json", 'r', encoding='utf-8') as file:
+        partition['dictionaries'] = json.load(file)
+    return partition
+
+
+def load_year_search_index(file_path: str, year: str, index_dir: str = INDEX_DIR) -> Optional[PrefixIndex]:
+    """Charge l'index de recherche des établissements d'une année, en construisant l'index du GeoJSON si besoin
+
+    Les positions retournées par l'index sont celles des établissements dans la partition (et dans la liste
+    de fetch_data_from_geojson). Pour une partition écrite avant l'ajout de la recherche, l'index est construit
+    à partir de ses dictionnaires puis enregistré avec elle.
+
+    Args:
+        file_path (str): Le chemin du fichier GeoJSON
+        year (str): L'année cible
+        index_dir (str): Le dossier racine des index
+
+    Returns:
+        Optional[PrefixIndex]: L'index de recherche, ou None si l'année est absente
+    """
+    partition_id = get_partition_id(file_path, year, index_dir)
+    if partition_id is None:
+        return None
+    search_path = Path(index_dir) / "partitions" / partition_id / SEARCH_INDEX_FILE
+    if not search_path.exists():
+        partition = load_year_partition(file_path, year, index_dir)
+        dictionaries = partition['dictionaries']
+        columns = {field: [dictionaries[field][code] for code in partition[field].tolist()] for field in SEARCH_FIELDS}
+        establishments = [dict(zip(SEARCH_FIELDS, row)) for row in zip(*(columns[field] for field in SEARCH_FIELDS))]
+        _build_search_index(establishments).save(search_path)
+    return PrefixIndex.load(search_path)
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.utils.geojson_index <chemin du GeoJSON>
+    print(f"Partitions de l'index : {build_geojson_index(sys.argv[1])}")
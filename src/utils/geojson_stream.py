@@ -0,0 +1,90 @@
+import json
+import re
+from typing import Any, Dict, Iterator
+
+FEATURES_START = re.compile(r'"features"\s*:\s*\[')
+ARRAY_START = re.compile(r'^\ufeff?\s*\[')
+CHUNK_SIZE = 1 << 16
+
+
+def iter_geojson_features(file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Lit un FeatureCollection GeoJSON feature par feature, sans charger le fichier en entier
+
+    Le fichier est lu par blocs et chaque feature est décodée dès qu'elle est complète dans le tampon,
+    la mémoire utilisée ne dépend donc que de la taille d'une feature et non de celle du fichier.
+
+    Args:
+        file_path (str): Le chemin du fichier GeoJSON
+        chunk_size (int): La taille des blocs lus dans le fichier
+
+    Yields:
+        Dict[str, Any]: Les features du fichier, dans l'ordre
+    """
+    return _iter_array_items(file_path, FEATURES_START, chunk_size)
+
+
+def iter_json_records(file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Lit un fichier JSON dont la racine est un tableau (export JSON de l'API), élément par élément
+
+    Args:
+        file_path (str): Le chemin du fichier JSON
+        chunk_size (int): La taille des blocs lus dans le fichier
+
+    Yields:
+        Dict[str, Any]: Les éléments du tableau, dans l'ordre
+    """
+    return _iter_array_items(file_path, ARRAY_START, chunk_size)
+
+
+def _iter_array_items(file_path: str, start_pattern: re.Pattern, chunk_size: int) -> Iterator[Dict[str, Any]]:
+    """Décode un à un les éléments du tableau JSON qui commence après start_pattern"""
+    decoder = json.JSONDecoder()
+
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buffer = ""
+        eof = False
+
+        def read_more() -> bool:
+            nonlocal buffer, eof
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer += chunk
+            return True
+
+        # Avancer jusqu'au début du tableau
+        match = start_pattern.search(buffer)
+        while match is None:
+            if not read_more():
+                return
+            match = start_pattern.search(buffer)
+        buffer = buffer[match.end():]
+
+        position = 0
+        while True:
+            # Sauter les séparateurs entre deux éléments
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer) or not read_more():
+                    break
+            if position >= len(buffer) or buffer[position] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # L'élément est coupé par la fin du bloc : on garde le reste du tampon et on relit
+                if eof:
+                    raise
+                buffer = buffer[position:]
+                position = 0
+                read_more()
+                continue
+
+            yield item
+            position = end
+            if position > chunk_size:
+                buffer = buffer[position:]
+                position = 0
@@ -1,16 +1,36 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Union
 from dash import html
 
-def process_api_response(response: Dict[str, Any]) -> Dict[str, Any]:
+def merge_api_pages(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fusionne les pages d'une réponse paginée de l'API en une seule réponse.
+    
+    Args:
+        pages (List[Dict[str, Any]]): Les pages de la réponse, dans l'ordre.
+        
+    Returns:
+        Dict[str, Any]: La réponse avec le total_count de la première page et tous les résultats.
+    """
+    if not pages:
+        return {}
+    return {
+        'total_count': pages[0].get('total_count', 0),
+        'results': [result for page in pages for result in page.get('results', [])],
+    }
+
+def process_api_response(response: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Dict[str, Any]:
     """
     Traite la réponse de l'API pour extraire les données pertinentes.
     
     Args:
-        response (Dict[str, Any]): La réponse JSON de l'API.
+        response (Union[Dict[str, Any], List[Dict[str, Any]]]): La réponse JSON de l'API, ou la liste de ses pages.
         
     Returns:
         Dict[str, Any]: Les données extraites et transformées.
     """
+    if isinstance(response, list):
+        response = merge_api_pages(response)
+
     if(not response or response["total_count"] == 0 or response["results"] == []):
         return html.P("Aucune donnée trouvée pour cette recherche.")
 
@@ -72,6 +92,9 @@ import os
 import requests
 from pathlib import Path
 import hashlib
+import json
+import threading
+import time
 from urllib.parse import urlparse
 import re
 
@@ -95,9 +118,70 @@ def get_filename_from_url(url: str, response_headers: dict = None) -> str:
     
     return f"{dataset_name}.{format_type}"
 
+MANIFEST_FILENAME = "manifest.json"
+CHUNK_SIZE = 64 * 1024
+
+# Le manifeste peut être mis à jour par plusieurs téléchargements en parallèle
+_manifest_lock = threading.Lock()
+
+
+def load_manifest(target_dir: str = "./data/raw") -> Dict[str, Any]:
+    """
+    Lit le manifeste des versions des datasets téléchargés (une entrée par URL).
+    """
+    manifest_path = Path(target_dir) / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def update_manifest(url: str, target_dir: str, **fields) -> Dict[str, Any]:
+    """
+    Met à jour l'entrée d'une URL dans le manifeste (écriture atomique) et retourne l'entrée.
+    Un champ à None est supprimé de l'entrée.
+    """
+    with _manifest_lock:
+        manifest = load_manifest(target_dir)
+        entry = manifest.setdefault(url, {})
+        entry.update(fields)
+        for key in [key for key, value in entry.items() if value is None]:
+            del entry[key]
+
+        manifest_path = Path(target_dir) / MANIFEST_FILENAME
+        temp_path = manifest_path.with_name(f"{MANIFEST_FILENAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, manifest_path)
+        return entry
+
+
+def get_data_path(url: str, target_dir: str = "./data/raw") -> Path:
+    """
+    Retourne le chemin du fichier téléchargé depuis une URL (d'après le manifeste, sinon d'après l'URL).
+    """
+    filename = load_manifest(target_dir).get(url, {}).get('filename') or get_filename_from_url(url)
+    return Path(target_dir) / filename
+
+
+def get_file_hash(file_path) -> str:
+    """
+    Calcule l'empreinte MD5 d'un fichier.
+    """
+    hash_md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
 def get_latest_data(url: str, target_dir: str = "./data/raw") -> bool:
     """
     Télécharge le fichier depuis l'URL si nouveau ou inexistant.
+
+    La requête est conditionnelle (ETag / Last-Modified gardés dans le manifeste) : si le serveur répond 304,
+    rien n'est téléchargé. Un téléchargement interrompu reprend là où il s'était arrêté (requête Range),
+    et le fichier est haché pendant l'écriture pour ne pas avoir à le relire.
     
     Args:
         url (str): URL de téléchargement direct du fichier
@@ -107,42 +191,90 @@ def get_latest_data(url: str, target_dir: str = "./data/raw") -> bool:
         bool: True si un nouveau fichier a été téléchargé, False sinon
     """
     target_path = Path(target_dir).resolve()
-    
-    # Faire une première requête pour obtenir les headers
-    response = requests.head(url)
-    filename = get_filename_from_url(url, response.headers)
-    
-    file_path = target_path / filename
-    temp_file = target_path / f"temp_{filename}"
+    target_path.mkdir(parents=True, exist_ok=True)
+    entry = load_manifest(target_path).get(url, {})
+
+    file_path = target_path / entry['filename'] if 'filename' in entry else None
+    temp_file = target_path / f"temp_{get_filename_from_url(url)}.part"
 
-    # Télécharger le fichier dans un fichier temporaire pour pouvoir le comparer plus tard
-    response = requests.get(url, stream=True)
+    headers = {'Accept-Encoding': 'identity'}  # Pas de compression, pour que les requêtes Range portent sur les octets du fichier
+    if file_path is not None and file_path.exists():
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    # Reprendre un téléchargement interrompu si la version sur le serveur est toujours la même
+    partial = entry.get('partial') or {}
+    resume_from = temp_file.stat().st_size if temp_file.exists() else 0
+    validator = partial.get('etag') or partial.get('last_modified')
+    if resume_from and validator:
+        headers['Range'] = f"bytes={resume_from}-"
+        headers['If-Range'] = validator
+
+    response = requests.get(url, headers=headers, stream=True, timeout=(10, 60))
+    if response.status_code == 304:
+        update_manifest(url, target_path, checked_at=time.time())
+        return False
+    if response.status_code == 416 and 'Range' in headers:
+        # Le fichier partiel est déjà complet (arrêt entre le dernier bloc et le renommage) : le serveur n'a plus
+        # d'octets à envoyer. On repart d'un téléchargement complet, sans requête Range
+        response.close()
+        temp_file.unlink(missing_ok=True)
+        update_manifest(url, target_path, partial=None)
+        return get_latest_data(url, target_dir)
     response.raise_for_status()
 
-    # Écrire le contenu dans un fichier temporaire
-    with open(temp_file, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
+    if response.status_code == 206 and not response.headers.get('Content-Range', '').startswith(f"bytes {resume_from}-"):
+        # Réponse partielle inattendue : on repart d'un téléchargement complet
+        response.close()
+        os.remove(temp_file)
+        update_manifest(url, target_path, partial=None)
+        return get_latest_data(url, target_dir)
+
+    hash_md5 = hashlib.md5()
+    if response.status_code == 206:
+        # Le début du fichier est déjà sur le disque : on le hache une seule fois avant de continuer
+        with open(temp_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                hash_md5.update(chunk)
+        mode = 'ab'
+    else:
+        mode = 'wb'
+
+    filename = get_filename_from_url(url, response.headers)
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    update_manifest(url, target_path, partial={'etag': etag, 'last_modified': last_modified})
+
+    # Écrire le contenu dans un fichier temporaire en le hachant au fil de l'eau
+    size = 0
+    with open(temp_file, mode) as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
             if chunk:
                 f.write(chunk)
-    
-    # Si le fichier original n'existe pas, renommer le fichier temporaire pour avoir le bon nom
-    if not file_path.exists():
-        os.rename(temp_file, file_path)
-        return True
-        
-    # Comparer les fichiers (D'après chatPGT)
-    def get_file_hash(file_path):
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
                 hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-    
-    if get_file_hash(temp_file) != get_file_hash(file_path):
-        # Si les fichiers sont différents, remplacer l'ancien fichier
-        os.replace(temp_file, file_path)
-        return True
+                size += len(chunk)
+    digest = hash_md5.hexdigest()
+    size += resume_from if mode == 'ab' else 0
+
+    previous_path = target_path / filename
+    # Empreinte de l'ancien fichier : celle du manifeste, ou calculée une fois si le fichier est antérieur au manifeste
+    previous_hash = entry.get('md5') if entry.get('filename') == filename else None
+    if previous_hash is None and previous_path.exists():
+        previous_hash = get_file_hash(previous_path)
+
+    changed = previous_hash != digest or not previous_path.exists()
+    if changed:
+        os.replace(temp_file, previous_path)
     else:
         #les fichiers sont identiques, on supprime le fichier temporaire
         os.remove(temp_file)
-        return False
\ No newline at end of file
+
+    update_manifest(
+        url, target_path,
+        filename=filename, etag=etag, last_modified=last_modified, md5=digest, size=size,
+        checked_at=time.time(), updated_at=time.time() if changed else entry.get('updated_at', time.time()),
+        partial=None,
+    )
+    return changed
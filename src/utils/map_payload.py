@@ -0,0 +1,108 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Les coordonnées compactes sont des entiers en 1e-5 degré (environ 1 m de précision)
+COORDINATE_SCALE = 100000
+
+
+def build_formation_dictionary(features: List[Dict[str, Any]]) -> Tuple[List[str], List[List[int]]]:
+    """Encode par dictionnaire les listes de formations des établissements d'une année
+
+    Args:
+        features (List[Dict[str, Any]]): Les établissements retournés par fetch_data_from_geojson
+
+    Returns:
+        Tuple[List[str], List[List[int]]]: Le dictionnaire des noms de formation et les codes de chaque établissement
+    """
+    dictionary, lookup, codes = [], {}, []
+    for feature in features:
+        establishment_codes = []
+        for formation in feature["formations"]:
+            code = lookup.get(formation)
+            if code is None:
+                code = lookup[formation] = len(dictionary)
+                dictionary.append(formation)
+            establishment_codes.append(code)
+        codes.append(establishment_codes)
+    return dictionary, codes
+
+
+def _delta_encode(coordinates: List[float]) -> List[int]:
+    """Quantifie des coordonnées puis les remplace par leurs différences successives, plus courtes à écrire"""
+    quantized = np.round(np.asarray(coordinates, dtype=np.float64) * COORDINATE_SCALE).astype(np.int64)
+    return np.diff(quantized, prepend=0).tolist()
+
+
+def encode_geojson(features: List[Dict[str, Any]], clusters: List[Tuple[float, float, int]], points: List[int]) -> Dict[str, Any]:
+    """Construit le FeatureCollection GeoJSON des clusters et des établissements visibles
+
+    Args:
+        features (List[Dict[str, Any]]): Les établissements de l'année
+        clusters (List[Tuple[float, float, int]]): Les clusters visibles (latitude, longitude, nombre d'établissements)
+        points (List[int]): Les positions des établissements visibles
+
+    Returns:
+        Dict[str, Any]: Les données GeoJSON
+    """
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+                "properties": {"cluster": True, "point_count": count, "tooltip": f"{count} établissements"},
+            }
+            for latitude, longitude, count in clusters
+        ] + [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [features[index]["longitude"], features[index]["latitude"]]},
+                "properties": {
+                    "etab_nom": features[index]["etab_nom"],
+                    "formations": features[index]["formations"],
+                    "etab_uai": features[index]["etab_uai"],
+                },
+            }
+            for index in points
+        ],
+    }
+
+
+def encode_compact(features: List[Dict[str, Any]], formation_codes: List[List[int]], clusters: List[Tuple[float, float, int]],
+                   points: List[int], year: int, partition_id: str) -> Dict[str, Any]:
+    """Encode les clusters et les établissements visibles sous forme compacte, décodée par le navigateur
+
+    Les formations sont remplacées par leurs codes dans le dictionnaire de l'année (envoyé une seule fois),
+    les coordonnées sont quantifiées et encodées par différences. Le décodage est fait par
+    dash_clientside.parcoursupMap.decodePayload (assets/map_clusters.js).
+
+    Args:
+        features (List[Dict[str, Any]]): Les établissements de l'année
+        formation_codes (List[List[int]]): Les codes des formations de chaque établissement
+        clusters (List[Tuple[float, float, int]]): Les clusters visibles (latitude, longitude, nombre d'établissements)
+        points (List[int]): Les positions des établissements visibles
+        year (int): L'année des établissements
+        partition_id (str): L'identifiant de la partition de l'année, pour vérifier que le dictionnaire du
+            navigateur a été construit à partir des mêmes établissements (il change si le GeoJSON est mis à jour)
+
+    Returns:
+        Dict[str, Any]: Les données compactes
+    """
+    return {
+        "year": year,
+        "partition_id": partition_id,
+        "scale": COORDINATE_SCALE,
+        "clusters": {
+            "lat": _delta_encode([cluster[0] for cluster in clusters]),
+            "lon": _delta_encode([cluster[1] for cluster in clusters]),
+            "count": [cluster[2] for cluster in clusters],
+        },
+        "points": {
+            "lat": _delta_encode([features[index]["latitude"] for index in points]),
+            "lon": _delta_encode([features[index]["longitude"] for index in points]),
+            "nom": [features[index]["etab_nom"] for index in points],
+            "uai": [features[index]["etab_uai"] for index in points],
+            "f": [formation_codes[index] for index in points],
+        },
+    }
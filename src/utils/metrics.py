@@ -0,0 +1,207 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from dash.exceptions import PreventUpdate
+from flask import Flask, Request, Response, g, request
+
+# Bornes des histogrammes de latence, en secondes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Histogramme cumulatif des latences, compatible avec le format des histogrammes Prometheus"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Enregistre une durée, en secondes"""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> Dict[str, object]:
+        """Retourne les effectifs cumulés par borne (le dernier correspond à +Inf), le total et la somme"""
+        with self._lock:
+            cumulative, total = [], 0
+            for count in self._counts:
+                total += count
+                cumulative.append(total)
+            return {
+                'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], cumulative)),
+                'count': total,
+                'sum': self._sum,
+            }
+
+
+# Bornes des histogrammes de taille des réponses, en octets
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    """Formate des étiquettes au format texte de Prometheus ({nom="valeur",...})"""
+    items = labels + extra
+    if not items:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Registre des métriques du processus (histogrammes, compteurs et collecteurs), exposées au format texte de Prometheus
+
+    Les métriques sont propres à chaque processus : avec plusieurs workers gunicorn, /metrics renvoie celles
+    du worker qui a reçu la requête.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Tuple[str, Sequence[float], Dict[Tuple, LatencyHistogram]]] = {}
+        self._counters: Dict[str, Tuple[str, Dict[Tuple, float]]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels: str) -> LatencyHistogram:
+        """Retourne l'histogramme d'une métrique pour des étiquettes, en le créant au premier appel"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, _, series = self._histograms.setdefault(name, (help_text, buckets, {}))
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = LatencyHistogram(buckets)
+            return histogram
+
+    def add_histogram(self, name: str, help_text: str, histogram: LatencyHistogram, **labels: str) -> None:
+        """Expose un histogramme tenu ailleurs (par exemple celui d'un client HTTP)"""
+        with self._lock:
+            _, _, series = self._histograms.setdefault(name, (help_text, histogram.buckets, {}))
+            series[tuple(sorted(labels.items()))] = histogram
+
+    def inc(self, name: str, help_text: str, value: float = 1, **labels: str) -> None:
+        """Augmente un compteur"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._counters.setdefault(name, (help_text, {}))
+            series[key] = series.get(key, 0) + value
+
+    def value(self, name: str, **labels: str) -> float:
+        """Retourne la valeur d'un compteur (0 s'il n'a jamais été augmenté)"""
+        with self._lock:
+            return self._counters.get(name, ("", {}))[1].get(tuple(sorted(labels.items())), 0)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]) -> None:
+        """Ajoute une fonction appelée à chaque lecture des métriques, pour exposer des compteurs tenus ailleurs
+
+        Le collecteur retourne des tuples (nom, type counter ou gauge, description, étiquettes, valeur).
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Retourne toutes les métriques au format texte d'exposition de Prometheus (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            histograms = {name: (help_text, dict(series)) for name, (help_text, _, series) in self._histograms.items()}
+            counters = {name: (help_text, dict(series)) for name, (help_text, series) in self._counters.items()}
+
+        for name, (help_text, series) in sorted(histograms.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for labels, histogram in sorted(series.items()):
+                snapshot = histogram.snapshot()
+                for bound, count in snapshot['buckets'].items():
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+        for name, (help_text, series) in sorted(counters.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}_total{_format_labels(labels)} {value}")
+
+        collected: Dict[str, Tuple[str, str, List[str]]] = {}
+        for collector in self._collectors:
+            for name, metric_type, help_text, labels, value in collector():
+                sample_name = f"{name}_total" if metric_type == "counter" else name
+                _, _, samples = collected.setdefault(name, (metric_type, help_text, []))
+                samples.append(f"{sample_name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+        for name, (metric_type, help_text, samples) in sorted(collected.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"] + samples
+
+        return "\n".join(lines) + "\n"
+
+
+# Registre des métriques de l'application, exposé par la route /metrics
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Mesure la durée d'une étape interne d'un callback (bloc with ou décorateur)
+
+    Args:
+        stage (str): Le nom de l'étape, étiquette de parcoursup_stage_seconds
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.histogram("parcoursup_stage_seconds", "Durée des étapes internes des callbacks", stage=stage).observe(
+            time.perf_counter() - start
+        )
+
+
+def instrument_callback(function: Callable) -> Callable:
+    """Décorateur qui mesure la durée d'exécution d'un callback Dash et compte ses exceptions, par nom de callback
+
+    Les exceptions sont comptées par type. PreventUpdate (pas de mise à jour) n'est pas une erreur et n'est pas
+    comptée ; la durée du callback est mesurée dans tous les cas.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception as error:
+            registry.inc("parcoursup_callback_exceptions", "Exceptions levées par les callbacks",
+                         callback=function.__name__, exception=type(error).__name__)
+            raise
+        finally:
+            registry.histogram("parcoursup_callback_seconds", "Durée d'exécution des callbacks",
+                               callback=function.__name__).observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+def instrument_requests(server: Flask, path: str, label: Callable[[Request], str]) -> None:
+    """Mesure la durée totale (sérialisation comprise) et la taille des réponses des requêtes d'un chemin
+
+    Args:
+        server (Flask): Le serveur Flask de l'application
+        path (str): Le chemin des requêtes mesurées
+        label (Callable[[Request], str]): Retourne l'étiquette (le callback) d'une requête
+    """
+    @server.before_request
+    def start_timer():
+        if request.path == path:
+            g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_response(response: Response) -> Response:
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        name = label(request)
+        registry.histogram("parcoursup_request_seconds", "Durée des requêtes de callbacks, sérialisation comprise",
+                           callback=name).observe(time.perf_counter() - start)
+        registry.histogram("parcoursup_response_bytes", "Taille des réponses des requêtes de callbacks", PAYLOAD_BUCKETS,
+                           callback=name).observe(response.calculate_content_length() or 0)
+        registry.inc("parcoursup_requests", "Requêtes de callbacks par code de réponse",
+                     callback=name, status=str(response.status_code))
+        return response
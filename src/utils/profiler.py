@@ -0,0 +1,246 @@
+import functools
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+PROFILE_DIR = "./data/processed/profiles"
+
+# Intervalle entre deux échantillons des piles d'appels, en secondes
+DEFAULT_INTERVAL = 0.005
+DEFAULT_THRESHOLD = 1.0
+DEFAULT_MAX_FILES = 50
+MAX_TAG_LENGTH = 80
+# Valeurs acceptées pour enabled quand elle est envoyée sous forme de texte
+_TRUE_VALUES = ("1", "true", "yes", "on")
+_FALSE_VALUES = ("0", "false", "no", "off")
+
+
+def _frame_label(code) -> str:
+    """Nom d'une fonction dans une pile repliée : fonction (dossier/fichier:ligne de définition)"""
+    filename = "/".join(Path(code.co_filename).parts[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _parse_bool(name: str, value: Any) -> bool:
+    """Convertit un réglage booléen envoyé en JSON (true, 1 ou "false"...) ; bool("false") vaudrait True"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in _TRUE_VALUES + _FALSE_VALUES:
+        return value.strip().lower() in _TRUE_VALUES
+    raise ValueError(f"{name} doit être un booléen : {value!r}")
+
+
+def _parse_number(name: str, value: Any, number_type: type) -> float:
+    """Convertit un réglage numérique (nombre ou texte), en refusant les booléens et les valeurs non finies"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} doit être un nombre : {value!r}")
+    if number_type is int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{name} doit être un entier : {value!r}")
+    try:
+        number = number_type(value)
+    except ValueError:
+        raise ValueError(f"{name} doit être un nombre : {value!r}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} doit être un nombre fini : {value!r}")
+    return number
+
+
+def default_tag(*args: Any, **kwargs: Any) -> str:
+    """Étiquette d'un appel construite avec ses arguments simples (textes et nombres)"""
+    return "_".join(str(arg) for arg in args if isinstance(arg, (str, int, float)) and not isinstance(arg, bool))
+
+
+class SamplingProfiler:
+    """Profileur par échantillonnage des callbacks lents
+
+    Pendant l'exécution d'un callback profilé, un thread relève toutes les interval secondes la pile d'appels
+    du thread qui l'exécute (sys._current_frames). Si l'appel dure plus de threshold secondes, les piles sont
+    écrites au format replié (une ligne "f1;f2;f3 nombre" par pile), lisible par flamegraph.pl ou speedscope,
+    dans un fichier nommé avec le callback et ses entrées ; un fichier JSON à côté garde les entrées complètes.
+    Les appels rapides ne laissent aucune trace.
+
+    Seule une part sample_rate des appels est profilée, le thread d'échantillonnage ne tourne que pendant
+    un appel profilé et seuls les max_files derniers profils sont gardés : le surcoût reste négligeable
+    tant qu'aucun callback n'est lent. Désactivé, le profileur ne coûte qu'un test par appel.
+    """
+
+    def __init__(self, enabled: bool = False, threshold: float = DEFAULT_THRESHOLD, sample_rate: float = 1.0,
+                 interval: float = DEFAULT_INTERVAL, output_dir: str = PROFILE_DIR, max_files: int = DEFAULT_MAX_FILES):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self._active: Dict[int, Counter] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def configure(self, **settings: Any) -> None:
+        """Modifie les réglages (enabled, threshold, sample_rate, interval, max_files), par exemple depuis la route d'administration
+
+        Toutes les valeurs sont vérifiées avant d'en appliquer une : un réglage invalide lève ValueError et ne
+        modifie rien. Un intervalle nul ou négatif arrêterait le thread d'échantillonnage (time.sleep échoue).
+
+        Args:
+            **settings (Any): Les réglages à modifier, sous forme de valeurs JSON (nombres, booléens ou textes)
+        """
+        parsed = {}
+        for name, value in settings.items():
+            if name == 'enabled':
+                parsed[name] = _parse_bool(name, value)
+            elif name in ('threshold', 'sample_rate', 'interval'):
+                parsed[name] = _parse_number(name, value, float)
+            elif name == 'max_files':
+                parsed[name] = _parse_number(name, value, int)
+            else:
+                raise ValueError(f"Réglage du profileur inconnu : {name}")
+
+        if parsed.get('threshold', 0.0) < 0:
+            raise ValueError("threshold doit être positif ou nul")
+        if not 0.0 <= parsed.get('sample_rate', 0.0) <= 1.0:
+            raise ValueError("sample_rate doit être compris entre 0 et 1")
+        if parsed.get('interval', 1.0) <= 0:
+            raise ValueError("interval doit être strictement positif")
+        if parsed.get('max_files', 1) < 1:
+            raise ValueError("max_files doit être au moins 1")
+        for name, value in parsed.items():
+            setattr(self, name, value)
+
+    def status(self) -> Dict[str, Any]:
+        """Retourne les réglages du profileur et les profils enregistrés, du plus récent au plus ancien"""
+        return {
+            'enabled': self.enabled,
+            'threshold': self.threshold,
+            'sample_rate': self.sample_rate,
+            'interval': self.interval,
+            'max_files': self.max_files,
+            'output_dir': self.output_dir,
+            # Les réglages sont propres à chaque processus : avec gunicorn, ceux du worker qui a répondu
+            'pid': os.getpid(),
+            'profiles': [path.name for path in reversed(self._profile_files())],
+        }
+
+    @contextmanager
+    def profile(self, name: str, tag: Callable[[], str], inputs: Any) -> Iterator[None]:
+        """Profile le bloc exécuté dans le thread courant, et enregistre le profil s'il dure plus que le seuil
+
+        Args:
+            name (str): Le nom du callback
+            tag (Callable[[], str]): Retourne l'étiquette du fichier (appelée seulement si le profil est enregistré)
+            inputs (Any): Les entrées du callback, enregistrées avec le profil
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            yield
+            return
+
+        thread_id = threading.get_ident()
+        stacks = Counter()
+        with self._lock:
+            self._active[thread_id] = stacks
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="parcoursup-profiler", daemon=True)
+                self._thread.start()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                del self._active[thread_id]
+            if duration >= self.threshold and stacks:
+                try:
+                    self._write(name, tag(), inputs, duration, stacks)
+                except Exception as error:
+                    # Le profil est perdu, mais le callback n'échoue pas pour autant
+                    print(f"Échec de l'enregistrement du profil de {name} : {error}")
+
+    def _sample(self) -> None:
+        """Relève les piles des threads profilés jusqu'à ce qu'il n'y en ait plus"""
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active.items())
+            frames = sys._current_frames()
+            for thread_id, stacks in active:
+                frame = frames.get(thread_id)
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if labels:
+                    stacks[";".join(reversed(labels))] += 1
+
+    def _profile_files(self) -> List[Path]:
+        """Retourne les profils enregistrés, du plus ancien au plus récent"""
+        output_dir = Path(self.output_dir)
+        if not output_dir.exists():
+            return []
+        return sorted(output_dir.glob("*.folded"), key=lambda path: path.stat().st_mtime)
+
+    def _write(self, name: str, tag: str, inputs: Any, duration: float, stacks: Counter) -> Path:
+        """Écrit un profil et ses entrées, puis supprime les plus anciens au-delà de max_files"""
+        output_dir = Path(self.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        tag = re.sub(r"[^A-Za-z0-9._-]+", "-", tag).strip("-")[:MAX_TAG_LENGTH]
+        stem = "_".join(part for part in (time.strftime("%Y%m%d-%H%M%S"), name, tag, f"{duration * 1000:.0f}ms") if part)
+        path = output_dir / f"{stem}.folded"
+
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+        with open(path.with_suffix(".json"), 'w', encoding='utf-8') as file:
+            json.dump({'callback': name, 'inputs': inputs, 'duration': duration, 'samples': sum(stacks.values()),
+                       'interval': self.interval, 'date': time.strftime("%Y-%m-%dT%H:%M:%S")},
+                      file, ensure_ascii=False, default=str)
+
+        profile_files = self._profile_files()
+        for old_path in profile_files[:max(0, len(profile_files) - self.max_files)]:
+            old_path.unlink(missing_ok=True)
+            old_path.with_suffix(".json").unlink(missing_ok=True)
+        return path
+
+
+# Profileur des callbacks, activé avec PARCOURSUP_PROFILE=1 ou par la route /admin/profiling
+profiler = SamplingProfiler(
+    enabled=os.environ.get("PARCOURSUP_PROFILE") == "1",
+    threshold=float(os.environ.get("PARCOURSUP_PROFILE_THRESHOLD", DEFAULT_THRESHOLD)),
+    sample_rate=float(os.environ.get("PARCOURSUP_PROFILE_SAMPLE_RATE", 1.0)),
+    output_dir=os.environ.get("PARCOURSUP_PROFILE_DIR", PROFILE_DIR),
+    max_files=int(os.environ.get("PARCOURSUP_PROFILE_MAX_FILES", DEFAULT_MAX_FILES)),
+)
+
+
+def profile_callback(tag: Optional[Callable[..., str]] = None) -> Callable:
+    """Décorateur qui profile un callback avec profiler
+
+    Args:
+        tag (Optional[Callable[..., str]]): Construit l'étiquette du profil à partir des arguments du callback
+            (par défaut, ses arguments simples)
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with profiler.profile(function.__name__, lambda: (tag or default_tag)(*args, **kwargs), list(args)):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
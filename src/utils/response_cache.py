@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RESPONSE_CACHE_PATH = "./data/processed/api_cache.sqlite"
+
+# Les données d'une session publiée ne changent presque plus : fraîches 7 jours, servies périmées jusqu'à 30 jours
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_STALE_TTL = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Délai minimum entre deux mises à jour de la date d'accès d'une entrée, pour limiter les écritures
+ACCESS_UPDATE_INTERVAL = 60
+
+
+class ResponseCache:
+    """Cache sur disque (SQLite) des données d'établissement déjà traitées, par (année, code UAI)
+
+    Le fichier est partagé par tous les processus de la machine (mode WAL) et survit aux redémarrages.
+    Une entrée est fraîche pendant ttl secondes ; ensuite, et jusqu'à stale_ttl, elle est encore servie
+    pendant qu'un thread la recharge en arrière-plan (stale-while-revalidate). Au-delà de max_bytes,
+    les entrées les moins récemment lues sont supprimées.
+
+    Le constructeur n'ouvre pas le fichier : il est créé à la première lecture ou écriture, par le processus
+    qui l'utilise (un worker, pas le processus maître de gunicorn).
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 stale_ttl: float = DEFAULT_STALE_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        # Lectures de get_or_fetch par état (fresh, stale, miss), dans ce processus
+        self.lookups = {'fresh': 0, 'stale': 0, 'miss': 0}
+        self._lookups_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retourne la connexion SQLite du thread courant, en créant le fichier et la table à la première ouverture
+
+        Une connexion ne peut être partagée ni entre threads, ni entre processus : un worker créé par fork
+        (gunicorn --preload) ouvre sa propre connexion au lieu de réutiliser celle du processus parent.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " year INTEGER NOT NULL, cod_uai TEXT NOT NULL, payload TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL,"
+                " PRIMARY KEY (year, cod_uai))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, year: int, cod_uai: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Lit une entrée du cache
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], str]: Les données et leur état : 'fresh', 'stale' ou 'miss'
+        """
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT payload, fetched_at, accessed_at FROM entries WHERE year = ? AND cod_uai = ?",
+            (year, cod_uai),
+        ).fetchone()
+        if row is None:
+            return None, 'miss'
+
+        payload, fetched_at, accessed_at = row
+        age = now - fetched_at
+        if age > self.ttl + self.stale_ttl:
+            return None, 'miss'
+        if now - accessed_at > ACCESS_UPDATE_INTERVAL:
+            self._connection().execute(
+                "UPDATE entries SET accessed_at = ? WHERE year = ? AND cod_uai = ?", (now, year, cod_uai)
+            )
+        return json.loads(payload), 'fresh' if age <= self.ttl else 'stale'
+
+    def set(self, year: int, cod_uai: str, data: Dict[str, Any]) -> None:
+        """Écrit une entrée du cache puis supprime les plus anciennes si la taille maximale est dépassée"""
+        payload = json.dumps(data, ensure_ascii=False)
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO entries (year, cod_uai, payload, fetched_at, accessed_at, size)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (year, cod_uai, payload, now, now, len(payload)),
+        )
+
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = connection.execute("SELECT year, cod_uai, size FROM entries ORDER BY accessed_at").fetchall()
+                for row_year, row_uai, size in rows:
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    connection.execute("DELETE FROM entries WHERE year = ? AND cod_uai = ?", (row_year, row_uai))
+                    total -= size
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+
+    def invalidate(self, year: int, cod_uais: Optional[List[str]] = None) -> int:
+        """Supprime les entrées d'une session, par exemple après la mise à jour de ses données
+
+        Args:
+            year (int): L'année de la session
+            cod_uais (Optional[List[str]]): Les établissements modifiés (par défaut, toute la session)
+
+        Returns:
+            int: Le nombre d'entrées supprimées
+        """
+        if cod_uais is None:
+            return self._connection().execute("DELETE FROM entries WHERE year = ?", (year,)).rowcount
+        connection = self._connection()
+        return sum(
+            connection.execute("DELETE FROM entries WHERE year = ? AND cod_uai = ?", (year, cod_uai)).rowcount
+            for cod_uai in cod_uais
+        )
+
+    def get_or_fetch(self, year: int, cod_uai: str, fetch: Callable[[], Any]) -> Any:
+        """Retourne les données en cache, ou les charge avec fetch() et les met en cache
+
+        Seuls les dictionnaires sont mis en cache : les autres résultats de fetch (message d'absence de données)
+        sont retournés tels quels.
+
+        Args:
+            year (int): L'année de la session
+            cod_uai (str): Le code UAI de l'établissement
+            fetch (Callable[[], Any]): La fonction qui charge les données depuis l'API
+
+        Returns:
+            Any: Les données de l'établissement
+        """
+        data, state = self.get(year, cod_uai)
+        with self._lookups_lock:
+            self.lookups[state] += 1
+        if state == 'fresh':
+            return data
+        if state == 'stale':
+            self._refresh_in_background(year, cod_uai, fetch)
+            return data
+
+        data = fetch()
+        if isinstance(data, dict):
+            self.set(year, cod_uai, data)
+        return data
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne le nombre de lectures de get_or_fetch par état (fresh, stale, miss)"""
+        with self._lookups_lock:
+            return dict(self.lookups)
+
+    def _refresh_in_background(self, year: int, cod_uai: str, fetch: Callable[[], Any]) -> None:
+        """Recharge une entrée périmée dans un thread, une seule fois à la fois par clé"""
+        key = (year, cod_uai)
+        with self._refreshing_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                data = fetch()
+                if isinstance(data, dict):
+                    self.set(year, cod_uai, data)
+            except Exception as error:
+                # On garde l'entrée périmée, elle sera rechargée à la prochaine lecture
+                print(f"Échec du rechargement de {cod_uai} ({year}) : {error}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
@@ -0,0 +1,139 @@
+import os
+import re
+import unicodedata
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Nombre de résultats retournés par défaut à la liste déroulante de recherche
+SEARCH_LIMIT = 20
+
+# Ligatures qui ne se décomposent pas en lettres simples
+_LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss'})
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+# Borne supérieure des mots qui commencent par un préfixe donné
+_PREFIX_END = "\uffff"
+
+
+def normalize(text: str) -> str:
+    """Met un texte en minuscules sans accents ni ponctuation ("Université d'Évry" -> "universite d evry")"""
+    text = unicodedata.normalize('NFKD', str(text).lower().translate(_LIGATURES))
+    text = "".join(character for character in text if not unicodedata.combining(character))
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un texte normalisé en mots"""
+    return normalize(text).split()
+
+
+def dropdown_option(label: str, value: Any, search_value: str = "") -> Dict[str, Any]:
+    """Construit une option de liste déroulante trouvée par la recherche côté serveur
+
+    dcc.Dropdown filtre encore les options reçues dans le navigateur : chaque mot saisi doit être une
+    sous-chaîne, en minuscules mais avec ses accents, du libellé ou de la clé 'search'. Cette clé contient donc
+    le libellé et sa forme normalisée ("lycee" trouve "Lycée"). Pour une option retournée par l'index, elle
+    contient aussi le texte saisi, que le navigateur ne sait pas rapprocher seul ("d'évry" ou "école" pour
+    "Ecole ... d'Evry") ; une option ajoutée sans correspondre à la saisie (la valeur sélectionnée) ne le
+    contient pas, pour que le navigateur la masque.
+
+    Args:
+        label (str): Le libellé affiché
+        value (Any): La valeur de l'option
+        search_value (str): Le texte saisi, seulement si l'index a retourné l'option
+
+    Returns:
+        Dict[str, Any]: L'option
+    """
+    return {'label': label, 'value': value, 'search': " ".join(part for part in (label, normalize(label), search_value or "") if part)}
+
+
+class PrefixIndex:
+    """Index inversé des mots d'une liste de documents, interrogé par préfixes sans tenir compte des accents
+
+    Les mots distincts sont triés : tous les mots qui commencent par un préfixe forment une tranche contiguë,
+    trouvée par deux recherches dichotomiques. Les listes de documents de chaque mot sont rangées bout à bout
+    dans l'ordre des mots (offsets, postings), la tranche de mots donne donc directement la tranche des
+    documents à lire. Une requête de plusieurs mots retourne les documents qui contiennent un mot commençant
+    par chacun d'eux.
+    """
+
+    def __init__(self, tokens: np.ndarray, offsets: np.ndarray, postings: np.ndarray, lengths: np.ndarray):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.postings = postings
+        self.lengths = lengths
+
+    @classmethod
+    def from_documents(cls, documents: List[str]) -> "PrefixIndex":
+        """Construit l'index d'une liste de textes (un document par texte, identifié par sa position)
+
+        Args:
+            documents (List[str]): Les textes indexés
+
+        Returns:
+            PrefixIndex: L'index
+        """
+        postings_by_token = {}
+        for position, document in enumerate(documents):
+            for token in set(tokenize(document)):
+                postings_by_token.setdefault(token, []).append(position)
+
+        tokens = sorted(postings_by_token)
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings_by_token[token]) for token in tokens])
+        postings = np.array([position for token in tokens for position in postings_by_token[token]], dtype=np.int32)
+        lengths = np.array([len(normalize(document)) for document in documents], dtype=np.int32)
+        return cls(np.array(tokens, dtype=str), offsets, postings, lengths)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[int]:
+        """Retourne les positions des documents qui contiennent un mot commençant par chaque mot de la requête
+
+        Les documents où les mots de la requête sont des mots entiers passent en premier, puis les plus courts.
+
+        Args:
+            query (str): Le texte saisi
+            limit (int): Le nombre maximum de résultats
+
+        Returns:
+            List[int]: Les positions des documents trouvés, du plus pertinent au moins pertinent
+        """
+        terms = tokenize(query)
+        if not terms or not len(self.tokens):
+            return []
+
+        candidates = None
+        exact_matches = []
+        for term in terms:
+            start, end = np.searchsorted(self.tokens, [term, term + _PREFIX_END])
+            documents = np.unique(self.postings[self.offsets[start]:self.offsets[end]])
+            candidates = documents if candidates is None else np.intersect1d(candidates, documents, assume_unique=True)
+            if not len(candidates):
+                return []
+            if start < end and self.tokens[start] == term:
+                exact_matches.append(self.postings[self.offsets[start]:self.offsets[start + 1]])
+
+        scores = np.zeros(len(candidates), dtype=np.int32)
+        for documents in exact_matches:
+            scores += np.isin(candidates, documents)
+        order = np.lexsort((candidates, self.lengths[candidates], -scores))[:limit]
+        return candidates[order].tolist()
+
+    def save(self, file_path: str) -> None:
+        """Écrit l'index dans un fichier .npz, remplacé de façon atomique"""
+        file_path = Path(file_path)
+        temp_path = file_path.with_name(f"tmp_{uuid.uuid4().hex}_{file_path.name}")
+        with open(temp_path, 'wb') as file:
+            np.savez(file, tokens=self.tokens, offsets=self.offsets, postings=self.postings, lengths=self.lengths)
+        os.replace(temp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> "PrefixIndex":
+        """Lit un index écrit par save"""
+        with np.load(file_path) as arrays:
+            return cls(arrays['tokens'], arrays['offsets'], arrays['postings'], arrays['lengths'])
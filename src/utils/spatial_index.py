@@ -0,0 +1,166 @@
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Nombre maximum de points d'une feuille de l'arbre, parcourue d'un bloc avec numpy
+NODE_SIZE = 64
+DEFAULT_NEAREST = 10
+DEFAULT_RADIUS_KM = 20.0
+# Latitude maximale utilisée pour convertir une distance en unités Web Mercator
+MAX_LATITUDE = 85.0
+
+
+def project(latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Projette des coordonnées en Web Mercator normalisé (x et y entre 0 et 1, y croissant vers le sud)"""
+    x = (np.asarray(longitudes, dtype=np.float64) + 180.0) / 360.0
+    sin_lat = np.clip(np.sin(np.radians(np.asarray(latitudes, dtype=np.float64))), -0.9999, 0.9999)
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def haversine_km(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Retourne les distances en kilomètres (sur la sphère terrestre) d'un point à une liste de points"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class KDTree:
+    """Arbre k-d statique de points du plan, rangé dans deux tableaux numpy (comme kdbush)
+
+    Les points sont triés une fois pour toutes : chaque nœud est une tranche [début, fin) des tableaux, coupée
+    en deux par son point médian, alternativement selon x et selon y. Une requête ne descend que dans les
+    tranches qui peuvent contenir des points de la zone cherchée et parcourt les feuilles (au plus node_size
+    points) d'un bloc : son coût est logarithmique en nombre de points, plus le nombre de points trouvés.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, node_size: int = NODE_SIZE):
+        self.node_size = node_size
+        self.coords = np.column_stack([np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+        self.ids = np.arange(len(self.coords))
+
+        stack = [(0, len(self.coords), 0)]
+        while stack:
+            start, end, axis = stack.pop()
+            if end - start <= node_size:
+                continue
+            middle = (start + end) // 2
+            order = np.argpartition(self.coords[start:end, axis], middle - start)
+            self.coords[start:end] = self.coords[start:end][order]
+            self.ids[start:end] = self.ids[start:end][order]
+            stack.append((start, middle, 1 - axis))
+            stack.append((middle + 1, end, 1 - axis))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _search(self, lower: Tuple[float, float], upper: Tuple[float, float], keep) -> np.ndarray:
+        """Parcourt les nœuds qui coupent le rectangle [lower, upper] et retourne les points gardés par keep(coords)"""
+        found = []
+        stack = [(0, len(self.coords), 0)]
+        while stack:
+            start, end, axis = stack.pop()
+            if end - start <= self.node_size:
+                block = self.coords[start:end]
+                found.append(self.ids[start:end][keep(block)])
+                continue
+            middle = (start + end) // 2
+            found.append(self.ids[middle:middle + 1][keep(self.coords[middle:middle + 1])])
+            value = self.coords[middle, axis]
+            if lower[axis] <= value:
+                stack.append((start, middle, 1 - axis))
+            if upper[axis] >= value:
+                stack.append((middle + 1, end, 1 - axis))
+        return np.concatenate(found) if found else np.empty(0, dtype=self.ids.dtype)
+
+    def range(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """Retourne les positions (dans l'ordre de construction) des points du rectangle, dans un ordre quelconque"""
+        return self._search((min_x, min_y), (max_x, max_y), lambda block: (
+            (block[:, 0] >= min_x) & (block[:, 0] <= max_x) & (block[:, 1] >= min_y) & (block[:, 1] <= max_y)))
+
+    def within(self, x: float, y: float, radius: float) -> np.ndarray:
+        """Retourne les positions des points à moins de radius du point (x, y), dans un ordre quelconque"""
+        return self._search((x - radius, y - radius), (x + radius, y + radius), lambda block: (
+            (block[:, 0] - x) ** 2 + (block[:, 1] - y) ** 2 <= radius * radius))
+
+
+class EstablishmentLocator:
+    """Index spatial des établissements d'une année, pour les requêtes par zone et par distance
+
+    Les établissements sont rangés dans un arbre k-d en Web Mercator, et ceux de chaque formation dans un arbre
+    à part, construit à la première requête sur cette formation : chercher les établissements proches qui
+    proposent une formation ne parcourt donc que les établissements de cette formation. Une distance en
+    kilomètres est convertie en rayon Mercator à la latitude la plus éloignée de l'équateur du cercle cherché,
+    ce qui donne un sur-ensemble des résultats ; les distances exactes sont ensuite calculées sur la sphère.
+    """
+
+    def __init__(self, latitudes: List[float], longitudes: List[float], formation_codes: List[List[int]]):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.x, self.y = project(self.latitudes, self.longitudes)
+        self.tree = KDTree(self.x, self.y)
+
+        # Établissements de chaque formation, rangés bout à bout par code de formation
+        lengths = np.array([len(codes) for codes in formation_codes], dtype=np.int64)
+        codes = np.fromiter((code for establishment_codes in formation_codes for code in establishment_codes),
+                            dtype=np.int64, count=int(lengths.sum()))
+        order = np.argsort(codes, kind='stable')
+        self._formation_rows = np.repeat(np.arange(len(formation_codes)), lengths)[order]
+        self._formation_offsets = np.searchsorted(codes[order], np.arange(codes.max() + 2 if len(codes) else 1))
+        self._formation_trees: Dict[int, Tuple[KDTree, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def _formation_tree(self, formation: int) -> Tuple[KDTree, np.ndarray]:
+        """Retourne l'arbre des établissements d'une formation et leurs positions (construits une fois)"""
+        entry = self._formation_trees.get(formation)
+        if entry is None:
+            if 0 <= formation < len(self._formation_offsets) - 1:
+                rows = self._formation_rows[self._formation_offsets[formation]:self._formation_offsets[formation + 1]]
+            else:
+                rows = self._formation_rows[:0]
+            entry = (KDTree(self.x[rows], self.y[rows]), rows)
+            with self._lock:
+                self._formation_trees[formation] = entry
+        return entry
+
+    def within_bounds(self, bounds: List[List[float]]) -> np.ndarray:
+        """Retourne les positions, triées, des établissements d'une zone [[sud, ouest], [nord, est]]"""
+        (south, west), (north, east) = bounds
+        min_x, max_y = project(south, west)
+        max_x, min_y = project(north, east)
+        return np.sort(self.tree.range(float(min_x), float(min_y), float(max_x), float(max_y)))
+
+    def nearest(self, latitude: float, longitude: float, k: int = DEFAULT_NEAREST, radius_km: float = DEFAULT_RADIUS_KM,
+                formation: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Retourne les k établissements les plus proches d'un point, à moins de radius_km kilomètres
+
+        Args:
+            latitude (float): La latitude du point
+            longitude (float): La longitude du point
+            k (int): Le nombre maximum d'établissements
+            radius_km (float): La distance maximale, en kilomètres
+            formation (Optional[int]): Le code d'une formation que les établissements doivent proposer
+                (par défaut, tous les établissements)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Les positions des établissements et leurs distances en kilomètres,
+                du plus proche au plus éloigné
+        """
+        tree, rows = (self.tree, None) if formation is None else self._formation_tree(formation)
+        # Une distance au sol correspond à un rayon Mercator d'autant plus grand qu'on s'éloigne de l'équateur
+        farthest_latitude = min(abs(latitude) + math.degrees(radius_km / EARTH_RADIUS_KM), MAX_LATITUDE)
+        radius = radius_km / (2 * math.pi * EARTH_RADIUS_KM * math.cos(math.radians(farthest_latitude)))
+        x, y = project(latitude, longitude)
+
+        candidates = tree.within(float(x), float(y), radius)
+        if rows is not None:
+            candidates = rows[candidates]
+        distances = haversine_km(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.lexsort((candidates, distances))[:k]
+        return candidates[order], distances[order]
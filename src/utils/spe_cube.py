@@ -0,0 +1,146 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Dimensions et mesures du cube, dans l'ordre de ses axes
+DIMENSIONS = ('annee_du_bac', 'formation', 'spe1', 'spe2')
+MEASURES = ('voeux', 'propositions_d_admissions', 'acceptations')
+
+# En dessous de ce nombre de voeux, le taux d'admission d'une doublette n'est pas significatif
+DEFAULT_MIN_VOEUX = 20
+
+
+class SpeCube:
+    """Cube pré-agrégé des effectifs par (année, formation, spécialité 1, spécialité 2)
+
+    Les effectifs (voeux, propositions d'admission, acceptations) sont rangés dans un tableau numpy dense
+    dont chaque axe est une dimension, puis les mesures. Un agrégat sur une partie des dimensions (roll-up)
+    est calculé une seule fois, à la première demande, en sommant le cube sur les autres axes : les vues
+    n'ont ensuite qu'à lire une tranche du tableau, sans reparcourir les lignes du dataset.
+    """
+
+    def __init__(self, annees: List[int], formations: List[str], specialites: List[str], values: np.ndarray):
+        self.annees = annees
+        self.formations = formations
+        self.specialites = specialites
+        self.values = values
+        self._positions = {
+            'annee_du_bac': {annee: position for position, annee in enumerate(annees)},
+            'formation': {formation: position for position, formation in enumerate(formations)},
+        }
+        self._rollups: Dict[Tuple[str, ...], np.ndarray] = {DIMENSIONS: values}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "SpeCube":
+        """Construit le cube à partir du dataset typé de load_spe_data (une seule somme sur toutes les lignes)
+
+        Args:
+            df (pd.DataFrame): Le dataset des enseignements de spécialité
+
+        Returns:
+            SpeCube: Le cube
+        """
+        annees, annee_codes = np.unique(df['annee_du_bac'].to_numpy(), return_inverse=True)
+        formations = df['formation'].cat.categories
+        specialites = df['spe1'].cat.categories
+        shape = (len(annees), len(formations), len(specialites), len(specialites))
+
+        cells = np.ravel_multi_index(
+            (annee_codes, df['formation'].cat.codes.to_numpy(), df['spe1'].cat.codes.to_numpy(), df['spe2'].cat.codes.to_numpy()),
+            shape,
+        )
+        size = int(np.prod(shape))
+        values = np.stack(
+            [np.bincount(cells, weights=df[measure].to_numpy(), minlength=size).astype(np.int64) for measure in MEASURES],
+            axis=-1,
+        ).reshape(shape + (len(MEASURES),))
+        return cls([int(annee) for annee in annees], formations.tolist(), specialites.tolist(), values)
+
+    def rollup(self, *dimensions: str) -> np.ndarray:
+        """Retourne le cube agrégé sur les dimensions absentes de la liste (calculé une fois puis gardé)
+
+        Args:
+            *dimensions (str): Les dimensions gardées, parmi DIMENSIONS
+
+        Returns:
+            np.ndarray: Un tableau avec un axe par dimension gardée (dans l'ordre de DIMENSIONS) puis les mesures
+        """
+        unknown = set(dimensions) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Dimensions inconnues : {', '.join(sorted(unknown))}")
+        key = tuple(dimension for dimension in DIMENSIONS if dimension in dimensions)
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            axes = tuple(axis for axis, dimension in enumerate(DIMENSIONS) if dimension not in key)
+            rollup = self.values.sum(axis=axes)
+            with self._lock:
+                self._rollups[key] = rollup
+        return rollup
+
+    def trend(self, formation: Optional[str] = None) -> pd.DataFrame:
+        """Retourne l'évolution des effectifs d'une formation (ou de toutes les formations) sur toutes les années
+
+        Args:
+            formation (Optional[str]): La formation (par défaut, toutes les formations)
+
+        Returns:
+            pd.DataFrame: Les effectifs et le taux d'admission (propositions / voeux) par année
+                (vide si la formation n'est pas dans le cube)
+        """
+        if formation is None:
+            values = self.rollup('annee_du_bac')
+        else:
+            position = self._positions['formation'].get(formation)
+            if position is None:
+                return pd.DataFrame(columns=['annee_du_bac', *MEASURES, 'taux_admission'])
+            values = self.rollup('annee_du_bac', 'formation')[:, position]
+
+        trend = pd.DataFrame(values, columns=list(MEASURES))
+        trend.insert(0, 'annee_du_bac', self.annees)
+        # Une année sans aucun voeu pour la formation n'est pas affichée
+        trend = trend[trend['voeux'] > 0].reset_index(drop=True)
+        trend['taux_admission'] = trend['propositions_d_admissions'] / trend['voeux']
+        return trend
+
+    def top_doublettes(self, formation: Optional[str], annee: int, k: int = 10, min_voeux: int = DEFAULT_MIN_VOEUX) -> pd.DataFrame:
+        """Retourne les k doublettes de spécialités au meilleur taux d'admission pour une formation (ou toutes) et une année
+
+        Args:
+            formation (Optional[str]): La formation (None : toutes les formations)
+            annee (int): L'année du bac
+            k (int): Le nombre de doublettes
+            min_voeux (int): Le nombre minimum de voeux d'une doublette pour être classée
+
+        Returns:
+            pd.DataFrame: spe1, spe2, les effectifs et le taux d'admission (propositions / voeux), du meilleur
+                taux au moins bon (vide si la formation ou l'année ne sont pas dans le cube)
+        """
+        columns = ['spe1', 'spe2', *MEASURES, 'taux_admission']
+        annee_position = self._positions['annee_du_bac'].get(annee)
+        if annee_position is None:
+            return pd.DataFrame(columns=columns)
+        if formation is None:
+            doublettes = self.rollup('annee_du_bac', 'spe1', 'spe2')[annee_position]
+        else:
+            formation_position = self._positions['formation'].get(formation)
+            if formation_position is None:
+                return pd.DataFrame(columns=columns)
+            doublettes = self.values[annee_position, formation_position]
+
+        # Matrice spe1 x spe2 x mesures de la formation et de l'année
+        cells = doublettes.reshape(-1, len(MEASURES))
+        voeux = cells[:, 0]
+        candidates = np.flatnonzero(voeux >= max(min_voeux, 1))
+        rates = cells[candidates, 1] / voeux[candidates]
+        # Tri par taux décroissant, puis par nombre de voeux décroissant en cas d'égalité
+        ranked = candidates[np.lexsort((-voeux[candidates], -rates))][:k]
+
+        spe1, spe2 = np.unravel_index(ranked, (len(self.specialites), len(self.specialites)))
+        top = pd.DataFrame(cells[ranked], columns=list(MEASURES))
+        top.insert(0, 'spe1', [self.specialites[code] for code in spe1])
+        top.insert(1, 'spe2', [self.specialites[code] for code in spe2])
+        top['taux_admission'] = top['propositions_d_admissions'] / top['voeux']
+        return top
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
+
+from src.utils.geojson_index import get_dataset_version
+from src.utils.search_index import PrefixIndex
+from src.utils.spe_cube import SpeCube
+
+SPE_STORE_PATH = "./data/processed/specialites.feather"
+
+# Colonnes d'effectifs du dataset, stockées en entiers
+COUNT_COLUMNS = ['voeux', 'propositions_d_admissions', 'acceptations']
+
+
+def build_spe_store(json_path: str, store_path: str = SPE_STORE_PATH) -> Path:
+    """Convertit le JSON des enseignements de spécialité en fichier Feather typé
+
+    Les colonnes texte sont catégorielles (spe1 et spe2 partagent les mêmes catégories),
+    l'année est en int16 et les effectifs en int32. Le fichier n'est pas compressé pour pouvoir
+    être lu en memory-map.
+
+    Args:
+        json_path (str): Le chemin du fichier JSON brut
+        store_path (str): Le chemin du fichier Feather à écrire
+
+    Returns:
+        Path: Le chemin du fichier Feather
+    """
+    print(f"Conversion de {json_path} en {store_path}...")
+    df = pd.read_json(json_path, encoding='utf-8')
+
+    doublettes = pd.DataFrame(df["doublette"].tolist(), index=df.index, columns=["spe1", "spe2"])
+    specialites = sorted(set(doublettes["spe1"]) | set(doublettes["spe2"]))
+
+    store = pd.DataFrame({
+        'annee_du_bac': df['annee_du_bac'].astype('int16'),
+        'formation': df['formation'].astype('category'),
+        'spe1': pd.Categorical(doublettes["spe1"], categories=specialites),
+        'spe2': pd.Categorical(doublettes["spe2"], categories=specialites),
+        'couple_specialites': (doublettes["spe1"] + ", " + doublettes["spe2"]).astype('category'),
+        **{column: df[column].astype('int32') for column in COUNT_COLUMNS},
+    })
+
+    store_path = Path(store_path)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = store_path.with_name(f"tmp_{uuid.uuid4().hex}_{store_path.name}")
+
+    group_versions = [[formation, annee, digest] for (formation, annee), digest in compute_group_versions(store).items()]
+
+    table = pa.Table.from_pandas(store, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'source_version': get_dataset_version(json_path).encode('utf-8'),
+        b'group_versions': json.dumps(group_versions, ensure_ascii=False).encode('utf-8'),
+    })
+    feather.write_feather(table, temp_path, compression='uncompressed')
+    os.replace(temp_path, store_path)
+
+    return store_path
+
+
+def get_store_version(store_path: str = SPE_STORE_PATH) -> str:
+    """Retourne la version du JSON source à partir de laquelle le fichier Feather a été construit"""
+    if not os.path.exists(store_path):
+        return ""
+    with ipc.open_file(store_path) as reader:
+        metadata = reader.schema.metadata or {}
+    return metadata.get(b'source_version', b'').decode('utf-8')
+
+
+def get_group_versions(store_path: str = SPE_STORE_PATH) -> Dict[Tuple[str, int], str]:
+    """Retourne les empreintes (formation, année) enregistrées dans le fichier Feather (vide s'il n'existe pas)"""
+    if not os.path.exists(store_path):
+        return {}
+    with ipc.open_file(store_path) as reader:
+        metadata = reader.schema.metadata or {}
+    return {(formation, annee): digest for formation, annee, digest in json.loads(metadata.get(b'group_versions', b'[]'))}
+
+
+def compute_group_versions(df: pd.DataFrame) -> Dict[Tuple[str, int], str]:
+    """Calcule l'empreinte du contenu de chaque groupe (formation, année)
+
+    La clé naturelle d'une ligne est (année, doublette, formation) : les empreintes des lignes d'un groupe sont
+    triées avant d'être combinées, un groupe dont aucune ligne n'a changé garde donc la même empreinte même si
+    l'ordre du fichier change. Elles servent de clés aux caches de figures, pour n'invalider que les groupes modifiés.
+
+    Args:
+        df (pd.DataFrame): Le dataset des enseignements de spécialité
+
+    Returns:
+        Dict[Tuple[str, int], str]: L'empreinte de chaque groupe
+    """
+    row_hashes = pd.util.hash_pandas_object(df[['spe1', 'spe2'] + COUNT_COLUMNS], index=False).to_numpy()
+    order = np.lexsort((row_hashes, df['annee_du_bac'].to_numpy(), df['formation'].cat.codes.to_numpy()))
+    ordered = df.iloc[order]
+
+    versions = {}
+    for (formation, annee), positions in ordered.groupby(['formation', 'annee_du_bac'], observed=True, sort=False).indices.items():
+        versions[(formation, int(annee))] = hashlib.md5(row_hashes[order[positions]].tobytes()).hexdigest()[:16]
+    return versions
+
+
+def load_spe_data(json_path: str, store_path: str = SPE_STORE_PATH) -> pd.DataFrame:
+    """Charge le dataset des enseignements de spécialité depuis le fichier Feather, en le (re)construisant si besoin
+
+    Args:
+        json_path (str): Le chemin du fichier JSON brut
+        store_path (str): Le chemin du fichier Feather
+
+    Returns:
+        pd.DataFrame: Le dataset typé
+    """
+    if get_store_version(store_path) != get_dataset_version(json_path):
+        build_spe_store(json_path, store_path)
+    return feather.read_table(store_path, memory_map=True).to_pandas()
+
+
+def build_group_index(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[Tuple[str, int], slice]]:
+    """Trie le dataset par (formation, année) et indexe la tranche contiguë de lignes de chaque groupe
+
+    Le tri est stable : dans chaque groupe, les lignes gardent l'ordre du fichier d'origine.
+
+    Args:
+        df (pd.DataFrame): Le dataset des enseignements de spécialité
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[Tuple[str, int], slice]]: Le dataset trié et l'index (formation, année) -> tranche de lignes
+    """
+    df = df.sort_values(['formation', 'annee_du_bac'], kind='stable').reset_index(drop=True)
+
+    formation_codes = df['formation'].cat.codes.to_numpy()
+    annees = df['annee_du_bac'].to_numpy()
+    starts = np.flatnonzero(np.diff(formation_codes, prepend=-1) | np.diff(annees, prepend=-1))
+    ends = np.append(starts[1:], len(df))
+
+    formations = df['formation'].cat.categories
+    group_index = {
+        (formations[formation_codes[start]], int(annees[start])): slice(int(start), int(end))
+        for start, end in zip(starts, ends)
+    }
+    return df, group_index
+
+
+def get_group(df: pd.DataFrame, group_index: Dict[Tuple[str, int], slice], formation: str, annee: int) -> pd.DataFrame:
+    """Retourne les lignes d'une formation pour une année, sans parcourir le dataset
+
+    Args:
+        df (pd.DataFrame): Le dataset trié par build_group_index
+        group_index (Dict[Tuple[str, int], slice]): L'index des groupes
+        formation (str): La formation choisie
+        annee (int): L'année choisie
+
+    Returns:
+        pd.DataFrame: Les lignes du groupe (vide si le groupe n'existe pas)
+    """
+    return df.iloc[group_index.get((formation, annee), slice(0, 0))]
+
+
+class SpeSnapshot(NamedTuple):
+    """Une version chargée du dataset des spécialités et les données qui en sont dérivées
+
+    SpeDataset publie chaque version d'un bloc : un lecteur qui garde la même référence ne mélange jamais
+    le dataset d'une version avec l'index ou le cube d'une autre.
+    """
+    version: Optional[str]
+    df: Optional[pd.DataFrame]
+    group_index: Optional[Dict[Tuple[str, int], slice]]
+    group_versions: Dict[Tuple[str, int], str]
+    # Cube pré-agrégé (année, formation, spécialités) des vues multi-années
+    cube: Optional[SpeCube]
+    # Les formations dans leur ordre d'apparition dans le JSON, pour la liste déroulante
+    formations: List[str]
+    # Index de recherche des noms de formation, par préfixes et sans accents (positions dans formations)
+    formation_index: Optional[PrefixIndex]
+
+
+_EMPTY_SNAPSHOT = SpeSnapshot(None, None, None, {}, None, [], None)
+
+
+class SpeDataset:
+    """Dataset des enseignements de spécialité chargé en mémoire, rechargé quand le JSON source change
+
+    La version du fichier source est vérifiée au plus toutes les check_interval secondes : une application
+    en cours d'exécution utilise donc les nouvelles données publiées par ingest.py sans redémarrer. Une
+    nouvelle version est entièrement construite avant d'être publiée, par une seule affectation, pendant
+    que les requêtes en cours continuent de lire l'ancienne.
+    """
+
+    def __init__(self, json_path: str, store_path: str = SPE_STORE_PATH, check_interval: float = 5.0):
+        self.json_path = json_path
+        self.store_path = store_path
+        self.check_interval = check_interval
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._reload_callbacks = []
+
+    @property
+    def loaded(self) -> bool:
+        """Indique si une version du dataset est en mémoire, sans la charger"""
+        return self._snapshot.df is not None
+
+    def on_reload(self, callback: Callable[[Dict[Tuple[str, int], str]], None]) -> None:
+        """Enregistre une fonction appelée avec les nouvelles empreintes des groupes après chaque rechargement"""
+        self._reload_callbacks.append(callback)
+
+    def snapshot(self) -> SpeSnapshot:
+        """Retourne la version courante du dataset et ses données dérivées, en la rechargeant si besoin
+
+        Returns:
+            SpeSnapshot: Le dataset trié, son index (formation, année), les empreintes des groupes, le cube,
+                les formations et leur index de recherche, tous de la même version
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot.df is None or now - self._last_check > self.check_interval:
+            with self._lock:
+                self._last_check = now
+                version = get_dataset_version(self.json_path)
+                if version != self._snapshot.version:
+                    df = load_spe_data(self.json_path, self.store_path)
+                    formations = df['formation'].unique().tolist()
+                    df, group_index = build_group_index(df)
+                    group_versions = compute_group_versions(df)
+                    self._snapshot = SpeSnapshot(version, df, group_index, group_versions, SpeCube.from_dataframe(df),
+                                                 formations, PrefixIndex.from_documents(formations))
+                    for callback in self._reload_callbacks:
+                        callback(group_versions)
+                snapshot = self._snapshot
+        return snapshot
+
+    def get(self) -> Tuple[pd.DataFrame, Dict[Tuple[str, int], slice], Dict[Tuple[str, int], str]]:
+        """Retourne le dataset trié, son index (formation, année) et l'empreinte de chaque groupe, en le rechargeant si besoin"""
+        snapshot = self.snapshot()
+        return snapshot.df, snapshot.group_index, snapshot.group_versions
+
+
+if __name__ == "__main__":
+    # Usage : python -m src.utils.spe_store <chemin du JSON>
+    print(f"Fichier construit : {build_spe_store(sys.argv[1])}")
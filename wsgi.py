@@ -0,0 +1,8 @@
+"""Point d'entrée WSGI de l'application, pour un serveur multi-processus
+
+Usage : gunicorn -c gunicorn.conf.py wsgi:server
+"""
+from main import create_app
+
+app = create_app()
+server = app.server